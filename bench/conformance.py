@@ -0,0 +1,337 @@
+import sys
+import time
+import argparse
+import importlib
+from typing import List
+from rasm.VirtualMachine import *
+from rasm.Stats import RunCounters
+from parsing.parse_program import parse_program
+from demo.compile import compile
+
+# the machine state engines must agree on, after halting or failing
+FIELDS = ["rans", "rsp", "fequal", "fless", "stack"]
+
+# programs exercising every instruction and every VMError
+CASES = {
+  "mov": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(5), StackOff(1)),
+    Mov(Imm(10), StackOff(2)),
+    Mov(StackOff(2), StackOff(1)),
+    Mov(StackOff(1), Rans()),
+    Mov(Imm(20), Rsp()),
+  ],
+  "arith": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(30), Rans()),
+    Add(Imm(5), Rans()),
+    Mov(Imm(7), StackOff(1)),
+    Sub(StackOff(1), Rans()),
+    Mov(Imm(-3), StackOff(2)),
+    Mul(StackOff(2), Rans()),
+    Mul(Imm(2.5), StackOff(1)),
+    Add(Imm(2), Rsp()),
+    Add(Rsp(), Rans()),
+  ],
+  "cmp": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(40), Rans()),
+    Mov(Imm(16), StackOff(1)),
+    Cmp(StackOff(1), Rans()),
+    Mov(Imm(-3), Rsp()),
+    Cmp(Rsp(), Rsp()),
+  ],
+  "branches": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(5), Rans()),
+    Mov(Imm(2), StackOff(1)),
+    Add(Imm(3), StackOff(1)),
+    Cmp(StackOff(1), Rans()),
+    Je("equal"),
+    Mov(Imm(0), Rans()),
+    Label("equal"),
+    Jne("end"),
+    Mov(Imm(1), StackOff(2)),
+    Jmp("end"),
+    Mov(Imm(2), StackOff(2)),
+    Label("end"),
+  ],
+  "loop": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(0), Rans()),
+    Label("loop"),
+    Add(Imm(1), Rans()),
+    Mov(Rans(), StackOff(1)),
+    Cmp(Imm(100), Rans()),
+    Jne("loop"),
+  ],
+  "call_ret": [
+    Label("fun"),
+    Mov(StackOff(1), Rans()),
+    Add(StackOff(2), Rans()),
+    Ret(),
+    Label(ENTRY_LABEL),
+    Mov(Imm(3), StackOff(1)),
+    Mov(Imm(4), StackOff(2)),
+    Mov(StackOff(2), StackOff(5)),
+    Mov(StackOff(1), StackOff(6)),
+    Add(Imm(3), Rsp()),
+    Call("fun"),
+    Sub(Imm(3), Rsp()),
+  ],
+  "entry_not_first": [
+    Mov(Imm(100), Rans()),
+    Label(ENTRY_LABEL),
+    Print(Rans()),
+  ],
+  "bad_dest": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(1), Rans()),
+    Mov(Imm(5), Imm(0)),
+  ],
+  "bad_stack_access": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(1), Rans()),
+    Sub(Imm(1), Rsp()),
+    Mov(StackOff(0), Rans()),
+  ],
+  "bad_stack_store": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(9), Rans()),
+    Mov(Rans(), StackOff(STACK_SIZE)),
+  ],
+  "invalid_instr": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(1), Rans()),
+    Instr(),
+  ],
+  "invalid_target": [
+    Label(ENTRY_LABEL),
+    Mov(Imm(1), Rans()),
+    Jmp("no_label"),
+  ],
+  "invalid_rip": [
+    Label("f"),
+    Mov(Imm(-5), StackOff(0)),
+    Ret(),
+    Label(ENTRY_LABEL),
+    Call("f"),
+  ],
+  "invalid_rsp": [
+    Label(ENTRY_LABEL),
+    Call(ENTRY_LABEL),
+  ],
+  "duplicate_label": [
+    Label(ENTRY_LABEL),
+    Label("a"),
+    Label("a"),
+  ],
+  "no_entry": [
+    Mov(Imm(1), Rans()),
+  ],
+}
+
+# compiled programs also checked, for realistic instruction mixes
+PROGRAMS = [
+  "examples/fact.lisp",
+  "examples/fib.lisp",
+  "examples/parity.lisp",
+]
+
+class Outcome:
+  """How a program run on an engine ended: the machine state,
+  and the type of VMError raised, if any"""
+
+  def __init__(self, vm, error):
+    self.state = { field: getattr(vm, field) for field in FIELDS }
+    self.error = type(error) if error is not None else None
+
+def run_case(make_engine, pgrm: List[Instr]) -> Outcome:
+  vm = make_engine()
+  try:
+    vm.execute(pgrm, suppress_output=True)
+  except VMError as err:
+    return Outcome(vm, err)
+  return Outcome(vm, None)
+
+def compiled_cases(filenames: list) -> dict:
+  cases = {}
+  for filename in filenames:
+    with open(filename, "r") as file:
+      (defns, exprs) = parse_program(file.read())
+    cases[filename] = compile(defns, exprs)
+  return cases
+
+def check(make_engine, cases: dict, make_reference=VirtualMachine) -> list:
+  """(case, what, expected, got) for every way an engine's outcome
+  differs from the reference VM's on the given programs"""
+  mismatches = []
+  for (name, pgrm) in cases.items():
+    expected = run_case(make_reference, pgrm)
+    got = run_case(make_engine, pgrm)
+
+    if got.error != expected.error:
+      mismatches.append((name, "error", error_name(expected.error), error_name(got.error)))
+    for field in FIELDS:
+      (exp, actual) = (expected.state[field], got.state[field])
+      if field == "stack":
+        (exp, actual) = (list(exp), list(actual))
+        if exp != actual:
+          idx = first_difference(exp, actual)
+          mismatches.append((name, f"stack[{idx}]", at(exp, idx), at(actual, idx)))
+      elif exp != actual:
+        mismatches.append((name, field, exp, actual))
+  return mismatches
+
+def error_name(error) -> str:
+  return error.__name__ if error is not None else "none"
+
+def first_difference(a: list, b: list) -> int:
+  for i in range(min(len(a), len(b))):
+    if a[i] != b[i]:
+      return i
+  return min(len(a), len(b))
+
+def at(seq: list, idx: int):
+  return seq[idx] if idx < len(seq) else "missing"
+
+# ============= Microbenchmarks =============
+
+def loop_program(body: List[Instr], iterations: int, prelude=[]) -> List[Instr]:
+  """A program running body in a loop, counting down in stack slot 0"""
+  return prelude + [
+    Label(ENTRY_LABEL),
+    Mov(Imm(iterations), StackOff(0)),
+    Label("loop"),
+  ] + body + [
+    Sub(Imm(1), StackOff(0)),
+    Cmp(Imm(0), StackOff(0)),
+    Jne("loop"),
+  ]
+
+def branch_body(unroll: int) -> List[Instr]:
+  body = []
+  for i in range(unroll):
+    body += [
+      Cmp(Imm(1), Rans()),
+      Je(f"skip_{i}"),
+      Jmp(f"next_{i}"),
+      Label(f"skip_{i}"),
+      Label(f"next_{i}"),
+    ]
+  return body
+
+def microbenchmarks(iterations=2000, unroll=10) -> dict:
+  """A loop program per opcode class, its body mostly that class"""
+  return {
+    "arithmetic": loop_program([
+      Add(Imm(3), Rans()),
+      Sub(Imm(1), Rans()),
+      Mul(Imm(1), Rans()),
+      Add(StackOff(2), Rans()),
+    ] * unroll, iterations),
+    "moves": loop_program([
+      Mov(Imm(1), Rans()),
+      Mov(Rans(), StackOff(2)),
+      Mov(StackOff(2), StackOff(3)),
+      Mov(StackOff(3), Rans()),
+    ] * unroll, iterations),
+    "branches": loop_program(branch_body(unroll), iterations),
+    "call_ret": loop_program([Call("f")] * unroll, iterations,
+      prelude=[Label("f"), Ret()]),
+  }
+
+def count_instrs(pgrm: List[Instr]) -> int:
+  """Instructions the reference VM executes running a program"""
+  vm = VirtualMachine()
+  counters = RunCounters()
+  vm.attach(counters)
+  vm.execute(pgrm, suppress_output=True)
+  return counters.instructions
+
+def time_engine(make_engine, pgrm: List[Instr], repeat: int) -> float:
+  """Fastest of repeated runs of a program on an engine, in seconds"""
+  best = None
+  for i in range(repeat):
+    vm = make_engine()
+    start = time.perf_counter()
+    vm.execute(pgrm, suppress_output=True)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+def timings(engines: dict, benches: dict, repeat: int) -> list:
+  """(class, instructions, {engine: ns per instruction}) per benchmark"""
+  rows = []
+  for (name, pgrm) in benches.items():
+    n = count_instrs(pgrm)
+    per_instr = {}
+    for (engine, make_engine) in engines.items():
+      per_instr[engine] = time_engine(make_engine, pgrm, repeat) / n * 1e9
+    rows.append((name, n, per_instr))
+  return rows
+
+def timing_table(rows: list, engines: list) -> str:
+  """Time per instruction on each engine, and relative to the first"""
+  reference = engines[0]
+  widths = [max(16, len(e) + 3) for e in engines]
+  header = f"{'class':<12} {'instrs':>9} " + \
+    " ".join(f"{e + ' ns':>{w}}" for (e, w) in zip(engines, widths))
+  lines = [header]
+  for (name, n, per_instr) in rows:
+    cols = [f"{per_instr[reference]:>{widths[0]}.1f}"]
+    for (e, w) in zip(engines[1:], widths[1:]):
+      ratio = per_instr[e] / per_instr[reference]
+      cols.append(f"{f'{per_instr[e]:.1f} ({ratio:.2f}x)':>{w}}")
+    lines.append(f"{name:<12} {n:>9} " + " ".join(cols))
+  return "\n".join(lines)
+
+def load_engine(path: str):
+  """Import an engine factory given as module:name"""
+  (module, _, name) = path.partition(":")
+  if name == "":
+    raise ValueError(f"engine should be given as module:name, got {path}")
+  return getattr(importlib.import_module(module), name)
+
+def main(argv=None) -> int:
+  argparser = argparse.ArgumentParser(
+    description="Check VM engines against the reference VirtualMachine, and time them")
+  argparser.add_argument(
+    'engines', type=str, nargs='*',
+    help='engines to check, as module:name of a class or function making one')
+  argparser.add_argument(
+    '-n', '--repeat', type=int, default=3, help='timed runs per benchmark, fastest kept (default 3)')
+  argparser.add_argument(
+    '--iterations', type=int, default=2000, help='loop iterations per benchmark (default 2000)')
+  argparser.add_argument(
+    '--no-timing', action='store_true', help='only check conformance')
+  args = argparser.parse_args(argv)
+
+  engines = { "reference": VirtualMachine }
+  for path in args.engines:
+    engines[path] = load_engine(path)
+
+  cases = dict(CASES)
+  cases.update(compiled_cases(PROGRAMS))
+  cases.update(microbenchmarks(iterations=10))
+
+  failed = False
+  for (name, make_engine) in list(engines.items())[1:]:
+    mismatches = check(make_engine, cases)
+    if len(mismatches) == 0:
+      print(f"{name}: conforms on {len(cases)} programs")
+      continue
+    failed = True
+    print(f"{name}: {len(mismatches)} mismatch(es)")
+    for (case, what, expected, got) in mismatches:
+      print(f"  {case}: {what} expected {expected}, got {got}")
+
+  if not args.no_timing:
+    print()
+    rows = timings(engines, microbenchmarks(args.iterations), args.repeat)
+    print(timing_table(rows, list(engines)))
+
+  return 1 if failed else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,150 @@
+import sys
+import random
+import argparse
+
+class Shape:
+  """Sizes of a synthetic program along each axis the generator varies"""
+
+  def __init__(self, defns=10, depth=5, let_chain=3, fanout=2, exprs=10, literals=10):
+    self.defns = defns          # function definitions
+    self.depth = depth          # nesting depth of arithmetic in each defn body
+    self.let_chain = let_chain  # lets wrapped around each defn body
+    self.fanout = fanout        # calls made by each calling defn
+    self.exprs = exprs          # top-level expressions calling defns
+    self.literals = literals    # top-level expressions that are just literals
+
+  def with_axis(self, axis: str, size: int):
+    """A copy of this shape with one axis set to a new size"""
+    shape = Shape(**vars(self))
+    setattr(shape, axis, size)
+    return shape
+
+AXES = list(vars(Shape()))
+
+def generate(shape: Shape, seed=0) -> str:
+  """Generate the source of a valid program of the given shape.
+
+  Even-numbered defns are leaves that call nothing, and odd-numbered
+  defns make `fanout` calls to the leaves before them, so the program
+  always halts and runs in time linear in its size. There is no
+  multiplication, so values stay small."""
+  gen = Generator(shape, random.Random(seed))
+  return gen.program()
+
+class Generator:
+
+  def __init__(self, shape: Shape, rand: random.Random):
+    self.shape = shape
+    self.rand = rand
+    self.arities = []
+
+  def program(self) -> str:
+    lines = []
+    for i in range(self.shape.defns):
+      lines.append(self.defn(i))
+
+    callers = [i for i in range(len(self.arities)) if i % 2 == 1] or \
+      list(range(len(self.arities)))
+    for i in range(self.shape.exprs if len(callers) > 0 else 0):
+      f = callers[i % len(callers)]
+      args = [str(self.rand.randint(0, 9)) for j in range(self.arities[f])]
+      lines.append(f"(print {call(f, args)})")
+
+    for i in range(self.shape.literals):
+      lines.append(str(self.rand.randint(-99, 99)))
+
+    return "\n".join(lines) + "\n"
+
+  def defn(self, i: int) -> str:
+    arity = self.rand.randint(1, 3)
+    self.arities.append(arity)
+    names = [f"a{j}" for j in range(arity)]
+
+    # the calls this defn makes are spread through its body
+    calls = []
+    if i % 2 == 1:
+      leaves = list(range(0, i, 2))
+      for j in range(self.shape.fanout):
+        f = self.rand.choice(leaves)
+        calls.append(call(f, [self.rand.choice(names) for k in range(self.arities[f])]))
+
+    # each let value can refer to the bindings before it
+    lets = []
+    for j in range(self.shape.let_chain):
+      lets.append((f"v{j}", self.arith(1, names, [])))
+      names = names + [f"v{j}"]
+
+    body = self.arith(self.shape.depth, names, calls)
+    extra = calls[self.shape.depth:]
+    if len(extra) > 0:
+      body = self.sum_of(extra + [body])
+    for (name, value) in reversed(lets):
+      body = f"(let ({name} {value}) {body})"
+
+    params = " ".join(f"a{j}" for j in range(arity))
+    return f"(def (f{i} {params})\n  {body})"
+
+  def arith(self, depth: int, names: list, calls: list) -> str:
+    """An expression nested `depth` deep, each level combining one
+    operand with the expression below it. Calls fill the outermost
+    operands. Built iteratively, so any depth can be generated"""
+    levels = []
+    for level in range(depth):
+      op = self.rand.choice(["+", "-", "add1", "sub1", "if"])
+      if level < len(calls):
+        operand = calls[level]
+        if op == "add1" or op == "sub1":
+          op = "+"
+      else:
+        operand = self.atom(names)
+      levels.append((op, operand, self.atom(names)))
+
+    expr = self.atom(names)
+    for (op, operand, other) in reversed(levels):
+      if op == "add1" or op == "sub1":
+        expr = f"({op} {expr})"
+      elif op == "if":
+        expr = f"(if (= {operand} 0) {expr} {other})"
+      else:
+        expr = f"({op} {operand} {expr})"
+    return expr
+
+  def atom(self, names: list) -> str:
+    if len(names) > 0 and self.rand.random() < 0.5:
+      return self.rand.choice(names)
+    return str(self.rand.randint(0, 9))
+
+  def sum_of(self, exprs: list) -> str:
+    """Left-leaning sum of several expressions"""
+    total = exprs[0]
+    for e in exprs[1:]:
+      total = f"(+ {total} {e})"
+    return total
+
+def call(f: int, args: list) -> str:
+  return f"(f{f} {' '.join(args)})"
+
+def main(argv=None):
+  argparser = argparse.ArgumentParser(
+    description="Generate a synthetic program for scaling benchmarks")
+  defaults = Shape()
+  for axis in AXES:
+    argparser.add_argument(
+      f"--{axis.replace('_', '-')}", type=int, default=getattr(defaults, axis),
+      help=f"(default {getattr(defaults, axis)})")
+  argparser.add_argument(
+    '--seed', type=int, default=0, help='random seed (default 0)')
+  argparser.add_argument(
+    '-o', '--out', help='file to write the program to (default stdout)')
+  args = argparser.parse_args(argv)
+
+  shape = Shape(**{ axis: getattr(args, axis) for axis in AXES })
+  pgrm = generate(shape, args.seed)
+  if args.out:
+    with open(args.out, "w") as file:
+      file.write(pgrm)
+  else:
+    sys.stdout.write(pgrm)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,7 @@
+; deep recursion: fact builds a call stack thousands of frames deep
+(def (fact n)
+  (if (= n 0)
+    1
+    (* n (fact (sub1 n)))))
+
+(fact 2000)
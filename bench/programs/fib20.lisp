@@ -0,0 +1,9 @@
+; call-heavy: naive fibonacci makes tens of thousands of calls
+(def (fib n)
+  (if (= n 0)
+    1
+    (if (= n 1)
+      1
+      (+ (fib (- n 1)) (fib (- n 2))))))
+
+(fib 20)
@@ -0,0 +1,19 @@
+; mutual recursion over a long range: odd? and even? dominate
+(def (odd? n)
+  (if (= n 0) 0 (even? (sub1 n))))
+
+(def (even? n)
+  (if (= n 0) 1 (odd? (sub1 n))))
+
+(def (print-if-odd n)
+  (if (odd? n)
+    (print n)
+    n))
+
+(def (print-odds-in-range start end)
+  (if (= start end)
+    start
+    (let (void (print-if-odd start))
+      (print-odds-in-range (add1 start) end))))
+
+(print-odds-in-range 0 300)
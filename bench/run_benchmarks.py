@@ -0,0 +1,211 @@
+import sys
+import os
+import json
+import platform
+import argparse
+import statistics
+from scripts.Pipeline import *
+from parsing.parse_program import lexer, make_parser
+from rasm.VirtualMachine import *
+from compiler.compile import compile as student_compile
+from demo.compile import compile as demo_compile
+
+# programs measured by default (examples/loop.lisp never halts)
+WORKLOADS = [
+  "examples/fact.lisp",
+  "examples/fib.lisp",
+  "examples/parity.lisp",
+  "bench/programs/fact_deep.lisp",
+  "bench/programs/fib20.lisp",
+  "bench/programs/parity_long.lisp",
+]
+
+PHASES = ["lex", "parse", "compile", "execute"]
+
+DEFAULT_BASELINE = "bench/baseline.json"
+
+def workload_name(filename: str) -> str:
+  return os.path.splitext(os.path.basename(filename))[0]
+
+def run_once(pgrm: str, compile) -> Pipeline:
+  """Run every phase on a program once, measuring each"""
+  pipeline = Pipeline()
+  tokens = pipeline.stage("lex", lexer.lex, pgrm)
+  (defns, exprs) = pipeline.stage("parse", make_parser().parse, tokens)
+  instrs = pipeline.stage("compile", compile, defns, exprs)
+  vm = VirtualMachine()
+  pipeline.stage("execute", vm.execute, instrs, True)
+  return pipeline
+
+def benchmark(filename: str, compile, warmup: int, repeat: int) -> dict:
+  """Wall times (seconds) of each phase for a program, over repeated runs"""
+  with open(filename, "r") as file:
+    pgrm = file.read()
+
+  for i in range(warmup):
+    run_once(pgrm, compile)
+
+  runs = { phase: [] for phase in PHASES }
+  for i in range(repeat):
+    for s in run_once(pgrm, compile).stages:
+      runs[s.name].append(s.wall)
+
+  return { phase: summarize(times) for (phase, times) in runs.items() }
+
+def summarize(times: list) -> dict:
+  return {
+    "min": min(times),
+    "median": statistics.median(times),
+    "runs": times,
+  }
+
+def run_suite(workloads: list, compile, warmup: int, repeat: int, log=None) -> dict:
+  """Benchmark every workload, returning results in the saved format"""
+  results = {}
+  for filename in workloads:
+    if log is not None:
+      log(f"running {filename}")
+    results[workload_name(filename)] = benchmark(filename, compile, warmup, repeat)
+
+  return {
+    "meta": {
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "warmup": warmup,
+      "repeat": repeat,
+    },
+    "benchmarks": results,
+  }
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float) -> list:
+  """(workload, phase, baseline, current, ratio, regressed) for every phase
+  measured in both. Phases are compared by their fastest run, the one
+  least disturbed by other load. A phase regresses if it is more than
+  threshold (a fraction) slower than the baseline, and slower by at least
+  min_delta seconds, so that noise in tiny timings is not reported"""
+  rows = []
+  for (name, phases) in results["benchmarks"].items():
+    if name not in baseline["benchmarks"]:
+      continue
+    for phase in PHASES:
+      if phase not in phases or phase not in baseline["benchmarks"][name]:
+        continue
+      base = baseline["benchmarks"][name][phase]["min"]
+      cur = phases[phase]["min"]
+      ratio = cur / base if base > 0 else float("inf")
+      regressed = cur > base * (1 + threshold) and cur - base > min_delta
+      rows.append((name, phase, base, cur, ratio, regressed))
+  return rows
+
+# what a run's timings depend on, besides the code measured
+COMPARABLE = ["python", "compiler"]
+
+def mismatches(results: dict, baseline: dict) -> list:
+  """(key, baseline, current) for each setting the baseline was recorded
+  with that differs from this run's. Python versions are compared by
+  major.minor, as interpreters that differ there run at different speeds"""
+  rows = []
+  for key in COMPARABLE:
+    base = baseline.get("meta", {}).get(key)
+    cur = results.get("meta", {}).get(key)
+    if key == "python" and base is not None and cur is not None:
+      (base, cur) = (minor_version(base), minor_version(cur))
+    if base is not None and base != cur:
+      rows.append((key, base, cur))
+  return rows
+
+def minor_version(version: str) -> str:
+  return ".".join(version.split(".")[:2])
+
+def results_table(results: dict) -> str:
+  """Median time of each phase per workload"""
+  lines = [f"{'workload':<16} " + " ".join(f"{p + ' ms':>12}" for p in PHASES)]
+  for (name, phases) in results["benchmarks"].items():
+    cols = [f"{phases[p]['median'] * 1000:>12.3f}" for p in PHASES]
+    lines.append(f"{name:<16} " + " ".join(cols))
+  return "\n".join(lines)
+
+def comparison_table(rows: list) -> str:
+  """Fastest time of each phase per workload, against the baseline"""
+  lines = [f"{'workload':<16} {'phase':<8} {'base ms':>10} {'now ms':>10} {'ratio':>7}"]
+  for (name, phase, base, cur, ratio, regressed) in rows:
+    flag = "  REGRESSION" if regressed else ""
+    lines.append(
+      f"{name:<16} {phase:<8} {base * 1000:>10.3f} {cur * 1000:>10.3f} {ratio:>7.2f}{flag}")
+  return "\n".join(lines)
+
+def main(argv=None) -> int:
+  argparser = argparse.ArgumentParser(
+    description="Benchmark lexing, parsing, compilation and execution")
+  argparser.add_argument(
+    'files', type=str, nargs='*', help='programs to benchmark (default: the standard workloads)')
+  argparser.add_argument(
+    '-n', '--repeat', type=int, default=5, help='measured runs per program (default 5)')
+  argparser.add_argument(
+    '-w', '--warmup', type=int, default=1, help='unmeasured runs per program first (default 1)')
+  argparser.add_argument(
+    '-o', '--out', help='write results as JSON to a file')
+  argparser.add_argument(
+    '-b', '--baseline', default=DEFAULT_BASELINE,
+    help=f'baseline results to compare against (default {DEFAULT_BASELINE})')
+  argparser.add_argument(
+    '--save-baseline', action='store_true', help='store these results as the new baseline')
+  argparser.add_argument(
+    '-t', '--threshold', type=float, default=0.10,
+    help='fraction slower than baseline that counts as a regression (default 0.10)')
+  argparser.add_argument(
+    '--min-delta', type=float, default=0.001,
+    help='seconds slower than baseline that a regression must also exceed (default 0.001)')
+  argparser.add_argument(
+    '-s', '--student', action='store_true', help='benchmark the student compiler instead of the demo')
+  args = argparser.parse_args(argv)
+
+  compile = student_compile if args.student else demo_compile
+  workloads = args.files if len(args.files) > 0 else WORKLOADS
+  results = run_suite(workloads, compile, args.warmup, args.repeat,
+    log=lambda msg: print(msg, file=sys.stderr))
+  results["meta"]["compiler"] = "student" if args.student else "demo"
+
+  print(results_table(results))
+
+  if args.out:
+    write_json(args.out, results)
+
+  if args.save_baseline:
+    write_json(args.baseline, results)
+    print(f"saved baseline to {args.baseline}")
+    return 0
+
+  if not os.path.exists(args.baseline):
+    print(f"no baseline at {args.baseline}, nothing to compare against")
+    return 0
+
+  with open(args.baseline, "r") as file:
+    baseline = json.load(file)
+
+  # timings from another interpreter (or compiler) aren't comparable
+  different = mismatches(results, baseline)
+  if len(different) > 0:
+    for (key, base, cur) in different:
+      print(f"baseline was recorded with {key} {base}, but this run used {cur}", file=sys.stderr)
+    print(f"not comparing against {args.baseline}: rerun with --save-baseline "
+      "(make bench-baseline) to record one for this setup", file=sys.stderr)
+    return 2
+
+  rows = compare(results, baseline, args.threshold, args.min_delta)
+  print()
+  print(comparison_table(rows))
+
+  regressions = [row for row in rows if row[5]]
+  if len(regressions) > 0:
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    return 1
+  return 0
+
+def write_json(filename: str, data: dict):
+  with open(filename, "w") as file:
+    json.dump(data, file, indent=2)
+    file.write("\n")
+
+if __name__ == '__main__':
+  sys.exit(main())
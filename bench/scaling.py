@@ -0,0 +1,156 @@
+import sys
+import csv
+import math
+import argparse
+from scripts.Pipeline import *
+from parsing.parse_program import parse_program
+from rasm.VirtualMachine import *
+from demo.compile import compile
+from .generate import *
+
+STAGES = ["parse", "compile", "execute"]
+
+# program sizes measured by default, for each axis
+DEFAULT_SIZES = {
+  "defns": [50, 100, 200, 400],
+  "depth": [25, 50, 100, 200],
+  "let_chain": [25, 50, 100, 200],
+  "fanout": [10, 20, 40, 80],
+  "exprs": [100, 200, 400, 800],
+  "literals": [500, 1000, 2000, 4000],
+}
+
+class Point:
+  """Measurements of each stage for one generated program"""
+
+  def __init__(self, size: int, chars: int):
+    self.size = size
+    self.chars = chars
+    self.wall = {}
+    self.peak_mem = {}
+    self.error = None
+
+def run_stages(pipeline: Pipeline, pgrm: str):
+  (defns, exprs) = pipeline.stage("parse", parse_program, pgrm)
+  instrs = pipeline.stage("compile", compile, defns, exprs)
+  vm = VirtualMachine()
+  pipeline.stage("execute", vm.execute, instrs, True)
+
+def measure(pgrm: str, size: int, repeat: int) -> Point:
+  """Fastest wall time of each stage over repeated runs, and the peak
+  memory of each in a separate run (tracing memory slows it down)"""
+  point = Point(size, len(pgrm))
+  try:
+    for i in range(repeat):
+      pipeline = Pipeline()
+      run_stages(pipeline, pgrm)
+      for s in pipeline.stages:
+        point.wall[s.name] = min(s.wall, point.wall.get(s.name, s.wall))
+
+    pipeline = Pipeline(memory=True)
+    run_stages(pipeline, pgrm)
+    for s in pipeline.stages:
+      point.peak_mem[s.name] = s.peak_mem
+  except Exception as err:
+    point.error = err
+  return point
+
+def scale(axis: str, sizes: list, base: Shape, repeat: int, seed=0, log=None) -> list:
+  """Measure programs growing along one axis, the others fixed at base"""
+  points = []
+  for size in sizes:
+    if log is not None:
+      log(f"{axis} = {size}")
+    pgrm = generate(base.with_axis(axis, size), seed)
+    points.append(measure(pgrm, size, repeat))
+  return points
+
+def growth(points: list, stage: str) -> float:
+  """Exponent k fitting time ~ chars^k between the smallest and largest
+  programs measured: about 1 is linear, 2 quadratic. None if unknown"""
+  ok = [p for p in points if p.error is None and p.wall.get(stage, 0) > 0]
+  if len(ok) < 2 or ok[-1].chars == ok[0].chars:
+    return None
+  return math.log(ok[-1].wall[stage] / ok[0].wall[stage]) / \
+    math.log(ok[-1].chars / ok[0].chars)
+
+def table(axis: str, points: list) -> str:
+  header = f"{axis:>10} {'chars':>9} " + \
+    " ".join(f"{s + ' ms':>11} {s + ' KiB':>11}" for s in STAGES)
+  lines = [header]
+  for p in points:
+    if p.error is not None:
+      lines.append(f"{p.size:>10} {p.chars:>9}  failed: {type(p.error).__name__}")
+      continue
+    cols = [f"{p.wall[s] * 1000:>11.3f} {p.peak_mem[s] / 1024:>11.1f}" for s in STAGES]
+    lines.append(f"{p.size:>10} {p.chars:>9} " + " ".join(cols))
+
+  exps = []
+  for s in STAGES:
+    k = growth(points, s)
+    exps.append(f"{s} {k:.2f}" if k is not None else f"{s} -")
+  lines.append(f"growth exponent (time vs chars): {', '.join(exps)}")
+  return "\n".join(lines)
+
+def write_csv(file, axis: str, points: list):
+  writer = csv.writer(file)
+  writer.writerow(["axis", "size", "chars", "stage", "wall_ms", "peak_kib"])
+  for p in points:
+    if p.error is not None:
+      continue
+    for s in STAGES:
+      writer.writerow([axis, p.size, p.chars, s,
+        f"{p.wall[s] * 1000:.3f}", f"{p.peak_mem[s] / 1024:.1f}"])
+
+def plot(filename: str, axis: str, points: list) -> bool:
+  """Plot time and memory against size, if matplotlib is installed"""
+  try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+  except ImportError:
+    return False
+
+  ok = [p for p in points if p.error is None]
+  (fig, (time_ax, mem_ax)) = plt.subplots(1, 2, figsize=(10, 4))
+  for s in STAGES:
+    time_ax.plot([p.size for p in ok], [p.wall[s] * 1000 for p in ok], marker="o", label=s)
+    mem_ax.plot([p.size for p in ok], [p.peak_mem[s] / 1024 for p in ok], marker="o", label=s)
+  for (ax, label) in [(time_ax, "time (ms)"), (mem_ax, "peak memory (KiB)")]:
+    ax.set_xlabel(axis)
+    ax.set_ylabel(label)
+    ax.legend()
+  fig.tight_layout()
+  fig.savefig(filename)
+  return True
+
+def main(argv=None):
+  argparser = argparse.ArgumentParser(
+    description="Measure how parsing, compilation and execution scale with program size")
+  argparser.add_argument(
+    'axis', choices=AXES, help='the axis along which programs grow')
+  argparser.add_argument(
+    '--sizes', type=int, nargs='+', help='sizes to measure along the axis')
+  argparser.add_argument(
+    '-n', '--repeat', type=int, default=3, help='timed runs per size, fastest kept (default 3)')
+  argparser.add_argument(
+    '--seed', type=int, default=0, help='random seed for the generator (default 0)')
+  argparser.add_argument(
+    '--csv', help='write measurements as CSV to a file')
+  argparser.add_argument(
+    '--plot', help='plot time and memory against size to an image file (needs matplotlib)')
+  args = argparser.parse_args(argv)
+
+  sizes = args.sizes if args.sizes else DEFAULT_SIZES[args.axis]
+  points = scale(args.axis, sizes, Shape(), args.repeat, args.seed,
+    log=lambda msg: print(msg, file=sys.stderr))
+  print(table(args.axis, points))
+
+  if args.csv:
+    with open(args.csv, "w", newline="") as file:
+      write_csv(file, args.axis, points)
+  if args.plot and not plot(args.plot, args.axis, points):
+    print("matplotlib is not installed, skipping plot", file=sys.stderr)
+
+if __name__ == '__main__':
+  main()
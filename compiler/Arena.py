@@ -0,0 +1,271 @@
+from array import array
+from typing import List
+from .Defn import *
+from .Expr import *
+
+# kinds of node in an arena
+NUM = 0
+ADD1 = 1
+SUB1 = 2
+PLUS = 3
+MINUS = 4
+TIMES = 5
+EQUALS = 6
+IF = 7
+LET = 8
+APP = 9
+NAME = 10
+PRINTEXPR = 11
+
+class ExprArena:
+  """Stores expressions compactly, as nodes identified by their index
+  in parallel arrays: the kind of each node, and up to three fields,
+  which hold the ids of its children (or of its number, or names).
+  Numbers, names, and the args of applications are in their own arrays.
+
+  An arena is also a builder for the parser (see ExprBuilder), making
+  nodes as their forms are parsed. Parsed expressions are returned as
+  ExprViews of nodes, which support the Expr interface (isX() and the
+  fields of each kind of expr) and so can be compiled as Exprs are"""
+
+  def __init__(self):
+    self.kinds = array("B")
+    self.a = array("i")
+    self.b = array("i")
+    self.c = array("i")
+    self.numbers = array("d")
+    self.args = array("i")
+    self.strings = []
+    self.string_ids = {}
+
+  def __len__(self) -> int:
+    return len(self.kinds)
+
+  def node(self, kind: int, a=-1, b=-1, c=-1) -> int:
+    self.kinds.append(kind)
+    self.a.append(a)
+    self.b.append(b)
+    self.c.append(c)
+    return len(self.kinds) - 1
+
+  def string(self, s: str) -> int:
+    """Id of a name, adding it if it is new"""
+    if s not in self.string_ids:
+      self.string_ids[s] = len(self.strings)
+      self.strings.append(s)
+    return self.string_ids[s]
+
+  # ============= Builder =============
+
+  def Num(self, value) -> int:
+    self.numbers.append(value)
+    return self.node(NUM, len(self.numbers) - 1)
+
+  def Add1(self, operand: int) -> int:
+    return self.node(ADD1, operand)
+
+  def Sub1(self, operand: int) -> int:
+    return self.node(SUB1, operand)
+
+  def Plus(self, left: int, right: int) -> int:
+    return self.node(PLUS, left, right)
+
+  def Minus(self, left: int, right: int) -> int:
+    return self.node(MINUS, left, right)
+
+  def Times(self, left: int, right: int) -> int:
+    return self.node(TIMES, left, right)
+
+  def Equals(self, left: int, right: int) -> int:
+    return self.node(EQUALS, left, right)
+
+  def If(self, cond: int, thn: int, els: int) -> int:
+    return self.node(IF, cond, thn, els)
+
+  def Let(self, name: str, value: int, body: int) -> int:
+    return self.node(LET, value, body, self.string(name))
+
+  def App(self, fname: str, args: List[int]) -> int:
+    start = len(self.args)
+    self.args.extend(args)
+    return self.node(APP, self.string(fname), start, len(args))
+
+  def Name(self, name: str) -> int:
+    return self.node(NAME, self.string(name))
+
+  def PrintExpr(self, operand: int) -> int:
+    return self.node(PRINTEXPR, operand)
+
+  def Defn(self, name: str, params: List[str], body: int) -> Defn:
+    return Defn(name, params, self.root(body))
+
+  def root(self, node: int):
+    """The expression returned for a node parsed at the top level"""
+    return ExprView(self, node)
+
+  # ============= Reading =============
+
+  def children(self, node: int) -> List[int]:
+    kind = self.kinds[node]
+    if kind == ADD1 or kind == SUB1 or kind == PRINTEXPR:
+      return [self.a[node]]
+    elif kind == IF:
+      return [self.a[node], self.b[node], self.c[node]]
+    elif kind >= PLUS and kind <= LET:
+      return [self.a[node], self.b[node]]
+    elif kind == APP:
+      start = self.b[node]
+      return list(self.args[start:start + self.c[node]])
+    return []
+
+  def to_expr(self, node: int) -> Expr:
+    """Makes the Expr objects for a node and its descendants. Built
+    children first, without recursion, so any depth can be converted"""
+    order = []
+    stack = [node]
+    while len(stack) > 0:
+      n = stack.pop()
+      order.append(n)
+      stack += self.children(n)
+
+    exprs = {}
+    for n in reversed(order):
+      if n in exprs:
+        continue
+      kind = self.kinds[n]
+      kids = [exprs[k] for k in self.children(n)]
+      if kind == NUM:
+        exprs[n] = Num(self.numbers[self.a[n]])
+      elif kind == NAME:
+        exprs[n] = Name(self.strings[self.a[n]])
+      elif kind == LET:
+        exprs[n] = Let(self.strings[self.c[n]], kids[0], kids[1])
+      elif kind == APP:
+        exprs[n] = App(self.strings[self.a[n]], kids)
+      else:
+        exprs[n] = CONSTRUCTORS[kind](*kids)
+    return exprs[node]
+
+CONSTRUCTORS = {
+  ADD1:       Add1,
+  SUB1:       Sub1,
+  PLUS:       Plus,
+  MINUS:      Minus,
+  TIMES:      Times,
+  EQUALS:     Equals,
+  IF:         If,
+  PRINTEXPR:  PrintExpr,
+}
+
+class ExprView(Expr):
+  """A node in an ExprArena, seen as an Expr. Views are made as nodes
+  are visited, and hold nothing but the arena and the node's id"""
+  __slots__ = ("arena", "id")
+
+  def __init__(self, arena: ExprArena, id: int):
+    self.arena = arena
+    self.id = id
+
+  def kind(self) -> int:
+    return self.arena.kinds[self.id]
+
+  def view(self, node: int):
+    return ExprView(self.arena, node)
+
+  def isNum(self):
+    return self.kind() == NUM
+
+  def isAdd1(self):
+    return self.kind() == ADD1
+
+  def isSub1(self):
+    return self.kind() == SUB1
+
+  def isPlus(self):
+    return self.kind() == PLUS
+
+  def isMinus(self):
+    return self.kind() == MINUS
+
+  def isTimes(self):
+    return self.kind() == TIMES
+
+  def isEquals(self):
+    return self.kind() == EQUALS
+
+  def isIf(self):
+    return self.kind() == IF
+
+  def isLet(self):
+    return self.kind() == LET
+
+  def isApp(self):
+    return self.kind() == APP
+
+  def isName(self):
+    return self.kind() == NAME
+
+  def isPrintExpr(self):
+    return self.kind() == PRINTEXPR
+
+  @property
+  def value(self):
+    """The number of a Num, or the value bound by a Let"""
+    if self.isNum():
+      return self.arena.numbers[self.arena.a[self.id]]
+    return self.view(self.arena.a[self.id])
+
+  @property
+  def operand(self) -> Expr:
+    return self.view(self.arena.a[self.id])
+
+  @property
+  def left(self) -> Expr:
+    return self.view(self.arena.a[self.id])
+
+  @property
+  def right(self) -> Expr:
+    return self.view(self.arena.b[self.id])
+
+  @property
+  def cond(self) -> Expr:
+    return self.view(self.arena.a[self.id])
+
+  @property
+  def thn(self) -> Expr:
+    return self.view(self.arena.b[self.id])
+
+  @property
+  def els(self) -> Expr:
+    return self.view(self.arena.c[self.id])
+
+  @property
+  def name(self) -> str:
+    """The name of a Name, or the name bound by a Let"""
+    if self.isLet():
+      return self.arena.strings[self.arena.c[self.id]]
+    return self.arena.strings[self.arena.a[self.id]]
+
+  @property
+  def body(self) -> Expr:
+    return self.view(self.arena.b[self.id])
+
+  @property
+  def fname(self) -> str:
+    return self.arena.strings[self.arena.a[self.id]]
+
+  @property
+  def args(self) -> List[Expr]:
+    start = self.arena.b[self.id]
+    return [self.view(n) for n in self.arena.args[start:start + self.arena.c[self.id]]]
+
+  def to_expr(self) -> Expr:
+    return self.arena.to_expr(self.id)
+
+  def __eq__(self, other):
+    if isinstance(other, ExprView):
+      other = other.to_expr()
+    return self.to_expr() == other
+
+  def __str__(self):
+    return str(self.to_expr())
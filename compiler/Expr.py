@@ -2,6 +2,7 @@
 class Expr:
   """An Expr represents an expression in our language that can be 
   evaluated to produce a value (a number)"""
+  __slots__ = ()
 
   def isNum(self):
     return isinstance(self, Num)
@@ -0,0 +1,117 @@
+from typing import List
+from .Defn import *
+from .Expr import *
+from rasm.Instr import *
+from rasm.Operand import *
+
+# the classes a HashCons interns, with their fields in constructor order
+FIELDS = {
+  Num:        ["value"],
+  Add1:       ["operand"],
+  Sub1:       ["operand"],
+  Plus:       ["left", "right"],
+  Minus:      ["left", "right"],
+  Times:      ["left", "right"],
+  Equals:     ["left", "right"],
+  If:         ["cond", "thn", "els"],
+  Let:        ["name", "value", "body"],
+  App:        ["fname", "args"],
+  Name:       ["name"],
+  PrintExpr:  ["operand"],
+  Defn:       ["name", "params", "body"],
+  Mov:        ["src", "dest"],
+  Add:        ["src", "dest"],
+  Sub:        ["src", "dest"],
+  Mul:        ["src", "dest"],
+  Cmp:        ["left", "right"],
+  Label:      ["label"],
+  Jmp:        ["target"],
+  Je:         ["target"],
+  Jne:        ["target"],
+  Call:       ["target"],
+  Ret:        [],
+  Print:      ["operand"],
+  Imm:        ["value"],
+  Rans:       [],
+  Rsp:        [],
+  StackOff:   ["off"],
+}
+
+NODE_TYPES = (Expr, Defn, Instr, Operand)
+
+class Consed:
+  """Mixed into the class of every node a HashCons makes. Nodes from the
+  same HashCons are structurally equal only if they are the same node,
+  so equality is an identity check, and hashes are computed once, from
+  the (already hashed) fields. Consed nodes must not be changed"""
+
+  def __eq__(self, other):
+    if self is other:
+      return True
+    if isinstance(other, Consed) and other.consed_by is self.consed_by:
+      return False
+    return super().__eq__(other)
+
+  def __hash__(self):
+    return self.consed_hash
+
+class HashCons:
+  """Makes AST nodes (Exprs and Defns) and rasm (Instrs and Operands),
+  interning them: making a node structurally identical to one made
+  before gives back that node. Nodes are made by calling the method
+  named for their class, e.g. hc.Plus(hc.Num(1), hc.Name("x")), so a
+  HashCons is also a builder a ProgramParser can parse with"""
+
+  def __init__(self):
+    self.table = {}
+    self.made = 0     # nodes asked for
+    self.classes = { cls: type(cls.__name__, (Consed, cls), { "consed_class": cls })
+      for cls in FIELDS }
+
+  def make(self, cls, *fields):
+    """The interned node of a class with the given fields. Fields that
+    are nodes (or lists of them) are interned first, if they aren't"""
+    fields = [self.field(f) for f in fields]
+    key = (cls, *[tuple(f) if isinstance(f, list) else f for f in fields])
+    self.made += 1
+
+    node = self.table.get(key)
+    if node is None:
+      node = self.classes[cls](*fields)
+      node.consed_by = self
+      node.consed_hash = hash((cls.__name__, *key[1:]))
+      self.table[key] = node
+    return node
+
+  def field(self, f):
+    if isinstance(f, list):
+      return [self.field(x) for x in f]
+    if isinstance(f, NODE_TYPES):
+      return self.intern(f)
+    return f
+
+  def intern(self, node):
+    """The interned node structurally identical to a node"""
+    if isinstance(node, Consed) and node.consed_by is self:
+      return node
+    cls = node.consed_class if isinstance(node, Consed) else type(node)
+    return self.make(cls, *[getattr(node, f) for f in FIELDS[cls]])
+
+  def intern_all(self, nodes: list) -> list:
+    return [self.intern(node) for node in nodes]
+
+  def __len__(self) -> int:
+    """Number of distinct nodes made"""
+    return len(self.table)
+
+  def root(self, node):
+    return node
+
+def maker(cls):
+  def make(self, *fields):
+    return self.make(cls, *fields)
+  make.__name__ = cls.__name__
+  return make
+
+for cls in FIELDS:
+  setattr(HashCons, cls.__name__, maker(cls))
@@ -31,4 +31,8 @@ def function_label(name: str) -> str:
   """Gets a function's unique label name, given its source name"""
   norm = "".join([normalize(c) for c in name])
   hsh = abs(hash(name))
-  return f"function_{norm}_{hsh}"
\ No newline at end of file
+  return f"function_{norm}_{hsh}"
+
+def function_names(defns: List[Defn]) -> dict:
+  """Maps each function's label back to its source name"""
+  return { function_label(d.name): d.name for d in defns }
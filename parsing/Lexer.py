@@ -1,22 +1,18 @@
-from typing import List
+from typing import List, Iterator
+from array import array
 import re
 
 class Pattern:
-  def __init__(self, regex, make_token):
+  """The source of a regex for one kind of token, which a Lexer joins
+  with the others, and how to make a token from text it matches"""
+
+  def __init__(self, regex: str, make_token):
     self.regex = regex
     self.make_token = make_token
 
-  def match(self, text: str) -> str:
-    """If the text has a prefix matching this pattern, return
-    the prefix"""
-    m = re.match(self.regex, text)
-
-    if m is None:
-      return None
-
-    return m.group(0)
-
 class Token:
+  __slots__ = ("name", "lexeme")
+
   def __init__(self, name, lexeme):
     self.name = name
     self.lexeme = lexeme
@@ -24,45 +20,166 @@ class Token:
   def __repr__(self):
     return f"Token({self.name}, {self.lexeme})"
 
+class TokenArray:
+  """A compact sequence of tokens, kept in parallel arrays: the name of
+  each as a small int (so token names must be IntEnums), its start and
+  end offsets in the source (-1 if not known), and its lexeme. Tokens
+  are only made as objects when indexed, and those without a lexeme
+  (punctuation and keywords) are one shared Token per name"""
+
+  def __init__(self, tokens=()):
+    self.kinds = array("B")
+    self.starts = array("q")
+    self.ends = array("q")
+    self.lexemes = []
+    self.names = {}       # the token name of each kind
+    self.singletons = {}  # the shared token of each kind without a lexeme
+    for tok in tokens:
+      self.append(tok)
+
+  def append(self, token: Token, start=-1, end=-1):
+    self.add_name(token.name)
+    self.kinds.append(token.name)
+    self.starts.append(start)
+    self.ends.append(end)
+    self.lexemes.append(token.lexeme)
+
+  def add_name(self, name):
+    if name not in self.names:
+      self.names[name] = name
+      self.singletons[name] = Token(name, None)
+
+  def __len__(self) -> int:
+    return len(self.kinds)
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [self[j] for j in range(*i.indices(len(self)))]
+    lexeme = self.lexemes[i]
+    if lexeme is None:
+      return self.singletons[self.kinds[i]]
+    return Token(self.names[self.kinds[i]], lexeme)
+
+  def __delitem__(self, i: slice):
+    del self.kinds[i]
+    del self.starts[i]
+    del self.ends[i]
+    del self.lexemes[i]
+
+  def __iter__(self) -> Iterator[Token]:
+    for i in range(len(self)):
+      yield self[i]
+
 class Lexer:
+  """Lexes with a list of patterns, compiled together into one regex
+  that is an alternation of them all. Where more than one pattern could
+  match, the first in the list wins, so patterns that can match longer
+  text (e.g. negative numbers vs minus) must come first. Keywords are
+  best matched by the symbol pattern, and told apart in its make_token.
+
+  Programs can also be lexed as bytes (or any buffer, like an mmap),
+  with the patterns compiled as bytes regexes. make_token is then given
+  lexemes as bytes, and must decode those it keeps"""
+
   def __init__(self, patterns):
     self.patterns = patterns
+    master = "|".join(f"(?P<t{i}>{patterns[i].regex})" for i in range(len(patterns)))
+    self.regex = re.compile(master)
+    self.bytes_regex = re.compile(master.encode())
+    self.make_tokens = { f"t{i}": patterns[i].make_token for i in range(len(patterns)) }
+
+  def regex_for(self, pgrm):
+    return self.regex if isinstance(pgrm, str) else self.bytes_regex
+
+  def lex(self, pgrm, start=0, end=None) -> TokenArray:
+    """Lex a program (a string, or bytes) to produce an array of tokens.
+    Each distinct lexeme is made into a token once, and the token shared.
+    Only the program between start and end is lexed, if given"""
+    tokens = TokenArray()
+    (kinds, starts, ends, lexemes) = \
+      (tokens.kinds.append, tokens.starts.append, tokens.ends.append, tokens.lexemes.append)
+    match = self.regex_for(pgrm).match
+    make_tokens = self.make_tokens
+    interned = { group: {} for group in make_tokens }
+    pos = start
+    end = len(pgrm) if end is None else end
 
-  def lex(self, pgrm: str) -> List[Token]:
-    """Lex a program to produce a list of tokens"""
-    tokens = []
     # while there are tokens left to lex
-    while len(pgrm) > 0:
-      longest_mat = None
-      longest_mat_token = None
-
-      for pat in self.patterns:
-        mat = pat.match(pgrm)
-        if mat is None:
-          continue
-
-        # new longest match, replace old
-        if longest_mat is None or len(mat) > len(longest_mat):
-          longest_mat = mat
-          longest_mat_token = pat.make_token(mat)
-      
-      # didn't match any pattern
-      if longest_mat is None: 
-        raise LexError(f"invalid token at \"{recover_bad_token(pgrm)}\"")
+    while pos < end:
+      m = match(pgrm, pos, end)
 
-      after_mat = len(longest_mat)
-      assert after_mat > 0
+      # didn't match any pattern
+      if m is None:
+        raise LexError(f"invalid token at \"{recover_bad_token(pgrm, pos)}\"")
+
+      # find the token for this lexeme, making it if it is new
+      group = m.lastgroup
+      text = m.group()
+      seen = interned[group]
+      token = seen.get(text, UNSEEN)
+      if token is UNSEEN:
+        token = seen[text] = make_tokens[group](text)
+        if token is not None:
+          tokens.add_name(token.name)
 
       # add token and move past lexeme in input
-      if longest_mat_token is not None:
-        tokens.append(longest_mat_token)
-      pgrm = pgrm[after_mat:]
+      if token is not None:
+        kinds(token.name)
+        starts(pos)
+        ends(m.end())
+        lexemes(token.lexeme)
+      assert m.end() > pos
+      pos = m.end()
 
     return tokens
 
-def recover_bad_token(stream: str) -> str:
-  """Pull the leading non-whitespace string off the input stream"""
-  return stream.split(' ')[0]
+  def lex_iter(self, file, chunk_size=65536) -> Iterator[Token]:
+    """Lex a program read from a file object in chunks, yielding tokens
+    as they are found. Only the unlexed end of the last chunk or two is
+    kept in memory. Files opened in binary mode are lexed as bytes"""
+    buf = file.read(chunk_size)
+    match = self.regex_for(buf).match
+    make_tokens = self.make_tokens
+    pos = 0
+    eof = len(buf) == 0
+
+    while True:
+      m = match(buf, pos) if pos < len(buf) else None
+
+      # read more if a token might continue past what is buffered,
+      # or be lexed differently once more input is seen
+      if not eof and (m is None or len(buf) - m.end() < LOOKAHEAD):
+        chunk = file.read(chunk_size)
+        eof = len(chunk) == 0
+        buf = buf[pos:] + chunk
+        pos = 0
+        continue
+
+      if m is None:
+        if pos >= len(buf):
+          return
+        raise LexError(f"invalid token at \"{recover_bad_token(buf, pos)}\"")
+
+      token = make_tokens[m.lastgroup](m.group())
+      if token is not None:
+        yield token
+      assert m.end() > pos
+      pos = m.end()
+
+UNSEEN = object()
+
+# input the streaming lexer keeps buffered past a match before trusting
+# it, as a pattern may match differently given more (e.g. "5" vs "5.25")
+LOOKAHEAD = 64
+
+def recover_bad_token(stream, pos=0) -> str:
+  """Pull the non-whitespace string at a position off the input stream"""
+  if isinstance(stream, str):
+    end = stream.find(' ', pos)
+    return stream[pos:end if end >= 0 else len(stream)]
+
+  end = stream.find(b' ', pos)
+  return bytes(stream[pos:end if end >= 0 else len(stream)]).decode(errors="replace")
 
 class LexError(Exception):
   def __init__(self, msg: str):
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Iterable
 from .Lexer import *
 
 class Parser:
@@ -6,14 +6,50 @@ class Parser:
   def __init__(self, display_token_name):
     self.display_token_name = display_token_name
 
-  def setup(self, tokens: List[Token]):
+  def setup(self, tokens: Iterable[Token]):
     """Resets the parser state"""
-    self.tokens = tokens
+    self.tokens = tokens if isinstance(tokens, TokenArray) else TokenArray(tokens)
+    self.kinds = self.tokens.kinds
     self.index = 0
+    self.source = None
+
+  def setup_stream(self, tokens: Iterable[Token]):
+    """Resets the parser state to parse tokens as they are produced,
+    buffering only those not yet parsed (see compact)"""
+    self.tokens = TokenArray()
+    self.kinds = self.tokens.kinds
+    self.index = 0
+    self.source = iter(tokens)
+
+  def fill(self, n: int) -> bool:
+    """Make sure n tokens from the current one on are buffered,
+    returning whether the input has that many"""
+    while len(self.kinds) - self.index < n:
+      if self.source is None:
+        return False
+      tok = next(self.source, None)
+      if tok is None:
+        self.source = None
+        return False
+      self.tokens.append(tok)
+    return True
+
+  def compact(self):
+    """When streaming, drop the tokens already parsed from the buffer"""
+    if self.source is not None:
+      del self.tokens[:self.index]
+      self.index = 0
 
   def empty(self) -> bool:
     """Have all tokens been processed"""
-    return self.index >= len(self.tokens)
+    return self.index >= len(self.kinds) and not self.fill(1)
+
+  def peek_name(self):
+    """Name of the current token (as an int), or None if all
+    have been processed"""
+    if self.index < len(self.kinds) or self.fill(1):
+      return self.kinds[self.index]
+    return None
 
   def peek(self) -> Token:
     """Peek at the input stream at the current token"""
@@ -25,18 +61,26 @@ class Parser:
     """Move past the current token, returning it"""
     if self.empty():
       raise ParseError("unexpected end of program")
-    tok = self.peek()
+    tok = self.tokens[self.index]
     self.index += 1
     return tok
 
+  def next_lexeme(self):
+    """Move past the current token, returning its lexeme"""
+    if self.empty():
+      raise ParseError("unexpected end of program")
+    lexeme = self.tokens.lexemes[self.index]
+    self.index += 1
+    return lexeme
+
   def eat(self, tok_name):
     """Consume the next token in the input stream,
     erroring if it is not what is expected"""
-    if self.empty():
+    actual_tok_name = self.peek_name()
+    if actual_tok_name is None:
       raise ParseError(
         f"unexpected end of program, wanted {self.display_token_name(tok_name)}")
 
-    actual_tok_name = self.tokens[self.index].name
     if actual_tok_name == tok_name:
       self.index += 1
     else:
@@ -55,17 +99,17 @@ class Parser:
     if self.empty():
       return False
     else:
-      return self.peek().name == name
+      return self.kinds[self.index] == name
 
   def matches_prefix(self, prefix: list) -> bool:
     """Given a prefix of token names, determine if the 
     front of the token stream matches the prefix"""
     # if there aren't enough tokens to match the whole prefix, no
-    if len(self.tokens) - self.index < len(prefix):
+    if not self.fill(len(prefix)):
       return False
 
     for i in range(len(prefix)):
-      if self.tokens[self.index + i].name != prefix[i]:
+      if self.kinds[self.index + i] != prefix[i]:
         return False
     return True
 
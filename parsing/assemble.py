@@ -0,0 +1,127 @@
+import re
+from typing import List, Tuple
+from rasm.Instr import *
+from rasm.Operand import *
+from .parse_rasm import KEYWORDS, parse_rasm
+
+# a single instruction (or label) on a line, as rasm is usually written
+NUM = r"-?[0-9]+(?:\.[0-9]+)?"
+NAME = r"[a-zA-Z][a-zA-Z0-9_]*"
+OPERAND = rf"(?:{NUM}|rans|rsp|\[\s*rsp\s*\+\s*{NUM}\s*\])(?![a-zA-Z0-9_])"
+END = r"(?![a-zA-Z0-9_])\s*"
+LINE = re.compile(
+  rf"\s*(?:(?P<label>{NAME})\s*:"
+  rf"|(?P<bin_op>mov|add|sub|mul|cmp){END}(?P<src>{OPERAND})\s*,\s*(?P<dest>{OPERAND})"
+  rf"|(?P<jump>jmp|je|jne|call){END}(?P<target>{NAME})"
+  rf"|(?P<ret>ret)"
+  rf"|print{END}(?P<operand>{OPERAND})"
+  rf")?\s*")
+LINE_BYTES = re.compile(LINE.pattern.encode())
+
+STACK_OFF = re.compile(rf"\[\s*rsp\s*\+\s*({NUM})\s*\]")
+
+BIN_OPS = { "mov": Mov, "add": Add, "sub": Sub, "mul": Mul, "cmp": Cmp }
+JUMPS = { "jmp": Jmp, "je": Je, "jne": Jne, "call": Call }
+BIN_OPS_BYTES = { op.encode(): cls for (op, cls) in BIN_OPS.items() }
+JUMPS_BYTES = { op.encode(): cls for (op, cls) in JUMPS.items() }
+
+class Unassembled(Exception):
+  """A line the assembler doesn't handle (it may still be valid rasm)"""
+
+class Assembler:
+  """Assembles rasm written one instruction (or label) per line, as the
+  compilers write it, in a single pass: each line is matched by one
+  regex. Labels and operands are interned, so a label is one string
+  however often it is used, and equal operands are one object.
+
+  Programs can also be bytes (or any buffer, like an mmap), matched
+  line by line in place with a bytes regex. Only the text of new labels
+  and operands is decoded"""
+
+  def __init__(self):
+    self.labels = {}
+    self.operands = {}
+    self.label_addrs = {}
+    self.duplicate_label = False
+
+  def assemble(self, pgrm) -> List[Instr]:
+    instrs = []
+    if isinstance(pgrm, str):
+      (match, newline, bin_ops, jumps) = (LINE.fullmatch, "\n", BIN_OPS, JUMPS)
+    else:
+      (match, newline, bin_ops, jumps) = (LINE_BYTES.fullmatch, b"\n", BIN_OPS_BYTES, JUMPS_BYTES)
+
+    pos = 0
+    while pos <= len(pgrm):
+      end = pgrm.find(newline, pos)
+      if end < 0:
+        end = len(pgrm)
+      m = match(pgrm, pos, end)
+      if m is None:
+        raise Unassembled(pgrm[pos:end])
+      pos = end + 1
+
+      group = m.lastgroup
+      if group is None:
+        continue
+      elif group == "label":
+        label = self.label(m.group("label"))
+        if label in self.label_addrs:
+          self.duplicate_label = True
+        self.label_addrs[label] = len(instrs) + 1
+        instrs.append(Label(label))
+      elif group == "dest":
+        instrs.append(bin_ops[m.group("bin_op")](
+          self.operand(m.group("src")), self.operand(m.group("dest"))))
+      elif group == "target":
+        instrs.append(jumps[m.group("jump")](self.label(m.group("target"))))
+      elif group == "ret":
+        instrs.append(Ret())
+      else:
+        instrs.append(Print(self.operand(m.group("operand"))))
+    return instrs
+
+  def label(self, text) -> str:
+    label = self.labels.get(text)
+    if label is None:
+      label = text if isinstance(text, str) else text.decode()
+      if label in KEYWORDS:
+        raise Unassembled(label)
+      self.labels[text] = label
+    return label
+
+  def operand(self, text) -> Operand:
+    op = self.operands.get(text)
+    if op is None:
+      op = self.operands[text] = make_operand(text if isinstance(text, str) else text.decode())
+    return op
+
+def make_operand(text: str) -> Operand:
+  if text == "rans":
+    return Rans()
+  elif text == "rsp":
+    return Rsp()
+  elif text[0] == "[":
+    off = float(STACK_OFF.fullmatch(text).group(1))
+    if not (off.is_integer() and off >= 0):
+      raise Unassembled(text)
+    return StackOff(int(off))
+  return Imm(float(text))
+
+def assemble_linked(pgrm) -> Tuple[List[Instr], dict]:
+  """Assembles a rasm program (a string, or bytes) into instructions,
+  and the address of the instruction after each label, as a VM maps
+  them when loading (None if a label is defined twice, for the VM to
+  report). Programs not laid out one instruction per line are parsed
+  with parse_rasm, which also reports any errors in them"""
+  try:
+    assembler = Assembler()
+    instrs = assembler.assemble(pgrm)
+  except Unassembled:
+    return (parse_rasm(pgrm), None)
+  return (instrs, None if assembler.duplicate_label else assembler.label_addrs)
+
+def assemble(pgrm) -> List[Instr]:
+  """Assembles a rasm program into a list of instructions,
+  as parse_rasm does, but faster"""
+  return assemble_linked(pgrm)[0]
@@ -0,0 +1,233 @@
+from bisect import bisect_right
+from typing import List, Tuple
+from compiler.Defn import *
+from compiler.Expr import *
+from .parse_program import lexer
+from .parallel import PRESCAN, ChunkResult, parse_chunk, merge
+
+class Shifted:
+  """A non-decreasing list of ints, where an edit adds the same amount to
+  every value after the ones it replaces. That amount is applied lazily:
+  values from index `gap` on are stored less `delta`, and the gap moves
+  (as in a gap buffer) to where the next edit is, so a run of edits near
+  each other only costs what they change, however long the list is"""
+
+  def __init__(self, values: List[int]):
+    self.values = values
+    self.gap = len(values)
+    self.delta = 0
+
+  def __len__(self) -> int:
+    return len(self.values)
+
+  def __getitem__(self, i: int) -> int:
+    return self.values[i] + (self.delta if i >= self.gap else 0)
+
+  def move_gap(self, i: int):
+    (values, gap, delta) = (self.values, self.gap, self.delta)
+    if i < gap:
+      values[i:gap] = [v - delta for v in values[i:gap]]
+    elif i > gap:
+      values[gap:i] = [v + delta for v in values[gap:i]]
+    self.gap = i
+
+  def splice(self, start: int, stop: int, new: List[int], shift: int):
+    """Replaces the values from start to stop with new ones, adding
+    shift to every value after them"""
+    self.move_gap(stop)
+    self.values[start:stop] = new
+    self.gap = start + len(new)
+    self.delta += shift
+
+  def index_above(self, x: int) -> int:
+    """Index of the first value greater than x (or the length)"""
+    (values, gap) = (self.values, self.gap)
+    if gap > 0 and values[gap - 1] > x:
+      return bisect_right(values, x, 0, gap)
+    return bisect_right(values, x - self.delta, gap, len(values))
+
+class ParseSession:
+  """Parses a program, then re-parses it as it is edited. The program is
+  kept split into spans, each ending just past one top-level form (and
+  so holding it, and any comments and atoms before it), and then the
+  tail of the program. An edit re-lexes and re-parses only the spans it
+  touches (more, if it changes where forms end), and the Defns and Exprs
+  of other spans are reused as they are.
+
+  The end of each span, and the number of defns and exprs up to it, are
+  Shifted lists, and the program's defns and exprs, the names defined,
+  and whether forms are out of order are kept up to date as spans are
+  replaced. So an edit to a correct program costs about the size of the
+  edit (and of moving memory around), not of the program. While the
+  program has errors, parse walks the spans to report the first one"""
+
+  def __init__(self, pgrm=""):
+    self.text = ""
+    self.ends = Shifted([0])
+    self.results = [ChunkResult()]
+    self.defn_counts = Shifted([0])   # defns up to the end of each span
+    self.expr_counts = Shifted([0])
+    self.defns = []
+    self.exprs = []
+    self.failed = set()     # results of spans that failed to lex or parse
+    self.inversions = 0     # spans with defns that follow ones with exprs
+    self.name_counts = {}
+    self.duplicates = 0     # defns with a name defined before
+    self.reparsed = 0       # spans parsed by the last edit
+    self.apply(0, 0, pgrm)
+
+  def parse(self) -> Tuple[List[Defn], List[Expr]]:
+    """The current program's defns and exprs, or the error parsing it
+    raises, as parse_program would"""
+    if len(self.failed) == 0 and self.inversions == 0 and self.duplicates == 0:
+      return (list(self.defns), list(self.exprs))
+
+    for i in range(len(self.results)):
+      if self.results[i].lex_error is not None:
+        # lex it again, as the error shows the text after the bad
+        # token, which may be in other spans, and have been edited
+        lexer.lex(self.text, self.start(i), self.ends[i])
+    return merge(self.results)
+
+  def edit(self, start: int, end: int, text: str) -> Tuple[List[Defn], List[Expr]]:
+    """Replaces the text between two offsets, and parses the result"""
+    self.apply(start, end, text)
+    return self.parse()
+
+  def apply(self, start: int, end: int, text: str):
+    """Replaces the text between two offsets, re-parsing the spans that
+    changes, but not raising any error found"""
+    if not (0 <= start <= end <= len(self.text)):
+      raise ValueError(f"edit of {start}:{end} is outside the program (length {len(self.text)})")
+    self.text = self.text[:start] + text + self.text[end:]
+    delta = len(text) - (end - start)
+
+    # the first span the edit could change (spans ending in a form are
+    # unchanged by edits just after their close paren)
+    first = min(self.ends.index_above(start), len(self.ends) - 1)
+
+    # find the new form ends from there, until one falls where an old
+    # span (shifted by the edit) ended: the spans after it are unchanged
+    new_ends = []
+    old = first
+    stop = None
+    for form_end in self.form_ends(self.start(first)):
+      new_ends.append(form_end)
+      if form_end < start + len(text):
+        continue
+      while old < len(self.ends) and self.ends[old] + delta < form_end:
+        old += 1
+      if old < len(self.ends) and self.ends[old] + delta == form_end and \
+        self.ends[old] >= end:
+        stop = old + 1
+        break
+
+    if stop is None:
+      # the rest of the program is new spans, ending with its tail
+      new_ends.append(len(self.text))
+      stop = len(self.ends)
+
+    pos = self.start(first)
+    new_results = []
+    for form_end in new_ends:
+      new_results.append(parse_chunk(self.text, pos, form_end))
+      pos = form_end
+    self.replace(first, stop, new_ends, new_results, delta)
+    self.reparsed = len(new_results)
+
+  def replace(self, first: int, stop: int, new_ends: List[int], new_results: List[ChunkResult], delta: int):
+    """Replaces the spans from first to stop with new ones, updating
+    what is kept about the whole program"""
+    self.count_inversions(first, stop, -1)
+    for result in self.results[first:stop]:
+      self.failed.discard(result)
+      for d in defns_of(result):
+        self.count_name(d.name, -1)
+
+    # where the spans' defns and exprs are in the program's
+    defns_before = self.defn_counts[first - 1] if first > 0 else 0
+    exprs_before = self.expr_counts[first - 1] if first > 0 else 0
+    old_defns = self.defn_counts[stop - 1] - defns_before
+    old_exprs = self.expr_counts[stop - 1] - exprs_before
+
+    (defns, exprs, defn_counts, expr_counts) = ([], [], [], [])
+    for result in new_results:
+      if result.lex_error is not None or result.parse_error is not None:
+        self.failed.add(result)
+      for form in result.forms:
+        if isinstance(form, Defn):
+          defns.append(form)
+          self.count_name(form.name, 1)
+        else:
+          exprs.append(form)
+      defn_counts.append(defns_before + len(defns))
+      expr_counts.append(exprs_before + len(exprs))
+
+    self.defns[defns_before:defns_before + old_defns] = defns
+    self.exprs[exprs_before:exprs_before + old_exprs] = exprs
+    self.defn_counts.splice(first, stop, defn_counts, len(defns) - old_defns)
+    self.expr_counts.splice(first, stop, expr_counts, len(exprs) - old_exprs)
+    self.ends.splice(first, stop, new_ends, delta)
+    self.results[first:stop] = new_results
+    self.count_inversions(first, first + len(new_results), 1)
+
+  def count_inversions(self, first: int, stop: int, sign: int):
+    """Counts (with sign) the spans from first to stop, and the one after
+    them, that have defns but follow a span that has exprs. Spans that
+    lex and parse hold defns and then exprs, and all but the tail hold a
+    form, so a correct program has none"""
+    for i in range(max(first, 1), min(stop + 1, len(self.results))):
+      prev = self.results[i - 1].forms
+      forms = self.results[i].forms
+      if len(prev) > 0 and len(forms) > 0 and \
+        not isinstance(prev[-1], Defn) and isinstance(forms[0], Defn):
+        self.inversions += sign
+
+  def count_name(self, name: str, n: int):
+    count = self.name_counts.get(name, 0)
+    self.duplicates += max(count + n - 1, 0) - max(count - 1, 0)
+    if count + n == 0:
+      del self.name_counts[name]
+    else:
+      self.name_counts[name] = count + n
+
+  def start(self, i: int) -> int:
+    """Offset the i-th span starts at"""
+    return self.ends[i - 1] if i > 0 else 0
+
+  def update(self, pgrm: str) -> Tuple[List[Defn], List[Expr]]:
+    """Parses a new version of the program, re-parsing only the part
+    that differs from the current one (e.g. when a file is saved)"""
+    prefix = common_prefix(self.text, pgrm)
+    suffix = common_prefix(self.text[prefix:][::-1], pgrm[prefix:][::-1])
+    return self.edit(prefix, len(self.text) - suffix, pgrm[prefix:len(pgrm) - suffix])
+
+  def form_ends(self, pos: int):
+    """Offsets just past each top-level form from pos on, as in
+    parallel.form_ends (pos must not be inside a form)"""
+    depth = 0
+    for m in PRESCAN.finditer(self.text, pos):
+      paren = m.group()
+      if paren == "(":
+        depth += 1
+      elif paren == ")":
+        depth -= 1
+        if depth == 0:
+          yield m.end()
+        elif depth < 0:
+          return
+
+def defns_of(result: ChunkResult) -> List[Defn]:
+  return [form for form in result.forms if isinstance(form, Defn)]
+
+def common_prefix(a: str, b: str) -> int:
+  """Length of the longest common prefix of two strings, found by
+  comparing halves (so mostly in C)"""
+  (lo, hi) = (0, min(len(a), len(b)))
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[lo:mid] == b[lo:mid]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
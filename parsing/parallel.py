@@ -0,0 +1,132 @@
+import os
+import re
+from functools import partial
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from compiler.Defn import *
+from compiler.Expr import *
+from .Lexer import *
+from .Parser import *
+from .parse_program import Tok, display_token_name, lexer, make_parser, check_unique
+
+# parens, and comments (which may contain parens) to skip
+PRESCAN = re.compile(r"[()]|;[^\n]*")
+PRESCAN_BYTES = re.compile(PRESCAN.pattern.encode())
+
+def form_ends(pgrm) -> List[int]:
+  """Offsets just past each top-level form that ends in a paren, found
+  by tracking paren depth. Splitting a program at these never splits a
+  token or a form. Scanning stops at an unbalanced close paren, which
+  the parser will reject"""
+  regex = PRESCAN if isinstance(pgrm, str) else PRESCAN_BYTES
+  (open_paren, close_paren) = ("(", ")") if isinstance(pgrm, str) else (b"(", b")")
+
+  ends = []
+  depth = 0
+  for m in regex.finditer(pgrm):
+    paren = m.group()
+    if paren == open_paren:
+      depth += 1
+    elif paren == close_paren:
+      depth -= 1
+      if depth == 0:
+        ends.append(m.end())
+      elif depth < 0:
+        break
+  return ends
+
+def split_chunks(pgrm, n: int) -> List[Tuple[int, int]]:
+  """Split a program into about n spans of similar size, at form ends"""
+  target = max(len(pgrm) // max(n, 1), 1)
+  spans = []
+  start = 0
+  for end in form_ends(pgrm):
+    if end - start >= target:
+      spans.append((start, end))
+      start = end
+  if start < len(pgrm) or len(spans) == 0:
+    spans.append((start, len(pgrm)))
+  return spans
+
+class ChunkResult:
+  """The forms parsed from one chunk of a program, in order, and
+  the error that stopped lexing or parsing it, if any"""
+
+  def __init__(self):
+    self.forms = []
+    self.starts_with_defn = False
+    self.lex_error = None
+    self.parse_error = None
+
+def parse_chunk(chunk, start=0, end=None, builder_class=None) -> ChunkResult:
+  """Lex and parse one chunk of a program (or the part of it between
+  start and end), with a new builder of the given class if there is one
+  (e.g. ExprArena). Run in worker processes"""
+  result = ChunkResult()
+  try:
+    tokens = lexer.lex(chunk, start, end)
+  except LexError as err:
+    result.lex_error = err
+    return result
+
+  result.starts_with_defn = [tok.name for tok in tokens[:2]] == [Tok.LPAREN, Tok.DEF]
+  parser = make_parser(builder_class() if builder_class is not None else None)
+  parser.setup(tokens)
+  try:
+    for form in parser.forms():
+      result.forms.append(form)
+  except ParseError as err:
+    result.parse_error = err
+  return result
+
+def merge(results: List[ChunkResult]) -> Tuple[List[Defn], List[Expr]]:
+  """Combine the parsed chunks of a program in source order, raising the
+  error parsing the whole program at once would have raised first"""
+  # the whole program is lexed before any of it is parsed
+  for result in results:
+    if result.lex_error is not None:
+      raise result.lex_error
+
+  defns = []
+  exprs = []
+  for result in results:
+    # defns after the first expression parse as bad applications
+    if len(exprs) > 0 and result.starts_with_defn:
+      raise ParseError(
+        f"invalid function in application: {display_token_name(Tok.DEF)}")
+    for form in result.forms:
+      if isinstance(form, Defn):
+        defns.append(form)
+      else:
+        exprs.append(form)
+    if result.parse_error is not None:
+      raise result.parse_error
+
+  defn_names = set()
+  for d in defns:
+    check_unique(d, defn_names)
+
+  return (defns, exprs)
+
+def parse_program_parallel(pgrm, jobs=None, chunks_per_job=4, builder_class=None) -> Tuple[List[Defn], List[Expr]]:
+  """Parses a program (a string, or bytes) like parse_program, but splits
+  it into chunks of whole top-level forms, and lexes and parses those on
+  a pool of `jobs` processes (by default, one per CPU). Given a builder
+  class, each chunk is built with its own builder of that class"""
+  jobs = jobs if jobs is not None else os.cpu_count() or 1
+  spans = split_chunks(pgrm, jobs * chunks_per_job)
+  chunks = [pgrm[start:end] for (start, end) in spans]
+
+  parse = partial(parse_chunk, builder_class=builder_class)
+  if jobs <= 1 or len(chunks) <= 1:
+    results = [parse(chunk) for chunk in chunks]
+  else:
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+      results = list(pool.map(parse, chunks))
+
+  for ((start, end), result) in zip(spans, results):
+    if result.lex_error is not None:
+      # lex it again in place, as the error shows the text after the
+      # bad token, which may run past the end of the chunk
+      lexer.lex(pgrm, start, end)
+  return merge(results)
@@ -1,14 +1,45 @@
-from typing import List, Tuple
-from enum import Enum, auto
+from typing import List, Tuple, Iterable, Iterator, Union
+from enum import IntEnum, auto
 from compiler.Defn import *
 from compiler.Expr import *
+from compiler.Arena import ExprArena
 from .Lexer import *
 from .Parser import *
 
+class ExprBuilder:
+  """Makes the AST as a program is parsed: a builder has a method per
+  kind of Expr (and Defn), called with the parsed fields of each form,
+  subexpressions given as the nodes it made for them, and root, called
+  on each node parsed as a top-level expression to get the expression
+  returned. This one makes Expr objects, see ExprArena for another"""
+  Num = Num
+  Add1 = Add1
+  Sub1 = Sub1
+  Plus = Plus
+  Minus = Minus
+  Times = Times
+  Equals = Equals
+  If = If
+  Let = Let
+  App = App
+  Name = Name
+  PrintExpr = PrintExpr
+  Defn = Defn
+
+  def root(self, node: Expr) -> Expr:
+    return node
+
 class ProgramParser(Parser):
 
-  def __init__(self, display_token_name):
+  def __init__(self, display_token_name, builder=None):
     super().__init__(display_token_name)
+    self.builder = builder if builder is not None else ExprBuilder()
+
+    # the dispatch tables, with the builder's methods as constructors
+    self.form_table = { kind: (open_form, getattr(self.builder, constructor.__name__), nargs)
+      for (kind, (open_form, constructor, nargs)) in FORMS.items() }
+    self.atom_table = { kind: getattr(self.builder, constructor.__name__)
+      for (kind, constructor) in ATOMS.items() }
 
   def parse(self, tokens: List[Token]) -> Tuple[List[Defn], List[Expr]]:
     """Parses a full program (defns and then a body) from its 
@@ -16,27 +47,44 @@ class ProgramParser(Parser):
     # initialize parser state
     self.setup(tokens)
 
-    # parse any defns in the program
+    # parse any defns in the program, and expressions for the rest of it
     defns = []
-    defn_prefix = [Tok.LPAREN, Tok.DEF]
-    while self.matches_prefix(defn_prefix):
-      defns.append(self.parse_defn())
-
-    # parse expressions for the rest of the program
     exprs = []
-    while self.index < len(self.tokens):
-      exprs.append(self.parse_expr())
+    for form in self.forms():
+      if isinstance(form, Defn):
+        defns.append(form)
+      else:
+        exprs.append(form)
 
     # check defns for uniqueness
     defn_names = set()
     for d in defns:
-      if d.name in defn_names:
-        raise ParseError(f"function {d.name} defined more than once")
-      else:
-        defn_names.add(d.name)
+      check_unique(d, defn_names)
 
     return (defns, exprs)
 
+  def parse_iter(self, tokens: Iterable[Token]) -> Iterator[Union[Defn, Expr]]:
+    """Parses a program from a stream of tokens, yielding each defn and
+    then each body expression as soon as it has been parsed"""
+    self.setup_stream(tokens)
+
+    defn_names = set()
+    for form in self.forms():
+      if isinstance(form, Defn):
+        check_unique(form, defn_names)
+      yield form
+
+  def forms(self) -> Iterator[Union[Defn, Expr]]:
+    """Parses the defns and then the expressions of a program, one by one"""
+    defn_prefix = [Tok.LPAREN, Tok.DEF]
+    while self.matches_prefix(defn_prefix):
+      yield self.parse_defn()
+      self.compact()
+
+    while not self.empty():
+      yield self.builder.root(self.parse_expr())
+      self.compact()
+
   def parse_defn(self) -> Defn:
     if self.empty():
       raise ParseError("unexpected end of program: expected a defn")
@@ -65,118 +113,104 @@ class ProgramParser(Parser):
     body = self.parse_expr()
     self.eat(Tok.RPAREN)
 
-    return Defn(fname, params, body)
+    return self.builder.Defn(fname, params, body)
 
-  def parse_expr(self) -> Expr:
-    """Parses an expression off the input stream"""
-    if self.empty():
-      raise ParseError("unexpected end of program: expected expression")
-
-    if self.matches(Tok.LPAREN):
-      self.eat(Tok.LPAREN)
-
-      if self.matches(Tok.ADD1):
-        self.eat(Tok.ADD1)
-        operand = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Add1(operand)
-
-      elif self.matches(Tok.SUB1):
-        self.eat(Tok.SUB1)
-        operand = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Sub1(operand)
-
-      elif self.matches(Tok.PLUS):
-        self.eat(Tok.PLUS)
-        left = self.parse_expr()
-        right = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Plus(left, right)
-
-      elif self.matches(Tok.MINUS):
-        self.eat(Tok.MINUS)
-        left = self.parse_expr()
-        right = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Minus(left, right)
-
-      elif self.matches(Tok.TIMES):
-        self.eat(Tok.TIMES)
-        left = self.parse_expr()
-        right = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Times(left, right)
-
-      elif self.matches(Tok.EQUALS):
-        self.eat(Tok.EQUALS)
-        left = self.parse_expr()
-        right = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return Equals(left, right)
-
-      elif self.matches(Tok.PRINTEXPR):
-        self.eat(Tok.PRINTEXPR)
-        operand = self.parse_expr()
-        self.eat(Tok.RPAREN)
-
-        return PrintExpr(operand)
-
-      # conditionals
-      elif self.matches(Tok.IF):
-        self.eat(Tok.IF)
-        cond = self.parse_expr()
-        thn = self.parse_expr()
-        els = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        return If(cond, thn, els)
-
-      # let bindings
-      elif self.matches(Tok.LET):
-        self.eat(Tok.LET)
-        self.eat(Tok.LPAREN)
-
-        if not self.matches(Tok.SYM):
-          raise ParseError(
-            f"invalid identifier name: {display_token_name(self.peek().name)}")
-        
-        name = self.next().lexeme
-        value = self.parse_expr()
-        self.eat(Tok.RPAREN)
-        body = self.parse_expr()
-        self.eat(Tok.RPAREN)
+  def parse_expr(self):
+    """Parses an expression off the input stream, returning the node the
+    builder made for it. Forms are parsed with an explicit stack rather
+    than recursively, so any depth can be parsed"""
+    (forms, atoms) = (self.form_table, self.atom_table)
+    (app, let) = (forms[Tok.SYM][1], forms[Tok.LET][1])
 
-        return Let(name, value, body)
+    # forms whose subexpressions are being parsed, innermost last, each
+    # [constructor, number of args, args so far]. Applications take
+    # args until a close paren, and have None as their number of args
+    frames = []
 
-      # must be an App
-      else:
-        if not self.matches(Tok.SYM):
+    while True:
+      kind = self.peek_name()
+      if kind is None:
+        raise ParseError("unexpected end of program: expected expression")
+
+      if kind == Tok.LPAREN:
+        self.index += 1
+        kind = self.peek_name()
+
+        # anything but a keyword opening a form must be an App
+        form = forms.get(kind)
+        if form is None:
           raise ParseError(
             f"invalid function in application: {display_token_name(self.peek().name)}")
 
-        name = self.next().lexeme
-        args = []
-        while not self.matches(Tok.RPAREN):
-          args.append(self.parse_expr())
-        
-        self.eat(Tok.RPAREN)
-        return App(name, args)
-
-    # number literals
-    elif self.matches(Tok.NUM):
-      n = self.next().lexeme
-      return Num(n)
-
-    # identifier names
-    elif self.matches(Tok.SYM):
-      name = self.next().lexeme
-      return Name(name)
-
-    else:
+        (open_form, constructor, nargs) = form
+        frames.append([constructor, nargs, open_form(self)])
+
+        # parse the form's first subexpression next, unless
+        # it applies a function to no args
+        if nargs is not None or self.peek_name() != Tok.RPAREN:
+          continue
+        self.index += 1
+        exp = app(frames.pop()[2][0], [])
+
+      # literals and identifier names
+      elif kind in atoms:
+        exp = atoms[kind](self.next_lexeme())
+
+      else:
+        raise ParseError(
+          f"invalid expression near {display_token_name(kind)}")
+
+      # pass the finished expression to the form it is in,
+      # finishing that form too if it was the last subexpression
+      while len(frames) > 0:
+        (constructor, nargs, args) = frames[-1]
+        args.append(exp)
+
+        if nargs is None:
+          if self.peek_name() != Tok.RPAREN:
+            break
+          self.index += 1
+          exp = app(args[0], args[1:])
+        elif len(args) < nargs:
+          # the binding of a let closes before its body
+          if constructor is let:
+            self.eat(Tok.RPAREN)
+          break
+        else:
+          self.eat(Tok.RPAREN)
+          exp = constructor(*args)
+
+        frames.pop()
+      else:
+        return exp
+
+  def open_form(self) -> list:
+    """Parses the keyword opening a form, returning its args so far"""
+    self.index += 1
+    return []
+
+  def open_let(self) -> list:
+    """Parses a let up to the value bound, returning the name bound"""
+    self.eat(Tok.LET)
+    self.eat(Tok.LPAREN)
+
+    if not self.matches(Tok.SYM):
       raise ParseError(
-        f"invalid expression near {display_token_name(self.peek().name)}")
+        f"invalid identifier name: {display_token_name(self.peek().name)}")
 
-class Tok(Enum):
+    return [self.next_lexeme()]
+
+  def open_app(self) -> list:
+    """Parses the function name of an application"""
+    return [self.next_lexeme()]
+
+def check_unique(defn: Defn, defn_names: set):
+  """Checks a defn's name against those already defined, adding it"""
+  if defn.name in defn_names:
+    raise ParseError(f"function {defn.name} defined more than once")
+  defn_names.add(defn.name)
+
+class Tok(IntEnum):
   LPAREN = auto()
   RPAREN = auto()
   SYM = auto()
@@ -192,62 +226,100 @@ class Tok(Enum):
   LET = auto()
   PRINTEXPR = auto()
 
+# the form opened by each token following an open paren: the method
+# parsing its head (returning the form's first args), the AST node
+# constructed from its args, and its number of args (None if any)
+FORMS = {
+  Tok.ADD1:       (ProgramParser.open_form, Add1,       1),
+  Tok.SUB1:       (ProgramParser.open_form, Sub1,       1),
+  Tok.PLUS:       (ProgramParser.open_form, Plus,       2),
+  Tok.MINUS:      (ProgramParser.open_form, Minus,      2),
+  Tok.TIMES:      (ProgramParser.open_form, Times,      2),
+  Tok.EQUALS:     (ProgramParser.open_form, Equals,     2),
+  Tok.PRINTEXPR:  (ProgramParser.open_form, PrintExpr,  1),
+  Tok.IF:         (ProgramParser.open_form, If,         3),
+  Tok.LET:        (ProgramParser.open_let,  Let,        3),
+  Tok.SYM:        (ProgramParser.open_app,  App,        None),
+}
+
+# the AST node constructed from each single-token expression
+ATOMS = {
+  Tok.NUM:  Num,
+  Tok.SYM:  Name,
+}
+
+TOKEN_NAMES = {
+  Tok.LPAREN:     "'('",
+  Tok.RPAREN:     "')'",
+  Tok.SYM:        "symbol",
+  Tok.NUM:        "number",
+  Tok.DEF:        "def",
+  Tok.ADD1:       "add1",
+  Tok.SUB1:       "sub1",
+  Tok.PLUS:       "+",
+  Tok.MINUS:      "-",
+  Tok.TIMES:      "*",
+  Tok.EQUALS:     "=",
+  Tok.IF:         "'if'",
+  Tok.LET:        "'let'",
+  Tok.PRINTEXPR:  "print",
+}
+
 def display_token_name(name: Tok) -> str:
   """Convert a token name into a user-facing string"""
-  if name == Tok.LPAREN:
-    return "'('"
-  elif name == Tok.RPAREN:
-    return "')'"
-  elif name == Tok.SYM:
-    return "symbol"
-  elif name == Tok.NUM:
-    return "number"
-  elif name == Tok.DEF:
-    return "def"
-  elif name == Tok.ADD1:
-    return "add1"
-  elif name == Tok.SUB1:
-    return "sub1"
-  elif name == Tok.PLUS:
-    return "+"
-  elif name == Tok.MINUS:
-    return "-"
-  elif name == Tok.TIMES:
-    return "*"
-  elif name == Tok.EQUALS:
-    return "="
-  elif name == Tok.IF:
-    return "'if'"
-  elif name == Tok.LET:
-    return "'let'"
-  elif name == Tok.PRINTEXPR:
-    return "print"
+  return TOKEN_NAMES.get(name)
+
+# keywords, which lex as symbols would
+KEYWORDS = {
+  "def":    Tok.DEF,
+  "add1":   Tok.ADD1,
+  "sub1":   Tok.SUB1,
+  "if":     Tok.IF,
+  "let":    Tok.LET,
+  "print":  Tok.PRINTEXPR,
+}
+
+def symbol_token(s) -> Token:
+  """Token for a symbol, or for the keyword it spells"""
+  if type(s) is bytes:
+    s = s.decode()
+  if s in KEYWORDS:
+    return Token(KEYWORDS[s], None)
+  return Token(Tok.SYM, s)
 
 # global lexer for programs
+# (the first pattern to match wins: numbers must precede minus)
 lexer = Lexer([
+  Pattern(r"\s+",                       lambda s: None),
+  Pattern(r";.*?(?:\n|$)",              lambda s: None),
   Pattern(r"\(",                        lambda s: Token(Tok.LPAREN, None)),
   Pattern(r"\)",                        lambda s: Token(Tok.RPAREN, None)),
-  Pattern(r"\s+",                       lambda s: None),
-  Pattern(r";.*?(\n|$)",                lambda s: None),
-  Pattern(r"def",                       lambda s: Token(Tok.DEF, None)),
-  Pattern(r"add1",                      lambda s: Token(Tok.ADD1, None)),
-  Pattern(r"sub1",                      lambda s: Token(Tok.SUB1, None)),
+  Pattern(r"-?[0-9]+(?:\.[0-9]+)?",     lambda s: Token(Tok.NUM, float(s))),
+  Pattern(r"[a-zA-Z][a-zA-Z0-9\?\!-]*", symbol_token),
   Pattern(r"\+",                        lambda s: Token(Tok.PLUS, None)),
   Pattern(r"\-",                        lambda s: Token(Tok.MINUS, None)),
   Pattern(r"\*",                        lambda s: Token(Tok.TIMES, None)),
   Pattern(r"=",                         lambda s: Token(Tok.EQUALS, None)),
-  Pattern(r"if",                        lambda s: Token(Tok.IF, None)),
-  Pattern(r"let",                       lambda s: Token(Tok.LET, None)),
-  Pattern(r"print",                     lambda s: Token(Tok.PRINTEXPR, None)),
-  Pattern(r"-?[0-9]+(\.[0-9]+)?",       lambda s: Token(Tok.NUM, float(s))),
-  Pattern(r"[a-zA-Z][a-zA-Z0-9\?\!-]*", lambda s: Token(Tok.SYM, s)),
 ])
 
-# global parser for programs
-parser = ProgramParser(display_token_name)
+def make_parser(builder=None) -> ProgramParser:
+  """A new parser for programs. A parser holds the state of the parse
+  it is doing, so every parse needs its own, e.g. in each thread"""
+  return ProgramParser(display_token_name, builder)
 
 def parse_program(pgrm: str) -> Tuple[List[Defn], List[Expr]]:
   """Parses a string program to produce a list of function
   definitions and a program body expression"""
   tokens = lexer.lex(pgrm)
-  return parser.parse(tokens)
\ No newline at end of file
+  return make_parser().parse(tokens)
+
+def parse_program_arena(pgrm) -> Tuple[List[Defn], List[Expr]]:
+  """Parses a program like parse_program, but into a new ExprArena:
+  the expressions (and defn bodies) returned are views of its nodes"""
+  tokens = lexer.lex(pgrm)
+  return make_parser(ExprArena()).parse(tokens)
+
+def parse_program_iter(file, chunk_size=65536) -> Iterator[Union[Defn, Expr]]:
+  """Parses a program read from a file object in chunks, yielding its
+  function definitions and then its body expressions one at a time"""
+  return make_parser().parse_iter(lexer.lex_iter(file, chunk_size))
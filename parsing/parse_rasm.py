@@ -1,5 +1,5 @@
-from typing import List
-from enum import Enum, auto
+from typing import List, Iterable, Iterator
+from enum import IntEnum, auto
 from rasm.Instr import *
 from rasm.Operand import *
 from .Parser import *
@@ -15,57 +15,60 @@ class RasmParser(Parser):
     self.setup(tokens)
 
     instrs = []
-
     while not self.empty():
-      if self.matches(Tok.LABEL):
-        label = self.next().lexeme
-        self.eat(Tok.COLON)
-        instrs.append(Label(label))
-      elif self.matches(Tok.MOV):
-        self.parse_bin_op(Tok.MOV, Mov, instrs)
-      elif self.matches(Tok.ADD):
-        self.parse_bin_op(Tok.ADD, Add, instrs)
-      elif self.matches(Tok.SUB):
-        self.parse_bin_op(Tok.SUB, Sub, instrs)
-      elif self.matches(Tok.MUL):
-        self.parse_bin_op(Tok.MUL, Mul, instrs)
-      elif self.matches(Tok.CMP):
-        self.parse_bin_op(Tok.CMP, Cmp, instrs)
-      elif self.matches(Tok.JMP):
-        self.parse_jump(Tok.JMP, "jmp", Jmp, instrs)
-      elif self.matches(Tok.JE):
-        self.parse_jump(Tok.JE, "je", Je, instrs)
-      elif self.matches(Tok.JNE):
-        self.parse_jump(Tok.JNE, "jne", Jne, instrs)
-      elif self.matches(Tok.CALL):
-        self.parse_jump(Tok.CALL, "call", Call, instrs)
-      elif self.matches(Tok.RET):
-        self.eat(Tok.RET)
-        instrs.append(Ret())
-      elif self.matches(Tok.PRINT):
-        self.eat(Tok.PRINT)
-        op = self.parse_operand()
-        instrs.append(Print(op))
+      instrs.append(self.parse_instr())
 
     return instrs
 
-  def parse_bin_op(self, tok_name, constructor, instrs: List[Instr]):
+  def parse_iter(self, tokens: Iterable[Token]) -> Iterator[Instr]:
+    """Parse a rasm program from a stream of tokens,
+    yielding each instruction as soon as it has been parsed"""
+    self.setup_stream(tokens)
+
+    while not self.empty():
+      yield self.parse_instr()
+      self.compact()
+
+  def parse_instr(self) -> Instr:
+    """Parse a single instruction (or label) off the token stream"""
+    instr = INSTRS.get(self.peek_name())
+    if instr is None:
+      raise ParseError(f"expected instruction, got {display_token_name(self.peek().name)}")
+
+    (parse, constructor) = instr
+    return parse(self, constructor)
+
+  def parse_label(self, constructor) -> Instr:
+    label = self.next().lexeme
+    self.eat(Tok.COLON)
+    return constructor(label)
+
+  def parse_nullary(self, constructor) -> Instr:
+    self.next()
+    return constructor()
+
+  def parse_unary(self, constructor) -> Instr:
+    self.next()
+    op = self.parse_operand()
+    return constructor(op)
+
+  def parse_bin_op(self, constructor) -> Instr:
     """Parses a binary operator by parsing its name, source and dest operands,
-    and adding a constructed ast node to the given list of instrs"""
-    self.eat(tok_name)
+    and constructing an ast node from them"""
+    self.next()
     src = self.parse_operand()
     self.eat(Tok.COMMA)
     dest = self.parse_operand()
-    instrs.append(constructor(src, dest))
+    return constructor(src, dest)
 
-  def parse_jump(self, jump_tok_name, jump_name: str, constructor, instrs: List[Instr]):
+  def parse_jump(self, constructor) -> Instr:
     """Parses a jump instruction (jmp, je, jne, call) by parsing its name
     then its target, ensuring the target is valid"""
-    self.eat(jump_tok_name)
+    jump_name = display_token_name(self.next().name)
     target = self.next()
     if target.name != Tok.LABEL:
       raise ParseError(f"expected label target for {jump_name}, got {display_token_name(target.name)}")
-    instrs.append(constructor(target.lexeme))
+    return constructor(target.lexeme)
 
   def parse_operand(self) -> Operand:
     """Parse an operand off the token stream"""
@@ -97,7 +100,7 @@ class RasmParser(Parser):
       raise ParseError(f"expected operand, got {display_token_name(self.peek().name)}")
 
 
-class Tok(Enum):
+class Tok(IntEnum):
   COMMA = auto()
   COLON = auto()
   LBRACKET = auto()
@@ -119,48 +122,74 @@ class Tok(Enum):
   RSP = auto()
   PRINT = auto()
 
+# how to parse the instruction starting with each token:
+# the method parsing it, and the AST node it constructs
+INSTRS = {
+  Tok.LABEL:  (RasmParser.parse_label,    Label),
+  Tok.MOV:    (RasmParser.parse_bin_op,   Mov),
+  Tok.ADD:    (RasmParser.parse_bin_op,   Add),
+  Tok.SUB:    (RasmParser.parse_bin_op,   Sub),
+  Tok.MUL:    (RasmParser.parse_bin_op,   Mul),
+  Tok.CMP:    (RasmParser.parse_bin_op,   Cmp),
+  Tok.JMP:    (RasmParser.parse_jump,     Jmp),
+  Tok.JE:     (RasmParser.parse_jump,     Je),
+  Tok.JNE:    (RasmParser.parse_jump,     Jne),
+  Tok.CALL:   (RasmParser.parse_jump,     Call),
+  Tok.RET:    (RasmParser.parse_nullary,  Ret),
+  Tok.PRINT:  (RasmParser.parse_unary,    Print),
+}
+
+TOKEN_NAMES = {
+  Tok.COMMA:    "','",
+  Tok.COLON:    "':'",
+  Tok.LBRACKET: "'['",
+  Tok.RBRACKET: "']'",
+  Tok.PLUS:     "+",
+  Tok.NUM:      "number",
+  Tok.MOV:      "mov",
+  Tok.ADD:      "add",
+  Tok.SUB:      "sub",
+  Tok.MUL:      "mul",
+  Tok.CMP:      "cmp",
+  Tok.LABEL:    "label",
+  Tok.JMP:      "jmp",
+  Tok.JE:       "je",
+  Tok.JNE:      "jne",
+  Tok.CALL:     "call",
+  Tok.RET:      "ret",
+  Tok.RANS:     "rans",
+  Tok.RSP:      "rsp",
+  Tok.PRINT:    "print",
+}
+
 def display_token_name(name: Tok) -> str:
   """Convert a token name into a user-facing string"""
-  if name == Tok.COMMA:
-    return "','"
-  elif name == Tok.COLON:
-    return "':'"
-  elif name == Tok.LBRACKET:
-    return "'['"
-  elif name == Tok.RBRACKET:
-    return "']'"
-  elif name == Tok.PLUS:
-    return "+"
-  elif name == Tok.NUM:
-    return "number"
-  elif name == Tok.MOV:
-    return "mov"
-  elif name == Tok.ADD:
-    return "add"
-  elif name == Tok.SUB:
-    return "sub"
-  elif name == Tok.MUL:
-    return "mul"
-  elif name == Tok.CMP:
-    return "cmp"
-  elif name == Tok.LABEL:
-    return "label"
-  elif name == Tok.JMP:
-    return "jmp"
-  elif name == Tok.JE:
-    return "je"
-  elif name == Tok.JNE:
-    return "jne"
-  elif name == Tok.CALL:
-    return "call"
-  elif name == Tok.RET:
-    return "ret"
-  elif name == Tok.RANS:
-    return "rans"
-  elif name == Tok.RSP:
-    return "rsp"
-  elif name == Tok.PRINT:
-    return "print"
+  return TOKEN_NAMES.get(name)
+
+# keywords, which lex as labels would
+KEYWORDS = {
+  "mov":    Tok.MOV,
+  "add":    Tok.ADD,
+  "sub":    Tok.SUB,
+  "mul":    Tok.MUL,
+  "cmp":    Tok.CMP,
+  "jmp":    Tok.JMP,
+  "je":     Tok.JE,
+  "jne":    Tok.JNE,
+  "call":   Tok.CALL,
+  "ret":    Tok.RET,
+  "rans":   Tok.RANS,
+  "rsp":    Tok.RSP,
+  "print":  Tok.PRINT,
+}
+
+def label_token(s) -> Token:
+  """Token for a label, or for the keyword it spells"""
+  if type(s) is bytes:
+    s = s.decode()
+  if s in KEYWORDS:
+    return Token(KEYWORDS[s], None)
+  return Token(Tok.LABEL, s)
 
 # global lexer for rasm
 lexer = Lexer([
@@ -170,27 +199,22 @@ lexer = Lexer([
   Pattern(r"\[",                    lambda s: Token(Tok.LBRACKET, None)),
   Pattern(r"\]",                    lambda s: Token(Tok.RBRACKET, None)),
   Pattern(r"\+",                    lambda s: Token(Tok.PLUS, None)),
-  Pattern(r"mov",                   lambda s: Token(Tok.MOV, None)),
-  Pattern(r"add",                   lambda s: Token(Tok.ADD, None)),
-  Pattern(r"sub",                   lambda s: Token(Tok.SUB, None)),
-  Pattern(r"mul",                   lambda s: Token(Tok.MUL, None)),
-  Pattern(r"cmp",                   lambda s: Token(Tok.CMP, None)),
-  Pattern(r"jmp",                   lambda s: Token(Tok.JMP, None)),
-  Pattern(r"je",                    lambda s: Token(Tok.JE, None)),
-  Pattern(r"jne",                   lambda s: Token(Tok.JNE, None)),
-  Pattern(r"call",                  lambda s: Token(Tok.CALL, None)),
-  Pattern(r"ret",                   lambda s: Token(Tok.RET, None)),
-  Pattern(r"rans",                  lambda s: Token(Tok.RANS, None)),
-  Pattern(r"rsp",                   lambda s: Token(Tok.RSP, None)),
-  Pattern(r"print",                 lambda s: Token(Tok.PRINT, None)),
-  Pattern(r"[a-zA-Z][a-zA-Z0-9_]*", lambda s: Token(Tok.LABEL, s)),
-  Pattern(r"-?[0-9]+(\.[0-9]+)?",   lambda s: Token(Tok.NUM, float(s))),
+  Pattern(r"[a-zA-Z][a-zA-Z0-9_]*", label_token),
+  Pattern(r"-?[0-9]+(?:\.[0-9]+)?", lambda s: Token(Tok.NUM, float(s))),
 ])
 
-parser = RasmParser(display_token_name)
+def make_parser() -> RasmParser:
+  """A new parser for rasm. A parser holds the state of the parse
+  it is doing, so every parse needs its own, e.g. in each thread"""
+  return RasmParser(display_token_name)
 
 def parse_rasm(pgrm: str) -> List[Instr]:
   """Parses a rasm program into a list of instructions
   that can be executed by a VM"""
   tokens = lexer.lex(pgrm)
-  return parser.parse(tokens)
\ No newline at end of file
+  return make_parser().parse(tokens)
+
+def parse_rasm_iter(file, chunk_size=65536) -> Iterator[Instr]:
+  """Parses a rasm program read from a file object in chunks,
+  yielding its instructions one at a time"""
+  return make_parser().parse_iter(lexer.lex_iter(file, chunk_size))
@@ -0,0 +1,165 @@
+from typing import List, Iterator, Union
+from compiler.Defn import *
+from compiler.Expr import *
+from rasm.Instr import *
+from rasm.Operand import *
+
+# pieces of text collected before they are written out together
+CHUNK_PIECES = 4096
+
+class ChunkWriter:
+  """Collects pieces of text, writing them to a file in large chunks"""
+
+  def __init__(self, file):
+    self.file = file
+    self.pieces = []
+
+  def write(self, piece: str):
+    self.pieces.append(piece)
+    if len(self.pieces) >= CHUNK_PIECES:
+      self.flush()
+
+  def flush(self):
+    self.file.write("".join(self.pieces))
+    self.pieces = []
+
+# ============= Programs =============
+
+def pieces(form: Union[Defn, Expr]) -> Iterator[str]:
+  """The text of a Defn or Expr, as str gives it, in pieces. Made with
+  an explicit stack rather than recursively, so any depth can be written"""
+  stack = [form]
+  while len(stack) > 0:
+    node = stack.pop()
+    if isinstance(node, str):
+      yield node
+    elif isinstance(node, Defn):
+      yield f"(def ({node.name} {' '.join(node.params)})\n\t"
+      stack += [")", node.body]
+    elif node.isNum():
+      yield num_str(node.value)
+    elif node.isName():
+      yield node.name
+    elif node.isAdd1() or node.isSub1() or node.isPrintExpr():
+      yield opening(node)
+      stack += [")", node.operand]
+    elif node.isPlus() or node.isMinus() or node.isTimes() or node.isEquals():
+      yield opening(node)
+      stack += [")", node.right, " ", node.left]
+    elif node.isIf():
+      yield "(if "
+      stack += [")", node.els, " ", node.thn, " ", node.cond]
+    elif node.isLet():
+      yield f"(let ({node.name} "
+      stack += [")", node.body, ") ", node.value]
+    elif node.isApp():
+      yield f"({node.fname} "
+      stack.append(")")
+      args = node.args
+      for i in reversed(range(len(args))):
+        stack.append(args[i])
+        if i > 0:
+          stack.append(" ")
+    else:
+      yield str(node)
+
+def opening(node: Expr) -> str:
+  """The text opening a unary or binary form"""
+  if node.isAdd1():
+    return "(add1 "
+  elif node.isSub1():
+    return "(sub1 "
+  elif node.isPrintExpr():
+    return "(print "
+  elif node.isPlus():
+    return "(+ "
+  elif node.isMinus():
+    return "(- "
+  elif node.isTimes():
+    return "(* "
+  return "(= "
+
+def num_str(value) -> str:
+  if value.is_integer():
+    return str(int(value))
+  return str(value)
+
+def form_str(form: Union[Defn, Expr]) -> str:
+  """str of a Defn or Expr, without recursion"""
+  return "".join(pieces(form))
+
+def write_forms(file, forms: List[Union[Defn, Expr]]):
+  """Write each of a list of Defns and Exprs to a file, on its own line"""
+  writer = ChunkWriter(file)
+  for form in forms:
+    for piece in pieces(form):
+      writer.write(piece)
+    writer.write("\n")
+  writer.flush()
+
+# ============= Rasm =============
+
+# the text opening each kind of instruction
+MNEMONICS = {
+  Mov:    "\tmov ",
+  Add:    "\tadd ",
+  Sub:    "\tsub ",
+  Mul:    "\tmul ",
+  Cmp:    "\tcmp ",
+  Jmp:    "\tjmp ",
+  Je:     "\tje ",
+  Jne:    "\tjne ",
+  Call:   "\tcall ",
+  Print:  "\tprint ",
+}
+
+def write_instrs(file, instrs: List[Instr]):
+  """Write instructions to a file one per line, as str gives them.
+  The text of equal operands is only made once"""
+  writer = ChunkWriter(file)
+  operands = OperandStrs()
+  for ins in instrs:
+    cls = type(ins)
+    if cls is Mov or cls is Add or cls is Sub or cls is Mul:
+      writer.write(f"{MNEMONICS[cls]}{operands.str(ins.src)}, {operands.str(ins.dest)}\n")
+    elif cls is Label:
+      writer.write(f"{ins.label}:\n")
+    elif cls is Jmp or cls is Je or cls is Jne or cls is Call:
+      writer.write(f"{MNEMONICS[cls]}{ins.target}\n")
+    elif cls is Cmp:
+      writer.write(f"\tcmp {operands.str(ins.left)}, {operands.str(ins.right)}\n")
+    elif cls is Ret:
+      writer.write("\tret\n")
+    elif cls is Print:
+      writer.write(f"\tprint {operands.str(ins.operand)}\n")
+    else:
+      writer.write(str(ins) + "\n")
+  writer.flush()
+
+class OperandStrs:
+  """The text of operands, remembered by kind and value (and its
+  type, as e.g. 1 and 1.0 are equal but may print differently)"""
+
+  def __init__(self):
+    self.imms = {}
+    self.offs = {}
+
+  def str(self, op: Operand) -> str:
+    cls = type(op)
+    if cls is Rans:
+      return "rans"
+    elif cls is Rsp:
+      return "rsp"
+    elif cls is StackOff:
+      key = (type(op.off), op.off)
+      text = self.offs.get(key)
+      if text is None:
+        text = self.offs[key] = str(op)
+      return text
+    elif cls is Imm:
+      key = (type(op.value), op.value)
+      text = self.imms.get(key)
+      if text is None:
+        text = self.imms[key] = str(op)
+      return text
+    return str(op)
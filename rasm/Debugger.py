@@ -0,0 +1,188 @@
+from typing import List
+from .Hook import *
+from .Instr import *
+from .VirtualMachine import *
+
+REGISTERS = ["rip", "rans", "rsp"]
+
+class Stop:
+  """Why the debugger stopped the machine"""
+
+  def __init__(self, kind: str, detail: str):
+    self.kind = kind
+    self.detail = detail
+
+  def __str__(self):
+    return f"{self.kind}: {self.detail}"
+
+class Debugger(Hook):
+  """Debugger for the rasm VM, supporting breakpoints on addresses
+  and labels, watchpoints on registers and stack slots, and single-step.
+
+  Whenever the machine stops, on_stop is called with the debugger and
+  the Stop. From there, the machine can be inspected, and single_step()
+  or cont() decide how execution resumes.
+
+  The debugger is only active while it has a breakpoint, watchpoint or
+  step pending, so otherwise programs run at full speed."""
+
+  def __init__(self, vm: VirtualMachine, on_stop=None):
+    self.vm = vm
+    self.on_stop = on_stop if on_stop is not None else print_stop
+
+    # breakpoint addresses, and labels to resolve once a program is loaded
+    self.breakpoints = set()
+    self.label_breakpoints = set()
+    self.resolved = set()
+
+    # watched locations (register name or absolute stack index),
+    # mapped to their last seen value
+    self.watchpoints = {}
+
+    self.stepping = False
+    self.running = False
+    self.stops = 0
+
+    vm.attach(self)
+
+  # ============= Breakpoints & Watchpoints =============
+
+  def break_at(self, target):
+    """Stop before executing the instruction at the given address,
+    or the instruction that follows the given label"""
+    if isinstance(target, str):
+      if self.running:
+        self.resolved.add(self.resolve(target))
+      self.label_breakpoints.add(target)
+    else:
+      self.breakpoints.add(target)
+
+  def clear(self, target):
+    """Remove a breakpoint on an address or label"""
+    if isinstance(target, str):
+      self.label_breakpoints.discard(target)
+      if self.running:
+        self.resolved = set(self.resolve(l) for l in self.label_breakpoints)
+    else:
+      self.breakpoints.discard(target)
+
+  def watch_register(self, reg: str):
+    """Stop whenever the value of a register (rans, rsp, rip) changes"""
+    if reg not in REGISTERS:
+      raise ValueError(f"no register named {reg}")
+    self.watchpoints[reg] = self.read(reg)
+
+  def watch_stack(self, index: int):
+    """Stop whenever the value at an absolute stack index changes"""
+    if index < 0 or index >= STACK_SIZE:
+      raise ValueError(f"stack index {index} out of range")
+    self.watchpoints[index] = self.read(index)
+
+  def unwatch(self, loc):
+    """Remove a watchpoint on a register or stack index"""
+    self.watchpoints.pop(loc, None)
+
+  def resolve(self, label: str) -> int:
+    """Address of the instruction following a label in the loaded program"""
+    if label not in self.vm.label_addrs:
+      raise InvalidTarget(self.vm, label)
+    return self.vm.label_addrs[label]
+
+  # ============= Controlling Execution =============
+
+  def single_step(self):
+    """Stop again before the next instruction"""
+    self.stepping = True
+
+  def cont(self):
+    """Resume running until the next breakpoint or watchpoint"""
+    self.stepping = False
+
+  def run(self, pgrm: List[Instr], suppress_output=False):
+    """Execute a program on the debugged machine"""
+    self.vm.execute(pgrm, suppress_output)
+
+  # ============= Inspecting the Machine =============
+
+  def state(self) -> MachineState:
+    """Snapshot of registers, flags, stack and current instruction"""
+    return self.vm.state()
+
+  def registers(self) -> dict:
+    return { reg: self.read(reg) for reg in REGISTERS }
+
+  def flags(self) -> dict:
+    return { "fequal": self.vm.fequal, "fless": self.vm.fless }
+
+  def stack(self, start=0, end=15) -> list:
+    """Stack contents between two absolute indices"""
+    return self.vm.stack[start:end]
+
+  def current_instr(self) -> Instr:
+    return self.state().instr
+
+  def read(self, loc):
+    """Current value of a register or absolute stack index"""
+    if isinstance(loc, str):
+      return getattr(self.vm, loc)
+    return self.vm.stack[loc]
+
+  # ============= Hook =============
+
+  def active(self) -> bool:
+    return self.stepping or \
+      len(self.breakpoints) > 0 or \
+      len(self.label_breakpoints) > 0 or \
+      len(self.watchpoints) > 0
+
+  def start(self, vm):
+    self.resolved = set(self.resolve(l) for l in self.label_breakpoints)
+    self.running = True
+    for loc in self.watchpoints:
+      self.watchpoints[loc] = self.read(loc)
+
+  def before_instr(self, vm, instr):
+    # watched values that changed during the previous instruction
+    stop = self.check_watchpoints()
+
+    if stop is None:
+      if vm.rip in self.breakpoints or vm.rip in self.resolved:
+        stop = Stop("breakpoint", f"rip={vm.rip}")
+      elif self.stepping:
+        stop = Stop("step", f"rip={vm.rip}")
+
+    if stop is not None:
+      self.stops += 1
+      self.on_stop(self, stop)
+
+  def finish(self, vm):
+    # changes made by the last instruction run
+    stop = self.check_watchpoints()
+    if stop is not None:
+      self.stops += 1
+      self.on_stop(self, stop)
+    self.running = False
+
+  def check_watchpoints(self) -> Stop:
+    """A stop for the first watched value that changed since the last
+    check (or None), noting the new value of every one that did"""
+    stop = None
+    for loc in self.watchpoints:
+      value = self.read(loc)
+      old = self.watchpoints[loc]
+      if value != old:
+        self.watchpoints[loc] = value
+        if stop is None:
+          stop = Stop("watchpoint", f"{display_loc(loc)} changed from {old} to {value}")
+    return stop
+
+def display_loc(loc) -> str:
+  """User-facing name for a watched location"""
+  if isinstance(loc, str):
+    return loc
+  return f"stack[{loc}]"
+
+def print_stop(dbg: Debugger, stop: Stop):
+  """Default stop handler: report the stop and machine state, then continue"""
+  print(f"Stopped at {stop}")
+  print(dbg.state())
@@ -0,0 +1,24 @@
+class Hook:
+  """A Hook instruments a VirtualMachine. Once attached (see
+  VirtualMachine.attach), an active hook is notified when a program
+  starts, before every instruction is executed, and when it finishes.
+
+  If no attached hook is active, the VM runs its fast loop and hooks
+  cost nothing."""
+
+  def active(self) -> bool:
+    """Whether this hook needs to observe execution right now"""
+    return True
+
+  def start(self, vm):
+    """Called once a program is loaded, before it starts running"""
+    pass
+
+  def before_instr(self, vm, instr):
+    """Called before each instruction is executed, with rip
+    pointing at the instruction"""
+    pass
+
+  def finish(self, vm):
+    """Called when the program halts, or fails with an error"""
+    pass
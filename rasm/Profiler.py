@@ -0,0 +1,185 @@
+import re
+import time
+from .Hook import *
+from .Instr import *
+
+ROOT_NAME = "entry"
+
+class FunctionProfile:
+  """Instruction counts and wall time attributed to one function.
+  Inclusive figures count callees; exclusive figures do not."""
+
+  def __init__(self, name: str):
+    self.name = name
+    self.calls = 0
+    self.inclusive_instrs = 0
+    self.exclusive_instrs = 0
+    self.inclusive_time = 0.0
+    self.exclusive_time = 0.0
+
+class Profiler(Hook):
+  """Call-stack-aware profiler. Keeps a shadow call stack from call/ret
+  instructions, attributing every instruction and the time spent on it
+  to the function (and full call stack) it ran in.
+
+  Functions are named by their call target label, or by `names`, a map
+  from labels to source names (see compiler.util.function_names)."""
+
+  def __init__(self, names=None):
+    self.names = names if names is not None else {}
+    self.clock = time.perf_counter
+    self.reset()
+
+  def reset(self):
+    """Discard all collected data"""
+    self.functions = {}
+    self.count = 0
+
+    # call stacks are interned as path ids: path 0 is the root, and
+    # each (parent path, function name) pair gets its own id
+    self.path_ids = {}
+    self.path_parent = [None]
+    self.path_name = [ROOT_NAME]
+    self.path_instrs = [0]
+    self.path_time = [0.0]
+
+    # shadow stack of (name, path id, instr count, time) at entry
+    self.stack = []
+    self.depth = {}
+    self.last_count = 0
+    self.last_time = 0.0
+
+  def function_name(self, label: str) -> str:
+    """Source name for the function at a call target label"""
+    return label_name(label, self.names)
+
+  def profile(self, name: str) -> FunctionProfile:
+    if name not in self.functions:
+      self.functions[name] = FunctionProfile(name)
+    return self.functions[name]
+
+  # ============= Hook =============
+
+  def start(self, vm):
+    self.reset()
+    self.last_time = self.clock()
+    self.push(ROOT_NAME, 0)
+
+  def before_instr(self, vm, instr):
+    self.count += 1
+
+    if instr.isCall():
+      # the call itself is charged to the caller
+      self.flush()
+      name = self.function_name(instr.target)
+      path = self.path_ids.get((self.stack[-1][1], name))
+      if path is None:
+        path = self.new_path(self.stack[-1][1], name)
+      self.push(name, path)
+
+    elif instr.isRet():
+      # the ret is charged to the function returning
+      self.flush()
+      if len(self.stack) > 1:
+        self.pop()
+
+  def finish(self, vm):
+    self.flush()
+    while len(self.stack) > 0:
+      self.pop()
+
+  # ============= Shadow Call Stack =============
+
+  def new_path(self, parent: int, name: str) -> int:
+    path = len(self.path_name)
+    self.path_ids[(parent, name)] = path
+    self.path_parent.append(parent)
+    self.path_name.append(name)
+    self.path_instrs.append(0)
+    self.path_time.append(0.0)
+    return path
+
+  def flush(self):
+    """Charge everything since the last call/ret to the current stack"""
+    now = self.clock()
+    instrs = self.count - self.last_count
+    elapsed = now - self.last_time
+    self.last_count = self.count
+    self.last_time = now
+
+    (name, path, _, _) = self.stack[-1]
+    self.path_instrs[path] += instrs
+    self.path_time[path] += elapsed
+    prof = self.functions[name]
+    prof.exclusive_instrs += instrs
+    prof.exclusive_time += elapsed
+
+  def push(self, name: str, path: int):
+    self.profile(name).calls += 1
+    self.depth[name] = self.depth.get(name, 0) + 1
+    self.stack.append((name, path, self.count, self.last_time))
+
+  def pop(self):
+    (name, _, count, start) = self.stack.pop()
+    self.depth[name] -= 1
+
+    # recursive calls are already covered by the outermost activation
+    if self.depth[name] == 0:
+      prof = self.functions[name]
+      prof.inclusive_instrs += self.last_count - count
+      prof.inclusive_time += self.last_time - start
+
+  # ============= Output =============
+
+  def collapsed_stacks(self, weight="instrs") -> list:
+    """(stack, weight) pairs, where stack is a list of function names
+    from the root, weighted by instructions or microseconds"""
+    stacks = []
+    for path in range(len(self.path_name)):
+      if weight == "instrs":
+        w = self.path_instrs[path]
+      elif weight == "time":
+        w = int(self.path_time[path] * 1_000_000)
+      else:
+        raise ValueError(f"unknown profile weight '{weight}'")
+
+      if w == 0:
+        continue
+
+      names = []
+      p = path
+      while p is not None:
+        names.append(self.path_name[p])
+        p = self.path_parent[p]
+      names.reverse()
+      stacks.append((names, w))
+    return stacks
+
+  def write_collapsed(self, file, weight="instrs"):
+    """Write collapsed stacks ("a;b;c weight" lines), the input format
+    of standard flamegraph tools"""
+    for (names, w) in self.collapsed_stacks(weight):
+      file.write(f"{';'.join(names)} {w}\n")
+
+  def report(self) -> str:
+    """Per-function table, heaviest exclusive instruction count first"""
+    profs = sorted(self.functions.values(),
+      key=lambda p: p.exclusive_instrs, reverse=True)
+    width = max([len("function")] + [len(p.name) for p in profs])
+
+    lines = [
+      f"{'function':<{width}} {'calls':>8} {'incl instrs':>12} {'excl instrs':>12} " + \
+      f"{'incl ms':>10} {'excl ms':>10}"]
+    for p in profs:
+      lines.append(
+        f"{p.name:<{width}} {p.calls:>8} {p.inclusive_instrs:>12} {p.exclusive_instrs:>12} " + \
+        f"{p.inclusive_time * 1000:>10.3f} {p.exclusive_time * 1000:>10.3f}")
+    return "\n".join(lines)
+
+def label_name(label: str, names: dict) -> str:
+  """Source name for a function label, looked up in `names` or else
+  recovered (normalized) from the label itself"""
+  if label in names:
+    return names[label]
+  m = re.fullmatch(r"function_(.*)_[0-9]+", label)
+  return m.group(1) if m is not None else label
@@ -0,0 +1,223 @@
+import signal
+from typing import List
+from .Instr import *
+from .Operand import *
+from .VirtualMachine import *
+from .Profiler import ROOT_NAME, label_name
+
+class Sampler:
+  """Statistical profiler for the rasm VM. Every `every` instructions
+  (or, given `interval`, every `interval` seconds of CPU time, using
+  SIGPROF), records rip and the call stack at that moment. Hooks
+  attached to the VM run as they would without sampling.
+
+  Nothing runs between samples: the call stack is recovered by unwinding
+  the VM stack, using the calling convention of compiled code, where
+  `add k, rsp` before a call is undone by `sub k, rsp` at the return
+  address. Stacks that cannot be unwound start with UNKNOWN. A sample
+  costs time proportional to the call depth, so deeply recursive
+  programs want a longer period."""
+
+  def __init__(self, every=10_000, interval=None, names=None):
+    if every <= 0:
+      raise ValueError("sampling period must be positive")
+    self.every = every
+    self.interval = interval
+    self.names = names if names is not None else {}
+    self.reset()
+
+  def reset(self):
+    """Discard all collected samples"""
+    self.samples = 0
+    self.stacks = {}
+    self.rips = {}
+
+    # per-address tables for the loaded program, see run
+    self.owners = []
+    self.adjust = []
+    self.returns = []
+
+  def run(self, vm: VirtualMachine, pgrm: List[Instr], suppress_output=False, label_addrs=None):
+    """Execute a program on the given machine, sampling as it runs"""
+    self.reset()
+    vm.load(pgrm, suppress_output, label_addrs)
+    self.owners = function_owners(pgrm, self.names)
+    (self.adjust, self.returns) = call_sites(pgrm)
+
+    hooks = vm.active_hooks()
+    if self.interval is not None:
+      self.run_timed(vm, hooks)
+    else:
+      self.run_counted(vm, hooks)
+
+  def run_counted(self, vm: VirtualMachine, hooks: List[Hook]):
+    """Run to completion, sampling every `every` instructions"""
+    started = []
+    try:
+      for h in hooks:
+        h.start(vm)
+        started.append(h)
+      while not vm.run_for(self.every, hooks):
+        self.sample(vm)
+    finally:
+      for h in started:
+        h.finish(vm)
+
+  def run_timed(self, vm: VirtualMachine, hooks: List[Hook]):
+    """Run to completion, sampling on a CPU-time timer signal"""
+    def handler(sig, frame):
+      self.sample(vm)
+
+    old = signal.signal(signal.SIGPROF, handler)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+    try:
+      if len(hooks) == 0:
+        vm.run()
+      else:
+        vm.run_hooked(hooks)
+    finally:
+      signal.setitimer(signal.ITIMER_PROF, 0)
+      signal.signal(signal.SIGPROF, old)
+
+  def sample(self, vm: VirtualMachine):
+    """Record where the machine is right now"""
+    stack = tuple(self.unwind(vm))
+    self.samples += 1
+    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+    self.rips[vm.rip] = self.rips.get(vm.rip, 0) + 1
+
+  def unwind(self, vm: VirtualMachine) -> List[str]:
+    """Names of the functions on the call stack, from the root"""
+    owners = self.owners
+    adjust = self.adjust
+    returns = self.returns
+    stack = vm.stack
+    rip = vm.rip
+    rsp = vm.rsp
+    names = []
+
+    while True:
+      if not is_addr(rip, owners):
+        names.append(UNKNOWN)
+        break
+
+      name = owners[rip]
+      names.append(name)
+      if name == ROOT_NAME:
+        break
+
+      # the return address into the caller is at the frame base,
+      # once any adjustment around a call in progress is undone
+      base = rsp - adjust[rip]
+      if not is_addr(base, stack):
+        names.append(UNKNOWN)
+        break
+      rip = stack[int(base)]
+      rsp = base - 1
+      if not is_addr(rip, returns) or returns[int(rip)] is None:
+        names.append(UNKNOWN)
+        break
+
+    names.reverse()
+    return names
+
+  # ============= Aggregation =============
+
+  def function_table(self) -> list:
+    """(name, self samples, total samples) per function, hottest first.
+    Self samples were taken in the function itself, total samples
+    anywhere beneath it on the stack"""
+    own = {}
+    total = {}
+    for (stack, n) in self.stacks.items():
+      own[stack[-1]] = own.get(stack[-1], 0) + n
+      for name in set(stack):
+        total[name] = total.get(name, 0) + n
+
+    rows = [(name, own.get(name, 0), total[name]) for name in total]
+    rows.sort(key=lambda row: (row[1], row[2]), reverse=True)
+    return rows
+
+  def instr_table(self, pgrm: List[Instr]) -> list:
+    """(address, samples, instruction) per sampled address, hottest first"""
+    rows = []
+    for (rip, n) in self.rips.items():
+      instr = str(pgrm[rip]).strip() if is_addr(rip, pgrm) else "?"
+      rows.append((rip, n, instr))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows
+
+  def write_collapsed(self, file):
+    """Write sampled stacks as collapsed stacks for flamegraph tools"""
+    for (stack, n) in self.stacks.items():
+      file.write(f"{';'.join(stack)} {n}\n")
+
+  def report(self, pgrm: List[Instr], top=20) -> str:
+    """Hotness tables by function and by instruction"""
+    rows = self.function_table()
+    width = max([len("function")] + [len(name) for (name, _, _) in rows])
+    lines = [f"{self.samples} samples",
+      f"{'function':<{width}} {'self':>8} {'self %':>7} {'total':>8} {'total %':>7}"]
+    for (name, own, total) in rows:
+      lines.append(
+        f"{name:<{width}} {own:>8} {percent(own, self.samples):>7} " + \
+        f"{total:>8} {percent(total, self.samples):>7}")
+
+    lines.append("")
+    lines.append(f"{'addr':>8} {'samples':>8} {'%':>7}  instruction")
+    for (rip, n, instr) in self.instr_table(pgrm)[:top]:
+      lines.append(f"{rip:>8} {n:>8} {percent(n, self.samples):>7}  " + \
+        f"{instr}  ({self.owners[rip] if is_addr(rip, pgrm) else UNKNOWN})")
+    return "\n".join(lines)
+
+UNKNOWN = "[unknown]"
+
+def function_owners(pgrm: List[Instr], names: dict) -> List[str]:
+  """For each address, the name of the function whose code it is in.
+  Function code starts at a call target label (or the entry label)
+  and runs until the next one"""
+  targets = set(ins.target for ins in pgrm if ins.isCall())
+  owners = []
+  owner = UNKNOWN
+  for ins in pgrm:
+    if ins.isLabel():
+      if ins.label == ENTRY_LABEL:
+        owner = ROOT_NAME
+      elif ins.label in targets:
+        owner = label_name(ins.label, names)
+    owners.append(owner)
+  return owners
+
+def call_sites(pgrm: List[Instr]) -> tuple:
+  """Per address, how far rsp has been moved off the frame base by a
+  call in progress there: after `add k, rsp` and before the call, or
+  after the call returns and before `sub k, rsp`. Also, per address, the
+  adjustment if it is a return address (follows a call), or None"""
+  adjust = [0 for ins in pgrm]
+  returns = [None for ins in pgrm]
+  for addr in range(len(pgrm)):
+    if not pgrm[addr].isCall():
+      continue
+    before = rsp_adjustment(pgrm[addr - 1], Add) if addr > 0 else 0
+    adjust[addr] = before
+    if addr + 1 < len(pgrm):
+      after = rsp_adjustment(pgrm[addr + 1], Sub)
+      adjust[addr + 1] = after
+      returns[addr + 1] = after
+  return (adjust, returns)
+
+def rsp_adjustment(ins: Instr, kind) -> int:
+  """k if the instruction is `add k, rsp` or `sub k, rsp` (by kind), else 0"""
+  if isinstance(ins, kind) and ins.src.isImm() and ins.dest.isRsp() and ins.src.value >= 0:
+    return ins.src.value
+  return 0
+
+def is_addr(n, seq) -> bool:
+  """Whether a machine value is a valid index into a sequence"""
+  if type(n) is not int:
+    if not isinstance(n, float) or not n.is_integer():
+      return False
+  return n >= 0 and n < len(seq)
+
+def percent(n: int, total: int) -> str:
+  return f"{100 * n / total:.1f}%" if total > 0 else "-"
@@ -0,0 +1,177 @@
+import json
+from .Hook import *
+from .Instr import *
+from .Operand import *
+
+class OpcodeStats(Hook):
+  """Dynamic instruction statistics: how often each opcode executes,
+  split by operand kinds (e.g. "mov imm->rans" vs "mov stack->rans"),
+  and how often opcodes execute back to back, in pairs and triples.
+
+  Counts accumulate over every program run while attached, and can be
+  merged with previously exported counts to cover a whole corpus."""
+
+  def __init__(self):
+    self.programs = 0
+    self.opcodes = {}
+    self.pairs = {}
+    self.triples = {}
+
+  # ============= Hook =============
+
+  def start(self, vm):
+    # counts are kept by address while running, and
+    # folded into opcode counts when the program finishes
+    self.keys = [opcode_key(ins) for ins in vm.pgrm]
+    self.n = len(vm.pgrm)
+    self.addr_counts = [0 for ins in vm.pgrm]
+    self.addr_pairs = {}
+    self.addr_triples = {}
+    self.prev = -1
+    self.prev2 = -1
+
+  def before_instr(self, vm, instr):
+    addr = vm.rip
+    self.addr_counts[addr] += 1
+
+    prev = self.prev
+    if prev >= 0:
+      pair = prev * self.n + addr
+      self.addr_pairs[pair] = self.addr_pairs.get(pair, 0) + 1
+      if self.prev2 >= 0:
+        triple = self.prev2 * self.n * self.n + pair
+        self.addr_triples[triple] = self.addr_triples.get(triple, 0) + 1
+
+    self.prev2 = prev
+    self.prev = addr
+
+  def finish(self, vm):
+    keys = self.keys
+    n = self.n
+    self.programs += 1
+
+    for addr in range(n):
+      if self.addr_counts[addr] > 0:
+        add_count(self.opcodes, keys[addr], self.addr_counts[addr])
+    for (pair, count) in self.addr_pairs.items():
+      add_count(self.pairs, (keys[pair // n], keys[pair % n]), count)
+    for (triple, count) in self.addr_triples.items():
+      key = (keys[triple // (n * n)], keys[triple // n % n], keys[triple % n])
+      add_count(self.triples, key, count)
+
+  # ============= Export =============
+
+  def to_json(self) -> dict:
+    """Counts as a JSON-serializable dict, most frequent first"""
+    return {
+      "programs": self.programs,
+      "instructions": sum(self.opcodes.values()),
+      "opcodes": [[key, n] for (key, n) in by_count(self.opcodes)],
+      "pairs": [list(key) + [n] for (key, n) in by_count(self.pairs)],
+      "triples": [list(key) + [n] for (key, n) in by_count(self.triples)],
+    }
+
+  def merge_json(self, data: dict):
+    """Add counts previously exported with to_json"""
+    self.programs += data["programs"]
+    for (key, n) in data["opcodes"]:
+      add_count(self.opcodes, key, n)
+    for row in data["pairs"]:
+      add_count(self.pairs, tuple(row[:2]), row[2])
+    for row in data["triples"]:
+      add_count(self.triples, tuple(row[:3]), row[3])
+
+  def write(self, filename: str, merge=False):
+    """Export counts as JSON to a file, first adding in the
+    counts already there if merging"""
+    if merge:
+      try:
+        with open(filename, "r") as file:
+          self.merge_json(json.load(file))
+      except FileNotFoundError:
+        pass
+
+    with open(filename, "w") as file:
+      json.dump(self.to_json(), file, indent=2)
+      file.write("\n")
+
+def opcode_key(ins: Instr) -> str:
+  """Name of an instruction's opcode, with the kinds of its operands"""
+  op = type(ins).__name__.lower()
+  if ins.isMov() or ins.isAdd() or ins.isSub() or ins.isMul():
+    return f"{op} {operand_kind(ins.src)}->{operand_kind(ins.dest)}"
+  elif ins.isCmp():
+    return f"cmp {operand_kind(ins.left)},{operand_kind(ins.right)}"
+  elif ins.isPrint():
+    return f"print {operand_kind(ins.operand)}"
+  else:
+    return op
+
+def operand_kind(op: Operand) -> str:
+  if op.isImm():
+    return "imm"
+  elif op.isRans():
+    return "rans"
+  elif op.isRsp():
+    return "rsp"
+  elif op.isStackOff():
+    return "stack"
+  return "?"
+
+def add_count(counts: dict, key, n: int):
+  counts[key] = counts.get(key, 0) + n
+
+def by_count(counts: dict) -> list:
+  """Items of a count dict, most frequent first, ties by key"""
+  return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+class RunCounters(Hook):
+  """Summary counters for a run: instructions executed, calls made,
+  the deepest the call stack got, and the highest stack index used"""
+
+  def __init__(self):
+    self.instructions = 0
+    self.calls = 0
+    self.depth = 0
+    self.max_depth = 0
+    self.stack_high_water = 0
+    self.started = False  # whether a run has been counted
+
+  def start(self, vm):
+    self.__init__()
+    self.started = True
+    self.reach = [stack_reach(ins) for ins in vm.pgrm]
+
+  def before_instr(self, vm, instr):
+    self.instructions += 1
+
+    reach = self.reach[vm.rip]
+    if reach is not None and vm.rsp + reach > self.stack_high_water:
+      self.stack_high_water = int(vm.rsp + reach)
+
+    if instr.isCall():
+      self.calls += 1
+      self.depth += 1
+      if self.depth > self.max_depth:
+        self.max_depth = self.depth
+    elif instr.isRet():
+      self.depth -= 1
+
+def stack_reach(ins: Instr) -> int:
+  """Highest offset from rsp an instruction touches on the
+  stack, or None if it doesn't touch the stack"""
+  if ins.isCall():
+    return 1
+  elif ins.isRet():
+    return 0
+
+  ops = []
+  if ins.isMov() or ins.isAdd() or ins.isSub() or ins.isMul():
+    ops = [ins.src, ins.dest]
+  elif ins.isCmp():
+    ops = [ins.left, ins.right]
+  elif ins.isPrint():
+    ops = [ins.operand]
+
+  offs = [op.off for op in ops if op.isStackOff()]
+  return max(offs) if len(offs) > 0 else None
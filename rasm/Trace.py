@@ -0,0 +1,100 @@
+from typing import List
+from array import array
+from .Hook import *
+from .Instr import *
+
+# bits of the packed flags column
+FEQUAL_BIT = 1
+FLESS_BIT = 2
+
+class TraceEntry:
+  """Machine state just before one traced instruction executed"""
+
+  def __init__(self, seq, rip, rans, rsp, fequal, fless):
+    self.seq = seq
+    self.rip = rip
+    self.rans = rans
+    self.rsp = rsp
+    self.fequal = fequal
+    self.fless = fless
+
+class TraceBuffer(Hook):
+  """Fixed-size ring buffer of (rip, rans, rsp, flags) for the last
+  `size` instructions executed, kept in preallocated lists so that
+  recording is cheap enough to leave on for long runs. Registers are
+  kept as the values they held (an int may be too big for a float)"""
+
+  def __init__(self, size: int):
+    if size <= 0:
+      raise ValueError("trace size must be positive")
+    self.size = size
+    self.rips = [0] * size
+    self.rans = [0] * size
+    self.rsps = [0] * size
+    self.flags = array('B', [0]) * size
+    self.clear()
+
+  def clear(self):
+    """Forget everything recorded so far"""
+    # next slot to write, and total instructions recorded
+    self.pos = 0
+    self.count = 0
+
+  def before_instr(self, vm, instr):
+    pos = self.pos
+    self.rips[pos] = vm.rip
+    self.rans[pos] = vm.rans
+    self.rsps[pos] = vm.rsp
+    self.flags[pos] = (FEQUAL_BIT if vm.fequal else 0) | \
+      (FLESS_BIT if vm.fless else 0)
+
+    pos += 1
+    self.pos = 0 if pos == self.size else pos
+    self.count += 1
+
+  def entries(self) -> List[TraceEntry]:
+    """Recorded entries, oldest first"""
+    n = min(self.count, self.size)
+    first = (self.pos - n) % self.size
+    entries = []
+    for i in range(n):
+      slot = (first + i) % self.size
+      flags = self.flags[slot]
+      entries.append(TraceEntry(
+        self.count - n + i,
+        self.rips[slot],
+        self.rans[slot],
+        self.rsps[slot],
+        bool(flags & FEQUAL_BIT),
+        bool(flags & FLESS_BIT)))
+    return entries
+
+  def dump(self, pgrm: List[Instr]) -> str:
+    """Render the recorded history, most recent instruction last"""
+    lines = [f"Trace: (last {min(self.count, self.size)} of {self.count} instructions)"]
+    for e in self.entries():
+      lines.append(
+        f"  #{e.seq} rip={e.rip} rans={display_num(e.rans)} rsp={display_num(e.rsp)} " + \
+        f"fequal={e.fequal} fless={e.fless}  {instr_at(pgrm, e.rip).strip()}")
+    return "\n".join(lines)
+
+  def export(self, filename: str, pgrm: List[Instr]):
+    """Write the recorded history to a file, as tab-separated columns"""
+    with open(filename, "w") as file:
+      file.write("seq\trip\trans\trsp\tfequal\tfless\tinstr\n")
+      for e in self.entries():
+        file.write(
+          f"{e.seq}\t{e.rip}\t{display_num(e.rans)}\t{display_num(e.rsp)}\t" + \
+          f"{int(e.fequal)}\t{int(e.fless)}\t{instr_at(pgrm, e.rip).strip()}\n")
+
+def instr_at(pgrm: List[Instr], rip: int) -> str:
+  """The instruction at an address, as rasm text"""
+  if pgrm is not None and rip >= 0 and rip < len(pgrm):
+    return str(pgrm[rip])
+  return "?"
+
+def display_num(n: float) -> str:
+  """Format a recorded value as an int when it is integral"""
+  if isinstance(n, float) and n.is_integer():
+    return str(int(n))
+  return str(n)
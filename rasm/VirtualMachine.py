@@ -1,14 +1,55 @@
 from typing import List
 from .Operand import *
 from .Instr import *
+from .Hook import *
+from .Trace import *
 from scripts.util import print_num
 
 STACK_SIZE = 10_000
 ENTRY_LABEL = "entry"
 
+class MachineState:
+  """A snapshot of the machine's registers, flags, stack and
+  current instruction, as reported when inspecting a VM"""
+
+  def __init__(self, rip, rans, rsp, fequal, fless, stack, instr):
+    self.rip = rip
+    self.rans = rans
+    self.rsp = rsp
+    self.fequal = fequal
+    self.fless = fless
+    self.stack = stack
+    self.instr = instr
+
+  def __str__(self):
+    if self.instr is not None:
+      cur_instr = str(self.instr)
+    else:
+      cur_instr = f"no instruction at rip={self.rip}"
+
+    return \
+      "Registers:\n" + \
+      f"  rip={self.rip} rans={self.rans} rsp={self.rsp}\n" + \
+      "Flags:\n" + \
+      f"  fequal={self.fequal} fless={self.fless}\n" + \
+      f"Stack: (size={STACK_SIZE})\n" + \
+      f"  {self.stack[:15]}... (first 15)\n" + \
+      "Current Instruction:\n" + \
+      cur_instr
+
 class VirtualMachine:
 
   def __init__(self):
+    # instrumentation attached to this machine
+    self.hooks = []
+
+    # recent execution history, included in error messages if enabled
+    self.trace = None
+
+    self.reset()
+
+  def reset(self):
+    """Put the machine back in its initial state"""
     # registers
     self.rip = 0
     self.rans = 0
@@ -25,22 +66,46 @@ class VirtualMachine:
     self.pgrm = None
     self.label_addrs = {}
 
+    if self.trace is not None:
+      self.trace.clear()
+
   def __str__(self):
     """Dump machine state into a string for error messages"""
-    if self.rip >= 0 and self.rip < len(self.pgrm):
-      cur_instr = str(self.pgrm[self.rip])
+    dump = str(self.state())
+    if self.trace is not None:
+      dump += "\n" + self.trace.dump(self.pgrm)
+    return dump
+
+  def state(self) -> MachineState:
+    """Take a snapshot of the current machine state"""
+    if self.pgrm is not None and self.rip >= 0 and self.rip < len(self.pgrm):
+      cur_instr = self.pgrm[self.rip]
     else:
-      cur_instr = f"no instruction at rip={self.rip}"
+      cur_instr = None
 
-    return \
-      "Registers:\n" + \
-      f"  rip={self.rip} rans={self.rans} rsp={self.rsp}\n" + \
-      "Flags:\n" + \
-      f"  fequal={self.fequal} fless={self.fless}\n" + \
-      f"Stack: (size={STACK_SIZE})\n" + \
-      f"  {self.stack[:15]}... (first 15)\n" + \
-      "Current Instruction:\n" + \
-      cur_instr
+    return MachineState(self.rip, self.rans, self.rsp,
+      self.fequal, self.fless, list(self.stack), cur_instr)
+
+  def attach(self, hook: Hook):
+    """Attach a hook to instrument every program this machine executes"""
+    self.hooks.append(hook)
+
+  def detach(self, hook: Hook):
+    """Remove a previously attached hook"""
+    self.hooks.remove(hook)
+
+  def active_hooks(self) -> List[Hook]:
+    """The attached hooks that need to observe execution"""
+    return [h for h in self.hooks if h.active()]
+
+  def enable_trace(self, size: int) -> TraceBuffer:
+    """Record the last `size` instructions executed, so that
+    errors report how the machine got into its final state"""
+    if self.trace is not None:
+      self.detach(self.trace)
+    self.trace = TraceBuffer(size)
+    self.attach(self.trace)
+    return self.trace
 
   def load_operand(self, op: Operand) -> float:
     """Get the current value stored in an operand"""
@@ -93,13 +158,26 @@ class VirtualMachine:
     else:
       raise InvalidTarget(self, label)
 
-  def execute(self, pgrm: List[Instr], suppress_output=False):
+  def execute(self, pgrm: List[Instr], suppress_output=False, label_addrs=None):
     """Execute a program (list of instructions), leaving
     the machine in a new state"""
-    self.__init__()
+    self.load(pgrm, suppress_output, label_addrs)
+
+    # only pay for instrumentation if some hook needs it
+    hooks = self.active_hooks()
+    if len(hooks) == 0:
+      self.run()
+    else:
+      self.run_hooked(hooks)
+
+  def load(self, pgrm: List[Instr], suppress_output=False, label_addrs=None):
+    """Reset the machine and prepare it to run a program
+    from its entry label. The program's labels can be given already
+    mapped (as map_labels would), e.g. by the assembler"""
+    self.reset()
     self.suppress_output = suppress_output
     self.pgrm = pgrm
-    self.label_addrs = self.map_labels(pgrm)
+    self.label_addrs = label_addrs if label_addrs is not None else self.map_labels(pgrm)
 
     if ENTRY_LABEL not in self.label_addrs:
       raise NoEntry(self)
@@ -107,12 +185,72 @@ class VirtualMachine:
     # start execution at the entry label
     self.rip = self.label_addrs[ENTRY_LABEL]
 
+  def run(self):
+    """Run the loaded program until it halts"""
+    pgrm = self.pgrm
+
     # when rip has incremented past last instr, halt
     while self.rip != len(pgrm):
       if self.rip < 0 or self.rip > len(pgrm):
         raise InvalidRip(self, self.rip)
       self.execute_instr(pgrm[self.rip])
 
+  def run_for(self, n: int, hooks=None) -> bool:
+    """Run the loaded program for at most n instructions,
+    returning whether it has halted. Given hooks are notified
+    before every instruction (but not started or finished)"""
+    pgrm = self.pgrm
+    if hooks:
+      return self.run_hooked_for(n, hooks)
+
+    while self.rip != len(pgrm):
+      if n == 0:
+        return False
+      n -= 1
+      if self.rip < 0 or self.rip > len(pgrm):
+        raise InvalidRip(self, self.rip)
+      self.execute_instr(pgrm[self.rip])
+
+    return True
+
+  def run_hooked_for(self, n: int, hooks: List[Hook]) -> bool:
+    pgrm = self.pgrm
+
+    while self.rip != len(pgrm):
+      if n == 0:
+        return False
+      n -= 1
+      if self.rip < 0 or self.rip > len(pgrm):
+        raise InvalidRip(self, self.rip)
+      instr = pgrm[self.rip]
+      for h in hooks:
+        h.before_instr(self, instr)
+      self.execute_instr(instr)
+
+    return True
+
+  def run_hooked(self, hooks: List[Hook]):
+    """Run the loaded program until it halts, notifying
+    the given hooks before every instruction"""
+    pgrm = self.pgrm
+    started = []
+
+    try:
+      for h in hooks:
+        h.start(self)
+        started.append(h)
+
+      while self.rip != len(pgrm):
+        if self.rip < 0 or self.rip > len(pgrm):
+          raise InvalidRip(self, self.rip)
+        instr = pgrm[self.rip]
+        for h in hooks:
+          h.before_instr(self, instr)
+        self.execute_instr(instr)
+    finally:
+      for h in started:
+        h.finish(self)
+
   def execute_instr(self, instr: Instr):
     """Execute a single instruction"""
     # copy src into dest
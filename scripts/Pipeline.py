@@ -0,0 +1,91 @@
+import time
+import tracemalloc
+
+class Stage:
+  """Measurements for one run of a pipeline stage"""
+
+  def __init__(self, name: str):
+    self.name = name
+    self.wall = 0.0
+    self.cpu = 0.0
+    self.peak_mem = 0
+    self.error = None
+
+class StageHook:
+  """A StageHook is notified around every stage a Pipeline runs"""
+
+  def before_stage(self, pipeline, name: str):
+    pass
+
+  def after_stage(self, pipeline, stage: Stage):
+    """Called after a stage finishes, or fails (stage.error is set)"""
+    pass
+
+class Pipeline:
+  """Drives the stages of handling a program (e.g. lex, parse, compile,
+  emit, execute), recording the wall and CPU time of each and, if
+  measuring memory, the peak memory allocated during it (via tracemalloc,
+  which slows stages down noticeably)"""
+
+  def __init__(self, memory=False):
+    self.memory = memory
+    self.stages = []
+    self.hooks = []
+
+  def add_hook(self, hook: StageHook):
+    self.hooks.append(hook)
+
+  def stage(self, name: str, fn, *args):
+    """Run fn(*args) as the named stage, returning its result"""
+    for h in self.hooks:
+      h.before_stage(self, name)
+
+    stage = Stage(name)
+    self.stages.append(stage)
+
+    tracing = self.memory and not tracemalloc.is_tracing()
+    if tracing:
+      tracemalloc.start()
+    elif self.memory:
+      tracemalloc.clear_traces()
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+      return fn(*args)
+    except BaseException as err:
+      stage.error = err
+      raise
+    finally:
+      stage.wall = time.perf_counter() - wall
+      stage.cpu = time.process_time() - cpu
+      if self.memory:
+        stage.peak_mem = tracemalloc.get_traced_memory()[1]
+      if tracing:
+        tracemalloc.stop()
+
+      for h in self.hooks:
+        h.after_stage(self, stage)
+
+  def total(self, attr: str):
+    """Sum of a measurement over all stages run"""
+    return sum(getattr(s, attr) for s in self.stages)
+
+  def report(self) -> str:
+    """Table of measurements per stage"""
+    lines = [f"{'stage':<10} {'wall ms':>10} {'cpu ms':>10} {'peak KiB':>10}"]
+    for s in self.stages + [self.total_stage()]:
+      mem = f"{s.peak_mem / 1024:>10.1f}" if self.memory else f"{'-':>10}"
+      failed = "  (failed)" if s.error is not None else ""
+      lines.append(
+        f"{s.name:<10} {s.wall * 1000:>10.3f} {s.cpu * 1000:>10.3f} {mem}{failed}")
+    if self.memory:
+      lines.append("(times measured while tracing memory, so inflated)")
+    return "\n".join(lines)
+
+  def total_stage(self) -> Stage:
+    total = Stage("total")
+    total.wall = self.total("wall")
+    total.cpu = self.total("cpu")
+    total.peak_mem = max([s.peak_mem for s in self.stages] + [0])
+    return total
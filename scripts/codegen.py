@@ -0,0 +1,178 @@
+from typing import List
+from compiler.Defn import *
+from compiler.Expr import *
+from compiler.util import function_label
+from rasm.Instr import *
+from rasm.Operand import *
+
+ENTRY_BLOCK = "entry"
+
+# the measurements made of each block of generated code
+METRICS = ["instrs", "labels", "slots", "spills", "nodes"]
+
+# those that depend on the compiler, compared between two compilations
+CODE_METRICS = ["instrs", "labels", "slots", "spills"]
+
+class BlockStats:
+  """Measurements of the code generated for one defn, or the entry block"""
+
+  def __init__(self, name: str):
+    self.name = name
+    self.instrs = 0   # instructions, not counting labels
+    self.labels = 0
+    self.slots = 0    # highest stack offset used
+    self.spills = 0   # stores of rans to the stack that are read back
+    self.nodes = 0    # AST nodes the code was generated from
+
+  def ratio(self) -> float:
+    """Instructions generated per AST node"""
+    return self.instrs / self.nodes if self.nodes > 0 else 0.0
+
+  def add(self, other):
+    for metric in METRICS:
+      setattr(self, metric, getattr(self, metric) + getattr(other, metric))
+
+def split_blocks(instrs: List[Instr], defns: List[Defn]) -> list:
+  """Split generated code into (name, instructions) blocks, one per
+  defn (from its function label) and one from the entry label on.
+  Code before the first of these is left out"""
+  starts = { function_label(d.name): d.name for d in defns }
+  starts[ENTRY_BLOCK] = ENTRY_BLOCK
+
+  blocks = []
+  for ins in instrs:
+    if ins.isLabel() and ins.label in starts:
+      blocks.append((starts[ins.label], []))
+    if len(blocks) > 0:
+      blocks[-1][1].append(ins)
+  return blocks
+
+def block_stats(name: str, instrs: List[Instr]) -> BlockStats:
+  stats = BlockStats(name)
+  for ins in instrs:
+    if ins.isLabel():
+      stats.labels += 1
+    else:
+      stats.instrs += 1
+    offs = [op.off for op in operands(ins) if op.isStackOff()]
+    stats.slots = max([stats.slots] + offs)
+  stats.spills = spill_pairs(instrs)
+  return stats
+
+def spill_pairs(instrs: List[Instr]) -> int:
+  """Number of times rans is stored in a stack slot and later read back
+  from it, before the slot is stored to again. Stores that are never read
+  here (e.g. arguments, read by the callee) are not counted"""
+  pending = set()
+  pairs = 0
+  for ins in instrs:
+    if ins.isMov() and ins.src.isRans() and ins.dest.isStackOff():
+      pending.add(ins.dest.off)
+      continue
+    for op in reads(ins):
+      if op.isStackOff() and op.off in pending:
+        pending.remove(op.off)
+        pairs += 1
+  return pairs
+
+def operands(ins: Instr) -> List[Operand]:
+  if ins.isMov() or ins.isAdd() or ins.isSub() or ins.isMul():
+    return [ins.src, ins.dest]
+  elif ins.isCmp():
+    return [ins.left, ins.right]
+  elif ins.isPrint():
+    return [ins.operand]
+  return []
+
+def reads(ins: Instr) -> List[Operand]:
+  """Operands an instruction reads from"""
+  if ins.isMov():
+    return [ins.src]
+  return operands(ins)
+
+def count_nodes(exp: Expr) -> int:
+  """Number of nodes in an expression tree"""
+  n = 0
+  stack = [exp]
+  while len(stack) > 0:
+    e = stack.pop()
+    n += 1
+    stack += children(e)
+  return n
+
+def children(exp: Expr) -> List[Expr]:
+  if exp.isAdd1() or exp.isSub1() or exp.isPrintExpr():
+    return [exp.operand]
+  elif exp.isPlus() or exp.isMinus() or exp.isTimes() or exp.isEquals():
+    return [exp.left, exp.right]
+  elif exp.isIf():
+    return [exp.cond, exp.thn, exp.els]
+  elif exp.isLet():
+    return [exp.value, exp.body]
+  elif exp.isApp():
+    return list(exp.args)
+  return []
+
+def codegen_stats(defns: List[Defn], exprs: List[Expr], instrs: List[Instr]) -> List[BlockStats]:
+  """Stats per defn and for the entry block, in the order generated"""
+  nodes = { d.name: count_nodes(d.body) for d in defns }
+  nodes[ENTRY_BLOCK] = sum(count_nodes(e) for e in exprs)
+
+  rows = []
+  for (name, block) in split_blocks(instrs, defns):
+    stats = block_stats(name, block)
+    stats.nodes = nodes[name]
+    rows.append(stats)
+  return rows
+
+def total(rows: List[BlockStats]) -> BlockStats:
+  """Sums over all blocks (the total slots is the most any block uses)"""
+  stats = BlockStats("total")
+  for row in rows:
+    stats.add(row)
+  stats.slots = max([row.slots for row in rows] + [0])
+  return stats
+
+def report(rows: List[BlockStats]) -> str:
+  """Table of stats per block"""
+  width = max([len("block")] + [len(row.name) for row in rows])
+  lines = [f"{'block':<{width}} {'instrs':>7} {'labels':>7} {'slots':>6} " + \
+    f"{'spills':>7} {'nodes':>6} {'instrs/node':>12}"]
+  for row in rows + [total(rows)]:
+    lines.append(f"{row.name:<{width}} {row.instrs:>7} {row.labels:>7} {row.slots:>6} " + \
+      f"{row.spills:>7} {row.nodes:>6} {row.ratio():>12.2f}")
+  return "\n".join(lines)
+
+def diff_report(old: List[BlockStats], new: List[BlockStats]) -> str:
+  """Table comparing the stats of two compilations of a program, per block"""
+  old_rows = { row.name: row for row in old + [total(old)] }
+  new_rows = { row.name: row for row in new + [total(new)] }
+  names = [row.name for row in new] + [row.name for row in old if row.name not in new_rows]
+  names.append("total")
+
+  width = max([len("block")] + [len(name) for name in names])
+  lines = [f"{'block':<{width}} " + " ".join(f"{m:>16}" for m in CODE_METRICS) + \
+    f" {'instrs/node':>16}"]
+  for name in names:
+    (a, b) = (old_rows.get(name), new_rows.get(name))
+    cols = [change(getattr(a, m) if a else None, getattr(b, m) if b else None)
+      for m in CODE_METRICS]
+    cols.append(change(a.ratio() if a else None, b.ratio() if b else None))
+    lines.append(f"{name:<{width}} " + " ".join(f"{c:>16}" for c in cols))
+  return "\n".join(lines)
+
+def change(a, b) -> str:
+  """How a measurement changed, e.g. "12 -> 10 (-2)" """
+  if a is None or b is None:
+    return f"{show(a)} -> {show(b)}"
+  delta = b - a
+  if delta == 0:
+    return show(b)
+  return f"{show(a)} -> {show(b)} ({'+' if delta > 0 else ''}{show(delta)})"
+
+def show(n) -> str:
+  if n is None:
+    return "-"
+  if isinstance(n, float):
+    return f"{n:.2f}"
+  return str(n)
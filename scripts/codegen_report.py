@@ -0,0 +1,60 @@
+import sys
+import argparse
+import importlib
+from .util import *
+from .codegen import *
+from parsing.parse_program import *
+from compiler.Errors import *
+from compiler.compile import compile as student_compile
+from demo.compile import compile as demo_compile
+
+argparser = argparse.ArgumentParser(
+  description="Report the size and quality of the code generated for a program")
+argparser.add_argument(
+  'file', type=str, nargs=1, help='a program to compile')
+argparser.add_argument(
+  '-c', '--compiler', default='demo',
+  help='compiler to use: demo, student, or module:function (default demo)')
+argparser.add_argument(
+  '--diff',
+  help='compare against another compiler (demo, student, or module:function)')
+
+args = argparser.parse_args()
+filename = args.file[0]
+
+def load_compiler(name: str):
+  """The compile function named on the command line"""
+  if name == "demo":
+    return demo_compile
+  elif name == "student":
+    return student_compile
+  (module, _, fn) = name.partition(":")
+  if fn == "":
+    raise ValueError(f"unknown compiler {name}, expected demo, student or module:function")
+  return getattr(importlib.import_module(module), fn)
+
+def compile_stats(name: str, defns, exprs) -> List[BlockStats]:
+  instrs = load_compiler(name)(defns, exprs)
+  return codegen_stats(defns, exprs, instrs)
+
+try:
+  pgrm = map_file(filename)
+  (defns, exprs) = parse_program(pgrm)
+  unmap_file(pgrm)
+
+  if args.diff:
+    old = compile_stats(args.compiler, defns, exprs)
+    new = compile_stats(args.diff, defns, exprs)
+    print(f"{args.compiler} -> {args.diff}")
+    print(diff_report(old, new))
+  else:
+    print(report(compile_stats(args.compiler, defns, exprs)))
+except FileNotFoundError as err:
+  print(f"file not found: {filename}")
+  sys.exit(1)
+except (LexError, ParseError, CompileError, ValueError) as err:
+  print(err)
+  sys.exit(1)
+except NotImplementedError as err:
+  print(f"NotImplementedError: {err}")
+  sys.exit(1)
@@ -1,9 +1,16 @@
 import sys
 import argparse
 from .util import *
+from .Pipeline import *
+from .instrument import *
+from .report import *
 from parsing.parse_program import *
+from parsing.parallel import parse_program_parallel
+from parsing.unparse import write_instrs
 from rasm.VirtualMachine import *
 from compiler.Errors import *
+from compiler.Arena import ExprArena
+from compiler.util import function_names
 from compiler.compile import compile as student_compile
 from demo.compile import compile as demo_compile
 
@@ -21,43 +28,92 @@ argparser.add_argument(
   '-d', '--demo', 
   help='compile using the demo implementation',
   action='store_true')
+argparser.add_argument(
+  '-j', '--jobs', type=int,
+  help='lex and parse chunks of the program on this many processes')
+argparser.add_argument(
+  '--arena',
+  help='parse into a compact array-backed AST, for very large programs',
+  action='store_true')
+argparser.add_argument(
+  '--timings',
+  help='report the time taken by each stage of the pipeline',
+  action='store_true')
+argparser.add_argument(
+  '--memory',
+  help='report the peak memory of each stage (traced with tracemalloc, which inflates the times reported)',
+  action='store_true')
+argparser.add_argument(
+  '--report',
+  help='write a JSON report of the run (size, instructions executed, calls, stack use, timings) to a file')
+add_vm_arguments(argparser)
 
 args = argparser.parse_args()
 filename = args.file[0]
 
+def write_rasm(instrs: List[Instr], filename: str):
+  try:
+    with open(filename, "w+") as file:
+      write_instrs(file, instrs)
+  except Exception as err:
+    print(f"error with rasm file: {err}")
+
+pipeline = Pipeline(memory=args.memory)
+
+# what the run got as far as, for the report
+instrs = None
+vm = None
+counters = None
+error = None
+
 try:
   # open program file for reading
-  file = open(filename, "r")
-  pgrm = file.read()
+  pgrm = pipeline.stage("read", map_file, filename)
 
   try:
     # parse defns and body
-    (defns, exprs) = parse_program(pgrm)
+    if args.jobs:
+      (defns, exprs) = pipeline.stage("parse", parse_program_parallel, pgrm, args.jobs, 4,
+        ExprArena if args.arena else None)
+      unmap_file(pgrm)
+    else:
+      tokens = pipeline.stage("lex", lexer.lex, pgrm)
+      unmap_file(pgrm)
+      parser = make_parser(ExprArena() if args.arena else None)
+      (defns, exprs) = pipeline.stage("parse", parser.parse, tokens)
 
     # compile program to rasm
     if args.demo:
-      instrs = demo_compile(defns, exprs)
+      instrs = pipeline.stage("compile", demo_compile, defns, exprs)
     else:
-      instrs = student_compile(defns, exprs)
+      instrs = pipeline.stage("compile", student_compile, defns, exprs)
 
     # if requested, output generated rasm
     if args.rasm:
-      try:
-        file = open(args.rasm, "w+")
-        for ins in instrs:
-          file.write(str(ins) + '\n')
-      except Exception as err:
-        print(f"error with rasm file: {err}")
+      pipeline.stage("emit", write_rasm, instrs, args.rasm)
 
     # if requested, run program
     if args.run:
       vm = VirtualMachine()
-      vm.execute(instrs)
+      if args.report:
+        counters = RunCounters()
+        vm.attach(counters)
+      pipeline.stage("execute", run_vm, args, vm, instrs, function_names(defns))
   except (LexError, ParseError, CompileError, VMError) as err:
+    error = err
     print(err)
   except NotImplementedError as err:
+    error = err
     print(f"NotImplementedError: {err}")
   except Exception as err:
+    error = err
     print(f"InternalError: {err}")
-except FileNotFoundError:
-  print(f"file not found: {filename}")
\ No newline at end of file
+except FileNotFoundError as err:
+  error = err
+  print(f"file not found: {filename}")
+
+if args.timings or args.memory:
+  print(pipeline.report())
+
+if args.report:
+  write_report(args.report, run_report(filename, pipeline, instrs, vm, counters, error))
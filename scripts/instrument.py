@@ -0,0 +1,58 @@
+from rasm.VirtualMachine import *
+from rasm.Profiler import *
+from rasm.Sampler import *
+from rasm.Stats import *
+
+def add_vm_arguments(argparser):
+  """Add the flags for instrumenting VM runs to a script's arguments"""
+  argparser.add_argument(
+    '-t', '--trace', type=int, metavar='N',
+    help='keep a trace of the last N instructions executed, shown on VM errors')
+  argparser.add_argument(
+    '--trace-file',
+    help='write the instruction trace to a file after running (requires --trace)')
+  argparser.add_argument(
+    '-p', '--profile',
+    help='profile the program by function, and print a report after running',
+    action='store_true')
+  argparser.add_argument(
+    '--flamegraph',
+    help='profile the program and write collapsed call stacks to a file')
+  argparser.add_argument(
+    '--sample', type=int, metavar='N',
+    help='sample the call stack every N instructions, and print hotness tables after running')
+  argparser.add_argument(
+    '--stats',
+    help='count executed opcodes, pairs and triples, adding them to the counts in a JSON file')
+
+def run_vm(args, vm: VirtualMachine, instrs: List[Instr], names=None, label_addrs=None):
+  """Execute a program with the instrumentation requested in args,
+  writing out what it collected once the program halts or fails"""
+  if args.trace:
+    vm.enable_trace(args.trace)
+  if args.profile or args.flamegraph:
+    profiler = Profiler(names)
+    vm.attach(profiler)
+  if args.stats:
+    stats = OpcodeStats()
+    vm.attach(stats)
+  if args.sample:
+    sampler = Sampler(args.sample, names=names)
+
+  try:
+    if args.sample:
+      sampler.run(vm, instrs, label_addrs=label_addrs)
+    else:
+      vm.execute(instrs, label_addrs=label_addrs)
+  finally:
+    if args.trace and args.trace_file:
+      vm.trace.export(args.trace_file, vm.pgrm)
+    if args.profile:
+      print(profiler.report())
+    if args.flamegraph:
+      with open(args.flamegraph, "w") as file:
+        profiler.write_collapsed(file)
+    if args.sample:
+      print(sampler.report(instrs))
+    if args.stats:
+      stats.write(args.stats, merge=True)
@@ -0,0 +1,63 @@
+import json
+import math
+from .Pipeline import *
+from rasm.Instr import *
+from rasm.Stats import RunCounters
+
+def run_report(filename: str, pipeline: Pipeline, instrs, vm, counters: RunCounters, error) -> dict:
+  """Summarize a run of a script as a JSON-serializable dict. instrs, vm
+  and counters are None for whatever the run didn't get as far as, and
+  execution is None if the counters never saw the program start"""
+  report = {
+    "file": filename,
+    "ok": error is None,
+    "error": None,
+    "program": None,
+    "execution": None,
+    "phases": {},
+    # whether phase times were measured while tracing memory (inflated)
+    "memory_traced": pipeline.memory,
+  }
+
+  if error is not None:
+    report["error"] = {
+      "class": type(error).__name__,
+      "message": str(error).split("\n")[0],
+    }
+
+  if instrs is not None:
+    report["program"] = {
+      "instructions": len(instrs),
+      "labels": len([ins for ins in instrs if ins.isLabel()]),
+    }
+
+  if vm is not None and counters is not None and counters.started:
+    report["execution"] = {
+      "instructions": counters.instructions,
+      "calls": counters.calls,
+      "max_call_depth": counters.max_depth,
+      "stack_high_water": counters.stack_high_water,
+      "rans": json_number(vm.rans),
+      "rsp": json_number(vm.rsp),
+    }
+
+  for s in pipeline.stages:
+    report["phases"][s.name] = {
+      "wall_ms": s.wall * 1000,
+      "cpu_ms": s.cpu * 1000,
+      "peak_kib": s.peak_mem / 1024 if pipeline.memory else None,
+    }
+
+  return report
+
+def json_number(n):
+  """A machine value as JSON has it: infinities and NaN, which JSON can't
+  represent, become the strings "inf", "-inf" and "nan" instead"""
+  if isinstance(n, float) and not math.isfinite(n):
+    return str(n)
+  return n
+
+def write_report(filename: str, report: dict):
+  with open(filename, "w") as file:
+    json.dump(report, file, indent=2, allow_nan=False)
+    file.write("\n")
@@ -2,28 +2,64 @@ import sys
 import argparse
 from rasm.VirtualMachine import *
 from parsing.parse_rasm import *
+from parsing.assemble import assemble_linked
 from parsing.Parser import ParseError
 from parsing.Lexer import LexError
 from .util import *
+from .Pipeline import *
+from .instrument import *
+from .report import *
 
 argparser = argparse.ArgumentParser(description="Run a rasm file")
 argparser.add_argument(
   'file', type=str, nargs=1, help='a rasm file to run')
+argparser.add_argument(
+  '--timings',
+  help='report the time taken by each stage of the pipeline',
+  action='store_true')
+argparser.add_argument(
+  '--memory',
+  help='report the peak memory of each stage (traced with tracemalloc, which inflates the times reported)',
+  action='store_true')
+argparser.add_argument(
+  '--report',
+  help='write a JSON report of the run (size, instructions executed, calls, stack use, timings) to a file')
+add_vm_arguments(argparser)
 
 args = argparser.parse_args()
 filename = args.file[0]
 
+pipeline = Pipeline(memory=args.memory)
+
+# what the run got as far as, for the report
+instrs = None
+vm = None
+counters = None
+error = None
+
 try:
-  file = open(filename, "r")
-  pgrm = file.read()
+  pgrm = pipeline.stage("read", map_file, filename)
 
   try:
-    instrs = parse_rasm(pgrm)
+    (instrs, label_addrs) = pipeline.stage("assemble", assemble_linked, pgrm)
+    unmap_file(pgrm)
     vm = VirtualMachine()
-    vm.execute(instrs)
+    if args.report:
+      counters = RunCounters()
+      vm.attach(counters)
+    pipeline.stage("execute", run_vm, args, vm, instrs, None, label_addrs)
   except (LexError, ParseError, VMError) as err:
+    error = err
     print(err)
   except Exception as err:
+    error = err
     print(f"InternalError: {err}")
-except FileNotFoundError:
-  print(f"{filename} not found")
\ No newline at end of file
+except FileNotFoundError as err:
+  error = err
+  print(f"{filename} not found")
+
+if args.timings or args.memory:
+  print(pipeline.report())
+
+if args.report:
+  write_report(args.report, run_report(filename, pipeline, instrs, vm, counters, error))
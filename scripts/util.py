@@ -1,3 +1,5 @@
+import os
+import mmap
 
 def print_num(n):
   """Print a number with proper formatting depending on int/float"""
@@ -5,3 +7,16 @@ def print_num(n):
     return print(int(n))
   else:
     return print(n)
+
+def map_file(filename: str):
+  """Map a file into memory read-only, so it can be lexed as bytes without
+  reading it into a string. Empty files can't be mapped, and give b"" """
+  with open(filename, "rb") as file:
+    if os.fstat(file.fileno()).st_size == 0:
+      return b""
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def unmap_file(pgrm):
+  """Release a file mapped with map_file, once it has been lexed"""
+  if isinstance(pgrm, mmap.mmap):
+    pgrm.close()
@@ -0,0 +1,96 @@
+import unittest
+import tracemalloc
+import compiler.util
+from parsing.parse_program import *
+from parsing.parallel import parse_program_parallel
+from compiler.Arena import *
+from demo.compile import compile
+from bench.generate import *
+
+EXAMPLES = ["examples/fact.lisp", "examples/fib.lisp", "examples/parity.lisp"]
+
+def to_exprs(defns: list, exprs: list) -> tuple:
+  """Defns and exprs with arena views converted to Expr objects"""
+  return ([Defn(d.name, d.params, d.body.to_expr()) for d in defns],
+    [e.to_expr() for e in exprs])
+
+def kept_memory(fn) -> int:
+  """Bytes still allocated by a call once it returns (with its result)"""
+  tracemalloc.start()
+  result = fn()
+  kept = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return kept
+
+def compiled(program: tuple) -> list:
+  """The rasm a parsed program compiles to, with labels numbered from 0"""
+  compiler.util.GENSYM_COUNTER = 0
+  return [str(ins) for ins in compile(*program)]
+
+class ArenaTests(unittest.TestCase):
+
+  def test_builder(self):
+    arena = ExprArena()
+    x = arena.Name("x")
+    exp = arena.root(arena.Let("x", arena.Num(2.0),
+      arena.App("f", [arena.Plus(x, arena.Num(1.0)), x])))
+
+    self.assertTrue(exp.isLet())
+    self.assertEqual((exp.name, exp.value.value), ("x", 2.0))
+    self.assertTrue(exp.body.isApp())
+    self.assertEqual(exp.body.fname, "f")
+    (arg1, arg2) = exp.body.args
+    self.assertTrue(arg1.isPlus() and arg1.left.isName() and arg1.right.isNum())
+    self.assertEqual(arg2.name, "x")
+    self.assertEqual(exp.to_expr(),
+      Let("x", Num(2), App("f", [Plus(Name("x"), Num(1)), Name("x")])))
+    self.assertEqual(str(exp), "(let (x 2) (f (+ x 1) x))")
+    # names are stored once
+    self.assertEqual(arena.strings, ["x", "f"])
+
+  def test_parse(self):
+    pgrms = [generate(Shape(defns=10), seed) for seed in range(5)]
+    for filename in EXAMPLES:
+      with open(filename, "r") as file:
+        pgrms.append(file.read())
+    pgrms += ["(f)", "(print (if (= 1 2) (g) (let (y 3) y)))", ""]
+
+    for pgrm in pgrms:
+      self.assertEqual(to_exprs(*parse_program_arena(pgrm)), parse_program(pgrm))
+
+    with self.assertRaises(ParseError):
+      parse_program_arena("(let (x 1))")
+
+  def test_parallel(self):
+    pgrm = generate(Shape(defns=40), 2)
+    for jobs in [1, 2]:
+      (defns, exprs) = parse_program_parallel(pgrm, jobs, builder_class=ExprArena)
+      self.assertIsInstance(exprs[0], ExprView)
+      self.assertIsInstance(defns[0].body, ExprView)
+      self.assertEqual(to_exprs(defns, exprs), parse_program(pgrm))
+
+  def test_deep(self):
+    depth = 10000
+    (defns, exprs) = parse_program_arena("(sub1 " * depth + "x" + ")" * depth)
+    exp = exprs[0].to_expr()
+    for i in range(depth):
+      exp = exp.operand
+    self.assertEqual(exp, Name("x"))
+
+  def test_compile(self):
+    pgrms = [generate(Shape(defns=20), seed) for seed in range(3)]
+    for filename in EXAMPLES:
+      with open(filename, "r") as file:
+        pgrms.append(file.read())
+
+    for pgrm in pgrms:
+      self.assertEqual(compiled(parse_program_arena(pgrm)), compiled(parse_program(pgrm)))
+
+  def test_memory(self):
+    pgrm = generate(Shape(defns=200))
+    self.assertLess(
+      kept_memory(lambda: parse_program_arena(pgrm)),
+      kept_memory(lambda: parse_program(pgrm)) / 3)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from parsing.parse_rasm import *
+from parsing.assemble import *
+from parsing.parse_program import parse_program
+from rasm.VirtualMachine import *
+from demo.compile import compile
+from bench.generate import *
+from scripts.util import map_file, unmap_file
+
+def outcome(fn):
+  """The result of a parse, or the class and message of its error"""
+  try:
+    return fn()
+  except (LexError, ParseError) as err:
+    return (type(err).__name__, str(err))
+
+class AssembleTests(unittest.TestCase):
+
+  def test_lines(self):
+    pgrm = "f:\n\tmov [rsp + 1], rans\n\tadd -2.5, [rsp+3]\n\tret\n\n" + \
+      "entry:\n  cmp rsp,1\n\tje f\n\tcall f\n\tprint rans  \r\n\tsub 1, rans\n\tmul 2, rans\n\tjmp entry\n\tjne f"
+    self.assertEqual(assemble(pgrm), parse_rasm(pgrm))
+
+  def test_compiled(self):
+    for seed in range(3):
+      pgrm = "\n".join(str(ins) for ins in compile(*parse_program(generate(Shape(defns=20), seed))))
+      self.assertEqual(assemble(pgrm), parse_rasm(pgrm))
+      self.assertEqual(assemble(pgrm.encode()), parse_rasm(pgrm))
+
+  def test_mapped(self):
+    pgrm = "\n".join(str(ins) for ins in compile(*parse_program(generate(Shape(defns=10), 1))))
+    (fd, filename) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+      with open(filename, "w") as file:
+        file.write(pgrm)
+      mapped = map_file(filename)
+      (instrs, label_addrs) = assemble_linked(mapped)
+      unmap_file(mapped)
+    finally:
+      os.remove(filename)
+    self.assertEqual((instrs, label_addrs), assemble_linked(pgrm))
+    self.assertTrue(all(type(ins.label) is str for ins in instrs if ins.isLabel()))
+
+  def test_interning(self):
+    (instrs, label_addrs) = assemble_linked("entry:\n\tmov [rsp + 1], rans\n\tjmp entry\n\tmov rans, [rsp + 1]")
+    self.assertIs(instrs[1].src, instrs[3].dest)
+    self.assertIs(instrs[1].dest, instrs[3].src)
+    self.assertIs(instrs[0].label, instrs[2].target)
+    self.assertEqual(label_addrs, { "entry": 1 })
+
+  def test_linked(self):
+    pgrm = "\n".join(str(ins) for ins in compile(*parse_program("(def (f x) (* x x)) (f 7)")))
+    (instrs, label_addrs) = assemble_linked(pgrm)
+    vm = VirtualMachine()
+    self.assertEqual(label_addrs, vm.map_labels(instrs))
+    vm.execute(instrs, suppress_output=True, label_addrs=label_addrs)
+    self.assertEqual(vm.rans, 49)
+
+    # duplicate labels are left for the VM to report
+    (instrs, label_addrs) = assemble_linked("entry:\na:\na:")
+    self.assertIsNone(label_addrs)
+    with self.assertRaises(DuplicateLabel):
+      vm.execute(instrs, label_addrs=label_addrs)
+
+  def test_other_layouts(self):
+    # rasm not written one instruction per line is still parsed
+    for pgrm in ["entry: mov 1, rans print rans", "mov\n1\n,\nrans", "ret ret"]:
+      self.assertEqual(assemble(pgrm), parse_rasm(pgrm))
+
+  def test_errors(self):
+    # errors are reported as the parser reports them, and stray
+    # tokens where instructions should be fail at once
+    for pgrm in [",", "entry:\n]", "mov:", "jmp ret", "mov [rsp + 1.5], rans",
+      "mov [rsp + -1], rans", "add 1,", "print", "x", "entry:\n@"]:
+      result = outcome(lambda: assemble(pgrm))
+      self.assertIn(result[0], ["LexError", "ParseError"])
+      self.assertEqual(result, outcome(lambda: parse_rasm(pgrm)))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,194 @@
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+from bench.run_benchmarks import *
+from bench import run_benchmarks
+from bench.generate import *
+from bench.scaling import scale, growth
+from bench.conformance import *
+from parsing.parse_program import parse_program
+from rasm.VirtualMachine import *
+from demo.compile import compile
+
+def saved_results(times: dict) -> dict:
+  """Results in the saved format, from {workload: {phase: [times]}}"""
+  return {
+    "meta": {},
+    "benchmarks": {
+      name: { phase: summarize(runs) for (phase, runs) in phases.items() }
+      for (name, phases) in times.items()
+    },
+  }
+
+class BenchTests(unittest.TestCase):
+
+  def test_summarize(self):
+    self.assertEqual(summarize([3, 1, 2]), { "min": 1, "median": 2, "runs": [3, 1, 2] })
+
+  def test_run_suite(self):
+    results = run_suite(["examples/fact.lisp"], compile, warmup=0, repeat=2)
+    phases = results["benchmarks"]["fact"]
+    self.assertEqual(list(phases), PHASES)
+    for phase in PHASES:
+      self.assertEqual(len(phases[phase]["runs"]), 2)
+      self.assertLessEqual(phases[phase]["min"], phases[phase]["median"])
+    self.assertEqual(results["meta"]["repeat"], 2)
+
+  def test_compare(self):
+    baseline = saved_results({
+      "a": { "lex": [1.0], "execute": [2.0] },
+      "gone": { "lex": [1.0] },
+    })
+    results = saved_results({
+      "a": { "lex": [1.05, 1.5], "execute": [2.5] },
+      "new": { "lex": [1.0] },
+    })
+    rows = compare(results, baseline, 0.10, 0.001)
+    self.assertEqual([(r[0], r[1], r[5]) for r in rows], [
+      ("a", "lex", False),
+      ("a", "execute", True),
+    ])
+    self.assertAlmostEqual(rows[1][4], 1.25)
+
+    # tiny differences are noise, whatever the ratio
+    rows = compare(saved_results({ "a": { "lex": [0.0002] } }),
+      saved_results({ "a": { "lex": [0.0001] } }), 0.10, 0.001)
+    self.assertFalse(rows[0][5])
+
+  def test_mismatches(self):
+    baseline = { "meta": { "python": "3.11.7", "compiler": "demo" } }
+    self.assertEqual(mismatches({ "meta": { "python": "3.11.2", "compiler": "demo" } }, baseline), [])
+    self.assertEqual(mismatches({ "meta": { "python": "3.8.18", "compiler": "student" } }, baseline), [
+      ("python", "3.11", "3.8"),
+      ("compiler", "demo", "student"),
+    ])
+    # baselines from before a setting was recorded are compared anyway
+    self.assertEqual(mismatches({ "meta": { "python": "3.8.18" } }, { "meta": {} }), [])
+
+  def test_refuses_other_python(self):
+    (fd, filename) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+      write_json(filename, { "meta": { "python": "2.7.18" }, "benchmarks": {} })
+      with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) as err:
+        code = run_benchmarks.main(["examples/fact.lisp", "-n", "1", "-w", "0", "-b", filename])
+      self.assertEqual(code, 2)
+      self.assertIn("python 2.7", err.getvalue())
+    finally:
+      os.remove(filename)
+
+class GenerateTests(unittest.TestCase):
+
+  def run_generated(self, shape: Shape, seed=0):
+    (defns, exprs) = parse_program(generate(shape, seed))
+    vm = VirtualMachine()
+    vm.execute(compile(defns, exprs), suppress_output=True)
+    return (defns, exprs)
+
+  def test_shape(self):
+    (defns, exprs) = self.run_generated(Shape(defns=7, exprs=4, literals=3))
+    self.assertEqual([d.name for d in defns], [f"f{i}" for i in range(7)])
+    self.assertEqual(len(exprs), 7)
+    self.assertTrue(all(e.isPrintExpr() for e in exprs[:4]))
+    self.assertTrue(all(e.isNum() for e in exprs[4:]))
+
+  def test_valid(self):
+    shapes = [
+      Shape(),
+      Shape(defns=0),
+      Shape(defns=1),
+      Shape(depth=0, let_chain=0),
+      Shape(defns=20, fanout=12, depth=2),
+    ]
+    for shape in shapes:
+      for seed in range(5):
+        self.run_generated(shape, seed)
+
+  def test_deterministic(self):
+    shape = Shape(defns=5)
+    self.assertEqual(generate(shape, 3), generate(shape, 3))
+    self.assertNotEqual(generate(shape, 3), generate(shape, 4))
+
+  def test_deep(self):
+    # deeper than the generator could recurse
+    pgrm = generate(Shape(defns=1, depth=5000, let_chain=0))
+    self.assertGreater(pgrm.count("("), 5000)
+
+  def test_with_axis(self):
+    shape = Shape()
+    bigger = shape.with_axis("let_chain", 50)
+    self.assertEqual(bigger.let_chain, 50)
+    self.assertEqual(shape.let_chain, Shape().let_chain)
+    self.assertEqual(bigger.defns, shape.defns)
+
+  def test_scale(self):
+    points = scale("defns", [2, 4], Shape(), repeat=1)
+    self.assertEqual([p.size for p in points], [2, 4])
+    self.assertLess(points[0].chars, points[1].chars)
+    for p in points:
+      self.assertIsNone(p.error)
+      self.assertEqual(set(p.wall), { "parse", "compile", "execute" })
+      self.assertGreater(p.peak_mem["parse"], 0)
+    self.assertIsNotNone(growth(points, "parse"))
+
+class SubAsAdd(VirtualMachine):
+  """An engine with a bug: sub adds"""
+
+  def execute_instr(self, instr: Instr):
+    if instr.isSub():
+      instr = Add(instr.src, instr.dest)
+    super().execute_instr(instr)
+
+class NoStackCheck(VirtualMachine):
+  """An engine with a bug: reads past the stack give 0"""
+
+  def load_operand(self, op: Operand) -> float:
+    try:
+      return super().load_operand(op)
+    except BadStackAccess:
+      return 0
+
+class ConformanceTests(unittest.TestCase):
+
+  def test_reference(self):
+    cases = dict(CASES)
+    cases.update(compiled_cases(["examples/fact.lisp"]))
+    cases.update(microbenchmarks(iterations=3, unroll=2))
+    self.assertEqual(check(VirtualMachine, cases), [])
+
+  def test_mismatches(self):
+    mismatches = check(SubAsAdd, { "arith": CASES["arith"], "loop": CASES["loop"] })
+    self.assertEqual(mismatches, [("arith", "rans", -82, -124)])
+
+    mismatches = check(NoStackCheck, { "bad_stack_access": CASES["bad_stack_access"] })
+    self.assertEqual(mismatches, [
+      ("bad_stack_access", "error", "BadStackAccess", "none"),
+      ("bad_stack_access", "rans", 1, 0),
+    ])
+
+    mismatches = check(SubAsAdd, { "stack": [
+      Label(ENTRY_LABEL),
+      Mov(Imm(5), StackOff(3)),
+      Sub(Imm(1), StackOff(3)),
+    ] })
+    self.assertEqual(mismatches, [("stack", "stack[3]", 4, 6)])
+
+  def test_timings(self):
+    engines = { "reference": VirtualMachine, "other": VirtualMachine }
+    rows = timings(engines, microbenchmarks(iterations=5, unroll=2), repeat=1)
+    self.assertEqual([row[0] for row in rows], ["arithmetic", "moves", "branches", "call_ret"])
+    for (name, n, per_instr) in rows:
+      self.assertGreater(n, 5 * 2)
+      self.assertEqual(set(per_instr), set(engines))
+    self.assertIn("other ns", timing_table(rows, list(engines)))
+
+  def test_load_engine(self):
+    self.assertIs(load_engine("rasm.VirtualMachine:VirtualMachine"), VirtualMachine)
+    with self.assertRaises(ValueError):
+      load_engine("rasm.VirtualMachine")
+
+
+if __name__ == '__main__':
+  unittest.main()
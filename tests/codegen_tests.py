@@ -0,0 +1,78 @@
+import unittest
+from scripts.codegen import *
+from parsing.parse_program import parse_program
+from demo.compile import compile
+
+PGRM = """
+(def (double x) (+ x x))
+(def (quad x) (double (double x)))
+(print (quad 3))
+"""
+
+class CodegenTests(unittest.TestCase):
+
+  def test_count_nodes(self):
+    (defns, exprs) = parse_program(PGRM)
+    self.assertEqual(count_nodes(defns[0].body), 3)
+    self.assertEqual(count_nodes(defns[1].body), 3)
+    self.assertEqual(count_nodes(exprs[0]), 3)
+
+  def test_split_blocks(self):
+    (defns, exprs) = parse_program(PGRM)
+    instrs = [Mov(Imm(0), Rans())] + compile(defns, exprs)
+    blocks = split_blocks(instrs, defns)
+    self.assertEqual([name for (name, block) in blocks], ["double", "quad", "entry"])
+    self.assertEqual(sum(len(block) for (name, block) in blocks), len(instrs) - 1)
+    self.assertEqual(blocks[0][1][0], Label(function_label("double")))
+    self.assertEqual(blocks[2][1][0], Label(ENTRY_BLOCK))
+
+  def test_spill_pairs(self):
+    self.assertEqual(spill_pairs([
+      Mov(Rans(), StackOff(2)),   # spill
+      Mov(Imm(1), Rans()),
+      Add(StackOff(2), Rans()),   # reload
+      Mov(Rans(), StackOff(3)),   # never read back
+      Mov(Rans(), StackOff(2)),   # spill
+      Mov(StackOff(2), Rans()),   # reload
+      Mov(StackOff(2), Rans()),   # read again, not a new pair
+    ]), 2)
+
+  def test_codegen_stats(self):
+    (defns, exprs) = parse_program(PGRM)
+    rows = codegen_stats(defns, exprs, compile(defns, exprs))
+    self.assertEqual([row.name for row in rows], ["double", "quad", "entry"])
+
+    double = rows[0]
+    # label, mov x, store left, mov x, add, ret
+    self.assertEqual((double.instrs, double.labels, double.slots, double.spills),
+      (5, 1, 2, 1))
+    self.assertEqual(double.nodes, 3)
+    self.assertAlmostEqual(double.ratio(), 5 / 3)
+
+    all_rows = total(rows)
+    self.assertEqual(all_rows.instrs, sum(row.instrs for row in rows))
+    self.assertEqual(all_rows.slots, max(row.slots for row in rows))
+    self.assertIn("double", report(rows))
+
+  def test_diff_report(self):
+    (defns, exprs) = parse_program(PGRM)
+    old = codegen_stats(defns, exprs, compile(defns, exprs))
+    padded = compile(defns, exprs) + [Mov(Rans(), Rans())]
+    new = codegen_stats(defns, exprs, padded)
+
+    lines = diff_report(old, new).split("\n")
+    self.assertEqual(len(lines), 5)
+    self.assertTrue(lines[1].startswith("double"))
+    self.assertNotIn("->", lines[1])
+    self.assertIn("->", lines[3])
+    self.assertIn("(+1)", lines[4])
+
+  def test_change(self):
+    self.assertEqual(change(12, 10), "12 -> 10 (-2)")
+    self.assertEqual(change(3, 3), "3")
+    self.assertEqual(change(None, 4), "- -> 4")
+    self.assertEqual(change(1.0, 1.5), "1.00 -> 1.50 (+0.50)")
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+from rasm.VirtualMachine import *
+from rasm.Debugger import *
+
+ENTRY_LABEL = "entry"
+
+PGRM = [
+  Label("f"),
+  Mov(StackOff(1), Rans()),
+  Add(Imm(1), Rans()),
+  Ret(),
+  Label(ENTRY_LABEL),
+  Mov(Imm(4), StackOff(2)),
+  Call("f"),
+  Mov(Rans(), StackOff(1)),
+]
+
+class Recorder:
+  """Stop handler that records each stop along with the machine state"""
+  def __init__(self, then=None):
+    self.stops = []
+    self.then = then
+
+  def __call__(self, dbg, stop):
+    self.stops.append((stop.kind, dbg.state()))
+    if self.then is not None:
+      self.then(dbg)
+
+class DebuggerTests(unittest.TestCase):
+
+  def test_inactive_uses_fast_loop(self):
+    vm = VirtualMachine()
+    dbg = Debugger(vm, Recorder())
+    self.assertFalse(dbg.active())
+    vm.run_hooked = None # would fail if the hooked loop were used
+    vm.execute(PGRM, suppress_output=True)
+    self.assertEqual(vm.rans, 5)
+
+  def test_break_at_address(self):
+    vm = VirtualMachine()
+    rec = Recorder()
+    dbg = Debugger(vm, rec)
+    dbg.break_at(2)
+    vm.execute(PGRM, suppress_output=True)
+
+    self.assertEqual(len(rec.stops), 1)
+    (kind, state) = rec.stops[0]
+    self.assertEqual(kind, "breakpoint")
+    self.assertEqual(state.rip, 2)
+    self.assertEqual(state.rans, 4)
+    self.assertEqual(state.instr, Add(Imm(1), Rans()))
+    self.assertEqual(vm.rans, 5)
+
+  def test_break_at_label(self):
+    vm = VirtualMachine()
+    rec = Recorder()
+    dbg = Debugger(vm, rec)
+    dbg.break_at("f")
+    vm.execute(PGRM, suppress_output=True)
+
+    self.assertEqual(len(rec.stops), 1)
+    (kind, state) = rec.stops[0]
+    self.assertEqual(state.rip, 1)
+    self.assertEqual(state.rsp, 1)
+    self.assertEqual(state.stack[1], 7)
+
+    dbg.break_at("no_such_label")
+    with self.assertRaises(InvalidTarget):
+      vm.execute(PGRM, suppress_output=True)
+
+  def test_single_step(self):
+    vm = VirtualMachine()
+    rec = Recorder(lambda dbg: dbg.single_step())
+    dbg = Debugger(vm, rec)
+    dbg.single_step()
+    vm.execute(PGRM, suppress_output=True)
+
+    rips = [state.rip for (kind, state) in rec.stops]
+    self.assertEqual(rips, [5, 6, 1, 2, 3, 7])
+
+  def test_step_then_continue(self):
+    vm = VirtualMachine()
+    rec = Recorder(lambda dbg: dbg.cont())
+    dbg = Debugger(vm, rec)
+    dbg.single_step()
+    vm.execute(PGRM, suppress_output=True)
+    self.assertEqual(len(rec.stops), 1)
+    self.assertEqual(vm.rans, 5)
+
+  def test_watchpoints(self):
+    vm = VirtualMachine()
+    rec = Recorder()
+    dbg = Debugger(vm, rec)
+    dbg.watch_register("rsp")
+    vm.execute(PGRM, suppress_output=True)
+    # call pushes, ret pops
+    self.assertEqual([state.rsp for (kind, state) in rec.stops], [1, 0])
+
+    vm = VirtualMachine()
+    rec = Recorder()
+    dbg = Debugger(vm, rec)
+    dbg.watch_stack(2)
+    vm.execute(PGRM, suppress_output=True)
+    self.assertEqual(len(rec.stops), 1)
+    (kind, state) = rec.stops[0]
+    self.assertEqual(kind, "watchpoint")
+    self.assertEqual(state.stack[2], 4)
+
+    with self.assertRaises(ValueError):
+      dbg.watch_register("rax")
+    with self.assertRaises(ValueError):
+      dbg.watch_stack(STACK_SIZE)
+
+  def test_watch_last_instruction(self):
+    vm = VirtualMachine()
+    details = []
+    dbg = Debugger(vm, lambda dbg, stop: details.append(stop.detail))
+    dbg.watch_register("rans")
+    vm.execute([Label(ENTRY_LABEL), Mov(Imm(1), Rans()), Mov(Imm(2), Rans())], suppress_output=True)
+    self.assertEqual(details, ["rans changed from 0 to 1", "rans changed from 1 to 2"])
+    self.assertFalse(dbg.running)
+
+  def test_failed_start(self):
+    class Failing(Hook):
+      def start(self, vm):
+        raise RuntimeError("start failed")
+
+    finished = []
+    class Finishing(Hook):
+      def finish(self, vm):
+        finished.append(vm)
+
+    vm = VirtualMachine()
+    vm.attach(Finishing())
+    vm.attach(Failing())
+    with self.assertRaises(RuntimeError):
+      vm.execute(PGRM, suppress_output=True)
+    self.assertEqual(finished, [vm])
+
+  def test_inspection(self):
+    vm = VirtualMachine()
+    seen = {}
+    def inspect(dbg, stop):
+      seen["registers"] = dbg.registers()
+      seen["flags"] = dbg.flags()
+      seen["stack"] = dbg.stack(0, 3)
+      seen["instr"] = dbg.current_instr()
+      seen["dump"] = str(dbg.state())
+      seen["vm"] = str(dbg.vm)
+    dbg = Debugger(vm, inspect)
+    dbg.break_at(3)
+    vm.execute(PGRM, suppress_output=True)
+
+    self.assertEqual(seen["registers"], { "rip": 3, "rans": 5, "rsp": 1 })
+    self.assertEqual(seen["flags"], { "fequal": False, "fless": False })
+    self.assertEqual(seen["stack"], [0, 7, 4])
+    self.assertEqual(seen["instr"], Ret())
+    self.assertEqual(seen["dump"], seen["vm"])
+
+
+if __name__ == '__main__':
+  unittest.main()
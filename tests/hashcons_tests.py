@@ -0,0 +1,65 @@
+import unittest
+from parsing.parse_program import *
+from compiler.HashCons import *
+from demo.compile import compile
+from bench.generate import *
+from rasm.VirtualMachine import *
+
+def run(instrs: list) -> float:
+  vm = VirtualMachine()
+  vm.execute(instrs, suppress_output=True)
+  return vm.rans
+
+class HashConsTests(unittest.TestCase):
+
+  def test_interning(self):
+    hc = HashCons()
+    a = hc.Plus(hc.Num(1.0), hc.App("f", [hc.Name("x")]))
+    b = hc.Plus(hc.Num(1.0), hc.App("f", [hc.Name("x")]))
+    self.assertIs(a, b)
+    self.assertIsNot(a, hc.Plus(hc.Num(2.0), hc.App("f", [hc.Name("x")])))
+    self.assertEqual(len(hc), 6)
+
+    # consed nodes are still the same kind of node
+    self.assertTrue(a.isPlus() and isinstance(a, Plus) and a.right.isApp())
+    self.assertEqual(str(a), "(+ 1 (f x))")
+    self.assertEqual(a.right.args, [Name("x")])
+
+    # and equal to the same structure made without interning
+    self.assertEqual(a, Plus(Num(1), App("f", [Name("x")])))
+    self.assertEqual(Plus(Num(1), App("f", [Name("x")])), a)
+    self.assertNotEqual(a, Plus(Num(1), App("g", [Name("x")])))
+
+  def test_hashing(self):
+    hc = HashCons()
+    exp = hc.intern(Let("x", Num(1), Times(Name("x"), Name("x"))))
+    memo = { exp: "let", exp.body: "times" }
+    self.assertEqual(memo[hc.Times(hc.Name("x"), hc.Name("x"))], "times")
+
+    # nodes from different HashCons compare and hash structurally
+    other = HashCons().intern(Let("x", Num(1), Times(Name("x"), Name("x"))))
+    self.assertIsNot(other, exp)
+    self.assertEqual(other, exp)
+    self.assertEqual(hash(other), hash(exp))
+    self.assertEqual(memo[other], "let")
+
+  def test_rasm(self):
+    hc = HashCons()
+    instrs = hc.intern_all([Mov(Imm(1), StackOff(2)), Label("a"), Mov(Imm(1), StackOff(2)), Ret()])
+    self.assertIs(instrs[0], instrs[2])
+    self.assertIs(instrs[0].src, hc.Imm(1))
+    self.assertEqual(instrs, [Mov(Imm(1), StackOff(2)), Label("a"), Mov(Imm(1), StackOff(2)), Ret()])
+    self.assertNotEqual(hc.Mov(Imm(1), Rans()), hc.Add(Imm(1), Rans()))
+    self.assertEqual(len({ hc.Rans(), hc.Rans(), hc.Rsp() }), 2)
+
+  def test_parse(self):
+    # parsing with a HashCons shares repeated subexpressions
+    pgrm = generate(Shape(defns=20))
+    hc = HashCons()
+    (defns, exprs) = make_parser(hc).parse(lexer.lex(pgrm))
+    self.assertEqual((defns, exprs), parse_program(pgrm))
+    self.assertLess(len(hc), hc.made)
+    self.assertEqual(run(compile(defns, exprs)), run(compile(*parse_program(pgrm))))
+
+if __name__ == '__main__':
+  unittest.main()
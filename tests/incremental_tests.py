@@ -0,0 +1,124 @@
+import random
+import itertools
+import unittest
+from parsing.parse_program import *
+from parsing.incremental import *
+from bench.generate import *
+
+def outcome(fn):
+  """The result of a parse, or the class and message of its error"""
+  try:
+    return fn()
+  except (LexError, ParseError) as err:
+    return (type(err).__name__, str(err))
+
+class IncrementalTests(unittest.TestCase):
+
+  def test_reuse(self):
+    pgrm = generate(Shape(defns=50))
+    session = ParseSession(pgrm)
+    (defns, exprs) = session.parse()
+    self.assertEqual((defns, exprs), parse_program(pgrm))
+
+    # rename one function's first parameter, and its uses
+    start = pgrm.index("(def (f20 ")
+    end = pgrm.index("\n(def (f21 ")
+    defn = pgrm[start:end].replace("a0", "b0")
+    (new_defns, new_exprs) = session.edit(start, end, defn)
+
+    self.assertEqual(session.reparsed, 1)
+    self.assertEqual(new_defns[20].params[0], "b0")
+    for i in range(len(defns)):
+      if i != 20:
+        self.assertIs(new_defns[i], defns[i])
+    for (old, new) in zip(exprs, new_exprs):
+      self.assertIs(old, new)
+    self.assertEqual((new_defns, new_exprs), parse_program(session.text))
+
+  def test_form_boundaries(self):
+    session = ParseSession("(f 1) (g 2) (h 3)")
+    # joining two forms into one
+    self.assertEqual(session.edit(4, 7, " "),
+      ([], [App("f", [Num(1), Name("g"), Num(2)]), App("h", [Num(3)])]))
+    # splitting one apart
+    self.assertEqual(session.edit(4, 5, ") (g "),
+      ([], [App("f", [Num(1)]), App("g", [Name("g"), Num(2)]), App("h", [Num(3)])]))
+    # an unclosed form swallows those after it, until it is closed
+    self.assertEqual(outcome(lambda: session.edit(0, 0, "(k ")),
+      outcome(lambda: parse_program("(k (f 1) (g g 2) (h 3)")))
+    self.assertEqual(session.edit(len(session.text), len(session.text), ")"),
+      ([], [App("k", [App("f", [Num(1)]), App("g", [Name("g"), Num(2)]), App("h", [Num(3)])])]))
+
+  def test_update(self):
+    session = ParseSession("(def (f x) x)\n(f 1)\n(f 2)\n")
+    defn = session.parse()[0][0]
+    self.assertEqual(session.update("(def (f x) x)\n(f 1)\n(f 3)\n(f 4)\n"),
+      ([defn], [App("f", [Num(1)]), App("f", [Num(3)]), App("f", [Num(4)])]))
+    self.assertIs(session.parse()[0][0], defn)
+    self.assertEqual(session.update(""), ([], []))
+
+  def test_random_edits(self):
+    # every edit parses (or fails) as parsing it all at once does
+    rand = random.Random(0)
+    snippets = ["(", ")", " ", "\n", "; c\n", "1", "x", "(f)", "(+ 1 2)", "(def (g y) y)", "@", ""]
+    for seed in range(30):
+      pgrm = generate(Shape(defns=4, exprs=2, literals=2, depth=2, let_chain=1), seed)
+      session = ParseSession(pgrm)
+      for i in range(20):
+        start = rand.randint(0, len(pgrm))
+        end = min(len(pgrm), start + rand.choice([0, 1, 2, 10]))
+        text = rand.choice(snippets)
+        pgrm = pgrm[:start] + text + pgrm[end:]
+        self.assertEqual(outcome(lambda: session.edit(start, end, text)),
+          outcome(lambda: parse_program(pgrm)))
+        self.assertEqual(session.text, pgrm)
+
+  def test_errors_fixed(self):
+    session = ParseSession("(def (f x) x)\n(def (g x) x)\n(f 1)\n")
+    defns = session.parse()[0]
+    # a repeated name, until it is renamed
+    self.assertEqual(outcome(lambda: session.edit(20, 21, "f")),
+      ("ParseError", "ParseError: function f defined more than once"))
+    self.assertEqual(session.edit(20, 21, "h"), (defns[:1] + [Defn("h", ["x"], Name("x"))], [App("f", [Num(1)])]))
+    # a defn after an expr, until it is moved back
+    pgrm = session.text + "(def (k) 1)\n"
+    self.assertEqual(outcome(lambda: session.update(pgrm)), outcome(lambda: parse_program(pgrm)))
+    self.assertEqual(session.inversions, 1)
+    self.assertEqual(session.update("(def (k) 1)\n" + session.text[:-len("(def (k) 1)\n")]),
+      parse_program(session.text))
+    self.assertEqual((session.inversions, session.duplicates, session.failed), (0, 0, set()))
+
+  def test_kept_up_to_date(self):
+    # what is kept about the program matches the spans, after any edits
+    rand = random.Random(1)
+    snippets = ["(", ")", " ", "1", "(f)", "(def (g y) y)", "(def (f1 y) y)", "@"]
+    pgrm = generate(Shape(defns=6, exprs=3, literals=2, depth=2), 1)
+    session = ParseSession(pgrm)
+    for i in range(200):
+      start = rand.randint(0, len(session.text))
+      end = min(len(session.text), start + rand.choice([0, 1, 5]))
+      session.apply(start, end, rand.choice(snippets))
+      forms = [form for result in session.results for form in result.forms]
+      self.assertEqual(session.defns, [f for f in forms if isinstance(f, Defn)])
+      self.assertEqual(session.exprs, [f for f in forms if not isinstance(f, Defn)])
+      self.assertEqual(session.ends[len(session.ends) - 1], len(session.text))
+      self.assertEqual([session.defn_counts[i] for i in range(len(session.results))],
+        list(itertools.accumulate(len(defns_of(r)) for r in session.results)))
+      names = [d.name for d in session.defns]
+      self.assertEqual(session.duplicates, len(names) - len(set(names)))
+
+  def test_shifted(self):
+    values = Shifted([1, 3, 5, 7, 9])
+    values.splice(1, 2, [3, 4], 2)
+    self.assertEqual([values[i] for i in range(len(values))], [1, 3, 4, 7, 9, 11])
+    values.splice(0, 0, [0], 0)
+    values.splice(6, 6, [], -1)
+    self.assertEqual([values[i] for i in range(len(values))], [0, 1, 3, 4, 7, 9, 10])
+    self.assertEqual([values.index_above(x) for x in [-1, 0, 4, 9, 10]], [0, 1, 4, 6, 7])
+
+  def test_bad_edit(self):
+    with self.assertRaises(ValueError):
+      ParseSession("(f 1)").edit(3, 10, "")
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from parsing.parse_program import *
+from parsing.parallel import *
+from bench.generate import *
+
+def outcome(fn):
+  """The result of a parse, or the class and message of its error"""
+  try:
+    return fn()
+  except (LexError, ParseError) as err:
+    return (type(err).__name__, str(err))
+
+class ParallelTests(unittest.TestCase):
+
+  def assert_same(self, pgrm: str):
+    """Parsing in chunks gives what parsing all at once does, for
+    chunks of every size"""
+    expected = outcome(lambda: parse_program(pgrm))
+    for n in [1, 2, 5, 100]:
+      self.assertEqual(
+        outcome(lambda: parse_program_parallel(pgrm, jobs=1, chunks_per_job=n)), expected)
+
+  def test_form_ends(self):
+    pgrm = "(def (f x) (g x)) ; (not a form\n17 (f 1)(f 2)"
+    self.assertEqual(form_ends(pgrm), [17, 40, 45])
+    self.assertEqual(form_ends(pgrm.encode()), [17, 40, 45])
+    # unbalanced close parens stop the scan
+    self.assertEqual(form_ends("(a) b) (c)"), [3])
+
+  def test_split_chunks(self):
+    pgrm = generate(Shape(defns=20))
+    for n in [1, 3, 10, 1000]:
+      spans = split_chunks(pgrm, n)
+      self.assertEqual(spans[0][0], 0)
+      self.assertEqual(spans[-1][1], len(pgrm))
+      for (a, b) in zip(spans, spans[1:]):
+        self.assertEqual(a[1], b[0])
+      self.assertLessEqual(len(spans), n + 1)
+    self.assertEqual(split_chunks("", 4), [(0, 0)])
+
+  def test_same_as_serial(self):
+    for filename in ["examples/fact.lisp", "examples/fib.lisp", "examples/parity.lisp"]:
+      with open(filename, "r") as file:
+        self.assert_same(file.read())
+    self.assert_same(generate(Shape(defns=30, exprs=20, literals=20)))
+    self.assert_same("")
+    self.assert_same("; only a comment")
+
+  def test_same_errors(self):
+    # defn after an expression, in the same chunk or a later one
+    self.assert_same("(def (f x) x) (f 1) (def (g y) y) (g 2)")
+    self.assert_same("(def (f x) x) (f 1) (def (g y) (+ y) (g 2)")
+    # duplicates across chunks, only once everything else parses
+    self.assert_same("(def (f x) x) (def (g x) x) (def (f y) y) (f 1)")
+    self.assert_same("(def (f x) x) (def (f y) y) (f 1) (+ 1")
+    # lex errors anywhere come before parse errors
+    self.assert_same("(f 1 (f 2) (g @)")
+    self.assert_same("(f 1)) (g 2)")
+    # the text shown for a bad token runs on past its chunk
+    self.assert_same("(f 1) (g @x)\n(h 2) (k 3)")
+    self.assert_same(b"(f 1) (g @x)\n(h 2) (k 3)")
+
+  def test_pool(self):
+    pgrm = generate(Shape(defns=40))
+    self.assertEqual(parse_program_parallel(pgrm, jobs=2), parse_program(pgrm))
+    with self.assertRaises(ParseError):
+      parse_program_parallel("(def (f x) x) (f 1) (f 2) (def (f y) y)", jobs=2, chunks_per_job=2)
+    pgrm = "(f 1) (g @x)\n(h 2) (k 3)"
+    self.assertEqual(outcome(lambda: parse_program_parallel(pgrm, jobs=2, chunks_per_job=2)),
+      outcome(lambda: parse_program(pgrm)))
+
+
+if __name__ == '__main__':
+  unittest.main()
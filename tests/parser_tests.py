@@ -1,5 +1,8 @@
+import sys
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from parsing.parse_program import *
+from bench.generate import *
 
 class ParserTests(unittest.TestCase):
 
@@ -189,11 +192,79 @@ class ParserTests(unittest.TestCase):
     with self.assertRaises(ParseError):
       parse_program("(def (f 1 2 3) (+ 1 2))")
 
+  def test_keywords_and_symbols(self):
+    # keywords only when the whole symbol spells one
+    self.assertEqual(
+      parse_program("(def (define iff let1 print!) (printer))"),
+      ([Defn("define", ["iff", "let1", "print!"], App("printer", []))], []))
+    # a minus sign starts a number when a digit follows
+    self.assertEqual(
+      parse_program("(- -5 -3)"),
+      ([], [Minus(Num(-5), Num(-3))]))
+    self.assertEqual(
+      [tok.name for tok in lexer.lex("(- -5 x-1)")],
+      [Tok.LPAREN, Tok.MINUS, Tok.NUM, Tok.SYM, Tok.RPAREN])
+
+  def test_token_array(self):
+    tokens = lexer.lex("(f x) (g x 2)")
+    self.assertEqual(len(tokens), 9)
+    self.assertEqual(
+      [(tok.name, tok.lexeme) for tok in tokens],
+      [(Tok.LPAREN, None), (Tok.SYM, "f"), (Tok.SYM, "x"), (Tok.RPAREN, None),
+       (Tok.LPAREN, None), (Tok.SYM, "g"), (Tok.SYM, "x"), (Tok.NUM, 2.0), (Tok.RPAREN, None)])
+    self.assertEqual((list(tokens.starts), list(tokens.ends)),
+      ([0, 1, 3, 4, 6, 7, 9, 11, 12], [1, 2, 4, 5, 7, 8, 10, 12, 13]))
+    # tokens without lexemes are shared, and lexemes interned
+    self.assertIs(tokens[0], tokens[4])
+    self.assertIs(tokens.lexemes[2], tokens.lexemes[6])
+    self.assertEqual([tok.name for tok in tokens[7:]], [Tok.NUM, Tok.RPAREN])
+    # parsers also accept plain lists of tokens
+    self.assertEqual(
+      make_parser().parse(list(tokens)),
+      ([], [App("f", [Name("x")]), App("g", [Name("x"), Num(2)])]))
+
   def test_lex_error(self):
     with self.assertRaises(LexError):
       parse_program("@*#&^%")
     with self.assertRaises(LexError):
       parse_program("~~_+;;-+_*##((")
 
+  def test_threads(self):
+    # parses running concurrently each get their own parser
+    pgrms = [generate(Shape(defns=20), seed) for seed in range(16)]
+    pgrms += ["(f (g 1) 2) (+ 3 4) (let (x 5) x)"] * 16
+    expected = [parse_program(pgrm) for pgrm in pgrms]
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+      with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(parse_program, pgrms))
+    finally:
+      sys.setswitchinterval(interval)
+    self.assertEqual(results, expected)
+
+  def test_deep_nesting(self):
+    # deeper than the recursion limit allows a recursive parser to go
+    depth = 10000
+    (defns, exprs) = parse_program("(add1 " * depth + "0" + ")" * depth)
+    exp = exprs[0]
+    for i in range(depth):
+      self.assertTrue(exp.isAdd1())
+      exp = exp.operand
+    self.assertEqual(exp, Num(0))
+
+    (defns, exprs) = parse_program("(let (x 1) " * depth + "(f x)" + ")" * depth)
+    exp = exprs[0]
+    for i in range(depth):
+      self.assertTrue(exp.isLet())
+      self.assertEqual((exp.name, exp.value), ("x", Num(1)))
+      exp = exp.body
+    self.assertEqual(exp, App("f", [Name("x")]))
+
+    # unclosed deep forms are still errors
+    with self.assertRaises(ParseError):
+      parse_program("(+ 1 " * depth)
+
 if __name__ == '__main__':
   unittest.main()
\ No newline at end of file
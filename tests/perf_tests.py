@@ -0,0 +1,64 @@
+import sys
+import json
+import unittest
+from parsing.parse_program import parse_program
+from rasm.VirtualMachine import *
+from rasm.Stats import *
+from demo.compile import compile
+from bench.run_benchmarks import WORKLOADS
+
+BUDGETS_FILE = "tests/perf_budgets.json"
+
+# the measurements budgeted, all deterministic
+METRICS = ["code_size", "instructions", "calls", "stack_high_water"]
+
+def measure(filename: str) -> dict:
+  """Compile a program with the demo compiler and run it, counting
+  its static code size and what it does as it executes"""
+  with open(filename, "r") as file:
+    (defns, exprs) = parse_program(file.read())
+  instrs = compile(defns, exprs)
+
+  vm = VirtualMachine()
+  counters = RunCounters()
+  vm.attach(counters)
+  vm.execute(instrs, suppress_output=True)
+
+  return {
+    "code_size": len(instrs),
+    "instructions": counters.instructions,
+    "calls": counters.calls,
+    "stack_high_water": counters.stack_high_water,
+  }
+
+def load_budgets() -> dict:
+  with open(BUDGETS_FILE, "r") as file:
+    return json.load(file)
+
+def update_budgets():
+  """Set every budget to the current measurements"""
+  budgets = { filename: measure(filename) for filename in WORKLOADS }
+  with open(BUDGETS_FILE, "w") as file:
+    json.dump(budgets, file, indent=2)
+    file.write("\n")
+
+class PerfTests(unittest.TestCase):
+  """Fails when compiled code grows past its committed budget. If a change
+  legitimately costs more, rerun with --update and commit the new budgets"""
+
+  def test_budgets(self):
+    budgets = load_budgets()
+    for filename in WORKLOADS:
+      with self.subTest(program=filename):
+        self.assertIn(filename, budgets, "no budget, rerun with --update")
+        measured = measure(filename)
+        for metric in METRICS:
+          self.assertLessEqual(measured[metric], budgets[filename][metric],
+            f"{metric} over budget")
+
+
+if __name__ == '__main__':
+  if "--update" in sys.argv:
+    update_budgets()
+  else:
+    unittest.main()
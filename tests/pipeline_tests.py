@@ -0,0 +1,167 @@
+import io
+import os
+import json
+import tempfile
+import argparse
+import unittest
+import contextlib
+import tracemalloc
+from scripts.Pipeline import *
+from scripts.report import *
+from rasm.VirtualMachine import *
+from rasm.Stats import RunCounters
+from scripts.instrument import run_vm
+from parsing.Parser import ParseError
+from parsing.parse_program import lexer, make_parser
+from demo.compile import compile
+
+class Recorder(StageHook):
+  def __init__(self):
+    self.events = []
+
+  def before_stage(self, pipeline, name):
+    self.events.append(("before", name))
+
+  def after_stage(self, pipeline, stage):
+    self.events.append(("after", stage.name, stage.error is None))
+
+class PipelineTests(unittest.TestCase):
+
+  def test_stages(self):
+    pipeline = Pipeline()
+    tokens = pipeline.stage("lex", lexer.lex, "(+ 1 2)")
+    (defns, exprs) = pipeline.stage("parse", make_parser().parse, tokens)
+    instrs = pipeline.stage("compile", compile, defns, exprs)
+
+    self.assertEqual(len(instrs), 5)
+    self.assertEqual([s.name for s in pipeline.stages], ["lex", "parse", "compile"])
+    for s in pipeline.stages:
+      self.assertGreaterEqual(s.wall, 0)
+      self.assertGreaterEqual(s.cpu, 0)
+      self.assertEqual(s.peak_mem, 0)
+      self.assertIsNone(s.error)
+    self.assertEqual(pipeline.total("wall"), sum(s.wall for s in pipeline.stages))
+
+  def test_memory(self):
+    pipeline = Pipeline(memory=True)
+    pipeline.stage("alloc", lambda n: [0] * n, 100_000)
+    pipeline.stage("nothing", lambda: None)
+    self.assertGreaterEqual(pipeline.stages[0].peak_mem, 100_000 * 8)
+    self.assertLess(pipeline.stages[1].peak_mem, 100_000)
+    self.assertFalse(tracemalloc.is_tracing())
+
+  def test_hooks_and_errors(self):
+    pipeline = Pipeline()
+    rec = Recorder()
+    pipeline.add_hook(rec)
+    pipeline.stage("ok", lambda: 1)
+    with self.assertRaises(ZeroDivisionError):
+      pipeline.stage("fails", lambda: 1 / 0)
+
+    self.assertEqual(rec.events, [
+      ("before", "ok"),
+      ("after", "ok", True),
+      ("before", "fails"),
+      ("after", "fails", False),
+    ])
+    self.assertIsInstance(pipeline.stages[1].error, ZeroDivisionError)
+
+  def test_report(self):
+    pipeline = Pipeline()
+    pipeline.stage("lex", lexer.lex, "1")
+    lines = pipeline.report().splitlines()
+    self.assertEqual(lines[0].split(), ["stage", "wall", "ms", "cpu", "ms", "peak", "KiB"])
+    self.assertEqual([l.split()[0] for l in lines[1:]], ["lex", "total"])
+
+    pipeline = Pipeline(memory=True)
+    pipeline.stage("lex", lexer.lex, "1")
+    self.assertIn("tracing memory", pipeline.report().splitlines()[-1])
+
+  def test_run_report(self):
+    pipeline = Pipeline()
+    tokens = pipeline.stage("lex", lexer.lex, "(def (f x) (* x 2)) (f 21)")
+    (defns, exprs) = pipeline.stage("parse", make_parser().parse, tokens)
+    instrs = pipeline.stage("compile", compile, defns, exprs)
+    vm = VirtualMachine()
+    counters = RunCounters()
+    vm.attach(counters)
+    pipeline.stage("execute", vm.execute, instrs, True)
+
+    report = run_report("f.lisp", pipeline, instrs, vm, counters, None)
+    self.assertTrue(report["ok"])
+    self.assertIsNone(report["error"])
+    self.assertEqual(report["program"]["instructions"], len(instrs))
+    self.assertEqual(report["execution"]["rans"], 42)
+    self.assertEqual(report["execution"]["calls"], 1)
+    self.assertEqual(report["execution"]["max_call_depth"], 1)
+    self.assertEqual(list(report["phases"]), ["lex", "parse", "compile", "execute"])
+    self.assertIsNone(report["phases"]["lex"]["peak_kib"])
+    self.assertFalse(report["memory_traced"])
+    json.dumps(report)
+
+  def test_sampled_run_report(self):
+    pipeline = Pipeline()
+    (defns, exprs) = make_parser().parse(lexer.lex("(def (f x) (* x 2)) (f 21)"))
+    instrs = compile(defns, exprs)
+    vm = VirtualMachine()
+    counters = RunCounters()
+    vm.attach(counters)
+    args = argparse.Namespace(trace=None, trace_file=None, profile=False,
+      flamegraph=None, sample=3, stats=None)
+    with contextlib.redirect_stdout(io.StringIO()):
+      pipeline.stage("execute", run_vm, args, vm, instrs)
+
+    report = run_report("f.lisp", pipeline, instrs, vm, counters, None)
+    self.assertEqual(report["execution"]["rans"], 42)
+    self.assertEqual(report["execution"]["calls"], 1)
+    self.assertGreater(report["execution"]["instructions"], 3)
+    self.assertGreater(report["execution"]["stack_high_water"], 0)
+
+  def test_overflowing_run_report(self):
+    (defns, exprs) = make_parser().parse(lexer.lex(
+      "(def (fact n) (if (= n 0) 1 (* n (fact (sub1 n))))) (fact 2000)"))
+    instrs = compile(defns, exprs)
+    vm = VirtualMachine()
+    counters = RunCounters()
+    vm.attach(counters)
+    vm.execute(instrs, True)
+    report = run_report("fact.lisp", Pipeline(), instrs, vm, counters, None)
+    self.assertEqual(report["execution"]["rans"], "inf")
+
+    (fd, filename) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+      vm.rans = float("nan")
+      write_report(filename, run_report("fact.lisp", Pipeline(), instrs, vm, counters, None))
+      with open(filename) as file:
+        saved = json.load(file, parse_constant=lambda c: self.fail(f"{c} in report"))
+      self.assertEqual(saved["execution"]["rans"], "nan")
+    finally:
+      os.remove(filename)
+
+  def test_unstarted_run_report(self):
+    vm = VirtualMachine()
+    counters = RunCounters()
+    vm.attach(counters)
+    try:
+      vm.execute([Ret()])
+    except NoEntry:
+      pass
+    report = run_report("f.lisp", Pipeline(), [Ret()], vm, counters, None)
+    self.assertIsNone(report["execution"])
+
+  def test_failed_run_report(self):
+    pipeline = Pipeline()
+    try:
+      pipeline.stage("parse", make_parser().parse, lexer.lex("(+ 1"))
+    except ParseError as err:
+      error = err
+    report = run_report("bad.lisp", pipeline, None, None, None, error)
+    self.assertFalse(report["ok"])
+    self.assertEqual(report["error"]["class"], "ParseError")
+    self.assertIsNone(report["program"])
+    self.assertIsNone(report["execution"])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+import io
+import unittest
+from rasm.VirtualMachine import *
+from rasm.Profiler import *
+from compiler.util import function_names
+from parsing.parse_program import parse_program
+from demo.compile import compile
+
+ENTRY_LABEL = "entry"
+
+# f calls g twice, g is a leaf
+PGRM = [
+  Label("g"),
+  Add(Imm(1), Rans()),
+  Ret(),
+  Label("f"),
+  Call("g"),
+  Call("g"),
+  Ret(),
+  Label(ENTRY_LABEL),
+  Mov(Imm(0), Rans()),
+  Call("f"),
+]
+
+def profile(pgrm: list, names=None) -> Profiler:
+  """Run a program under a fresh profiler"""
+  vm = VirtualMachine()
+  profiler = Profiler(names)
+  vm.attach(profiler)
+  vm.execute(pgrm, suppress_output=True)
+  return profiler
+
+class ProfilerTests(unittest.TestCase):
+
+  def test_instruction_counts(self):
+    profiler = profile(PGRM)
+    entry = profiler.functions["entry"]
+    f = profiler.functions["f"]
+    g = profiler.functions["g"]
+
+    self.assertEqual((entry.calls, f.calls, g.calls), (1, 1, 2))
+    self.assertEqual(entry.exclusive_instrs, 2)
+    self.assertEqual(f.exclusive_instrs, 3)
+    self.assertEqual(g.exclusive_instrs, 4)
+    self.assertEqual(entry.inclusive_instrs, 9)
+    self.assertEqual(f.inclusive_instrs, 7)
+    self.assertEqual(g.inclusive_instrs, 4)
+    self.assertGreaterEqual(entry.inclusive_time, f.inclusive_time)
+
+  def test_collapsed_stacks(self):
+    out = io.StringIO()
+    profile(PGRM).write_collapsed(out)
+    self.assertEqual(out.getvalue().splitlines(), [
+      "entry 2",
+      "entry;f 3",
+      "entry;f;g 4",
+    ])
+    with self.assertRaises(ValueError):
+      profile(PGRM).collapsed_stacks("bytes")
+
+  def test_recursion(self):
+    (defns, exprs) = parse_program("""
+      (def (fact n) (if (= n 0) 1 (* n (fact (sub1 n)))))
+      (fact 3)""")
+    profiler = profile(compile(defns, exprs), function_names(defns))
+    fact = profiler.functions["fact"]
+    self.assertEqual(fact.calls, 4)
+    # recursive activations are counted once in the inclusive total
+    self.assertEqual(fact.inclusive_instrs, fact.exclusive_instrs)
+    stacks = [";".join(names) for (names, w) in profiler.collapsed_stacks()]
+    self.assertIn("entry;fact;fact;fact;fact", stacks)
+
+  def test_label_names(self):
+    profiler = Profiler()
+    self.assertEqual(profiler.function_name("function_odd_12345"), "odd")
+    self.assertEqual(profiler.function_name("helper"), "helper")
+    profiler = Profiler({ "function_odd_12345": "odd?" })
+    self.assertEqual(profiler.function_name("function_odd_12345"), "odd?")
+
+  def test_report(self):
+    lines = profile(PGRM).report().splitlines()
+    self.assertTrue(lines[0].startswith("function"))
+    self.assertEqual([l.split()[0] for l in lines[1:]], ["g", "f", "entry"])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,4 +1,6 @@
+import sys
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from parsing.parse_rasm import *
 
 class RasmParserTests(unittest.TestCase):
@@ -149,6 +151,33 @@ class RasmParserTests(unittest.TestCase):
       parse_rasm("cmp ,")
     with self.assertRaises(ParseError):
       parse_rasm("not_an_instr")
+    # tokens that cannot start an instruction
+    with self.assertRaisesRegex(ParseError, "expected instruction, got rans"):
+      parse_rasm("ret\nrans")
+    with self.assertRaisesRegex(ParseError, "expected label target for je, got number"):
+      parse_rasm("je 5")
+
+  def test_keywords_and_labels(self):
+    # keywords only when the whole label spells one
+    self.assertEqual(
+      parse_rasm("jne jnex\nmovs:\ncall ret_addr"),
+      [Jne("jnex"), Label("movs"), Call("ret_addr")])
+
+  def test_threads(self):
+    # parses running concurrently each get their own parser
+    pgrms = [
+      "\n".join(f"l{i}:\n\tmov [rsp + {i}], rans\n\tjne l{i}" for i in range(n))
+      for n in range(1, 33)]
+    expected = [parse_rasm(pgrm) for pgrm in pgrms]
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+      with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(parse_rasm, pgrms))
+    finally:
+      sys.setswitchinterval(interval)
+    self.assertEqual(results, expected)
 
   def test_lexer_errors(self):
     with self.assertRaises(LexError):
@@ -0,0 +1,154 @@
+import io
+import os
+import signal
+import tempfile
+import unittest
+import argparse
+import contextlib
+from rasm.VirtualMachine import *
+from rasm.Sampler import *
+from rasm.Profiler import Profiler
+from scripts.instrument import run_vm
+from compiler.util import function_names
+from parsing.parse_program import parse_program
+from demo.compile import compile
+
+ENTRY_LABEL = "entry"
+
+# entry loops calling f, f calls the leaf g, with rsp adjusted around calls
+PGRM = [
+  Label("g"),
+  Add(Imm(1), Rans()),
+  Ret(),
+  Label("f"),
+  Add(Imm(2), Rsp()),
+  Call("g"),
+  Sub(Imm(2), Rsp()),
+  Ret(),
+  Label(ENTRY_LABEL),
+  Mov(Imm(0), Rans()),
+  Label("loop"),
+  Add(Imm(3), Rsp()),
+  Call("f"),
+  Sub(Imm(3), Rsp()),
+  Cmp(Imm(100), Rans()),
+  Jne("loop"),
+]
+
+class SamplerTests(unittest.TestCase):
+
+  def test_every_instruction(self):
+    vm = VirtualMachine()
+    sampler = Sampler(every=1)
+    sampler.run(vm, PGRM, suppress_output=True)
+    self.assertEqual(vm.rans, 100)
+
+    # a sample after every instruction but the last
+    self.assertEqual(sampler.samples, 2 + 100 * 11 - 1)
+    self.assertNotIn(UNKNOWN, [name for stack in sampler.stacks for name in stack])
+    self.assertEqual(set(sampler.stacks), set([
+      ("entry",),
+      ("entry", "f"),
+      ("entry", "f", "g"),
+    ]))
+
+    table = { name: (own, total) for (name, own, total) in sampler.function_table() }
+    self.assertEqual(table["g"], (200, 200))
+    self.assertEqual(table["f"], (400, 600))
+    self.assertEqual(table["entry"][1], sampler.samples)
+
+  def test_timer(self):
+    vm = VirtualMachine()
+    sampler = Sampler(interval=0.001)
+    before = signal.getsignal(signal.SIGPROF)
+    sampler.run(vm, PGRM, suppress_output=True)
+    self.assertEqual(vm.rans, 100)
+    self.assertEqual(signal.getsignal(signal.SIGPROF), before)
+    self.assertEqual(sum(sampler.stacks.values()), sampler.samples)
+
+  def test_hooks_while_sampling(self):
+    vm = VirtualMachine()
+    profiler = Profiler()
+    vm.attach(profiler)
+    trace = vm.enable_trace(5)
+    sampler = Sampler(every=7)
+    sampler.run(vm, PGRM, suppress_output=True)
+    self.assertEqual(vm.rans, 100)
+    self.assertEqual(profiler.profile("f").calls, 100)
+    self.assertEqual(len(trace.entries()), 5)
+
+    sampler = Sampler(interval=0.001)
+    sampler.run(vm, PGRM, suppress_output=True)
+    self.assertEqual(profiler.profile("g").calls, 100)
+
+  def test_run_vm_with_sample(self):
+    (fd, trace_file) = tempfile.mkstemp()
+    os.close(fd)
+    args = argparse.Namespace(trace=5, trace_file=trace_file, profile=True,
+      flamegraph=None, sample=10, stats=None)
+    try:
+      out = io.StringIO()
+      with contextlib.redirect_stdout(out):
+        run_vm(args, VirtualMachine(), PGRM)
+      with open(trace_file) as file:
+        self.assertEqual(len(file.read().splitlines()), 1 + 5)
+    finally:
+      os.remove(trace_file)
+    self.assertIn("samples", out.getvalue())
+    self.assertRegex(out.getvalue(), r"\bf\s+100\b")
+
+  def test_unwinds_compiled_code(self):
+    (defns, exprs) = parse_program("""
+      (def (odd? n) (if (= n 0) 0 (even? (sub1 n))))
+      (def (even? n) (if (= n 0) 1 (odd? (sub1 n))))
+      (let (x 5) (odd? (+ x 10)))""")
+    pgrm = compile(defns, exprs)
+    sampler = Sampler(every=3, names=function_names(defns))
+    vm = VirtualMachine()
+    sampler.run(vm, pgrm, suppress_output=True)
+    self.assertEqual(vm.rans, 1)
+
+    for stack in sampler.stacks:
+      self.assertEqual(stack[0], "entry")
+      self.assertTrue(all(name in ["odd?", "even?"] for name in stack[1:]))
+      # calls alternate between odd? and even?
+      for (caller, callee) in zip(stack[1:], stack[2:]):
+        self.assertNotEqual(caller, callee)
+
+  def test_unknown_frames(self):
+    vm = VirtualMachine()
+    sampler = Sampler(every=1)
+    # a function returning to an address that doesn't follow a call
+    sampler.run(vm, [
+      Label("f"),
+      Mov(Imm(7), StackOff(0)),
+      Mov(Imm(1), Rans()),
+      Ret(),
+      Label(ENTRY_LABEL),
+      Call("f"),
+      Mov(Imm(2), Rans()),
+      Mov(Imm(3), Rans()),
+    ], suppress_output=True)
+    self.assertEqual(vm.rans, 3)
+    self.assertIn((UNKNOWN, "f"), sampler.stacks)
+
+  def test_report(self):
+    sampler = Sampler(every=5)
+    sampler.run(VirtualMachine(), PGRM, suppress_output=True)
+    report = sampler.report(PGRM, top=3)
+    self.assertTrue(report.startswith(f"{sampler.samples} samples"))
+    self.assertEqual(len(sampler.instr_table(PGRM)[:3]), 3)
+
+    out = io.StringIO()
+    sampler.write_collapsed(out)
+    self.assertEqual(
+      sum(int(line.split()[1]) for line in out.getvalue().splitlines()),
+      sampler.samples)
+
+  def test_invalid_period(self):
+    with self.assertRaises(ValueError):
+      Sampler(every=0)
+
+
+if __name__ == '__main__':
+  unittest.main()
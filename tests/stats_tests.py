@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+import unittest
+from rasm.VirtualMachine import *
+from rasm.Stats import *
+
+ENTRY_LABEL = "entry"
+
+PGRM = [
+  Label(ENTRY_LABEL),
+  Mov(Imm(0), Rans()),
+  Label("loop"),
+  Add(Imm(1), Rans()),
+  Mov(Rans(), StackOff(1)),
+  Cmp(Imm(3), Rans()),
+  Jne("loop"),
+  Mov(StackOff(1), Rans()),
+]
+
+def run_stats(stats: OpcodeStats, pgrm: list):
+  vm = VirtualMachine()
+  vm.attach(stats)
+  vm.execute(pgrm, suppress_output=True)
+
+class StatsTests(unittest.TestCase):
+
+  def test_opcode_keys(self):
+    self.assertEqual(opcode_key(Mov(Imm(1), Rans())), "mov imm->rans")
+    self.assertEqual(opcode_key(Mov(StackOff(2), Rans())), "mov stack->rans")
+    self.assertEqual(opcode_key(Sub(Imm(1), Rsp())), "sub imm->rsp")
+    self.assertEqual(opcode_key(Cmp(StackOff(1), Rans())), "cmp stack,rans")
+    self.assertEqual(opcode_key(Print(Rans())), "print rans")
+    self.assertEqual(opcode_key(Label("x")), "label")
+    self.assertEqual(opcode_key(Jne("x")), "jne")
+    self.assertEqual(opcode_key(Ret()), "ret")
+
+  def test_counts(self):
+    stats = OpcodeStats()
+    run_stats(stats, PGRM)
+
+    self.assertEqual(stats.programs, 1)
+    self.assertEqual(stats.opcodes, {
+      "mov imm->rans": 1,
+      "label": 1,
+      "add imm->rans": 3,
+      "mov rans->stack": 3,
+      "cmp imm,rans": 3,
+      "jne": 3,
+      "mov stack->rans": 1,
+    })
+    self.assertEqual(stats.pairs[("add imm->rans", "mov rans->stack")], 3)
+    self.assertEqual(stats.pairs[("jne", "add imm->rans")], 2)
+    self.assertEqual(stats.pairs[("jne", "mov stack->rans")], 1)
+    self.assertEqual(sum(stats.pairs.values()), 14)
+    self.assertEqual(stats.triples[("cmp imm,rans", "jne", "add imm->rans")], 2)
+    self.assertEqual(sum(stats.triples.values()), 13)
+
+  def test_accumulates_over_runs(self):
+    stats = OpcodeStats()
+    run_stats(stats, PGRM)
+    run_stats(stats, [Label(ENTRY_LABEL), Mov(Imm(1), Rans())])
+    self.assertEqual(stats.programs, 2)
+    self.assertEqual(stats.opcodes["mov imm->rans"], 2)
+    self.assertEqual(stats.opcodes["label"], 1)
+    # no pairs span two programs
+    self.assertEqual(sum(stats.pairs.values()), 14)
+
+  def test_json(self):
+    stats = OpcodeStats()
+    run_stats(stats, PGRM)
+    data = stats.to_json()
+    self.assertEqual(data["instructions"], 15)
+    self.assertEqual(data["opcodes"][0], ["add imm->rans", 3])
+    self.assertIn(["jne", "mov stack->rans", 1], data["pairs"])
+
+    (fd, path) = tempfile.mkstemp()
+    os.close(fd)
+    os.remove(path)
+    try:
+      stats.write(path, merge=True)
+      again = OpcodeStats()
+      run_stats(again, PGRM)
+      again.write(path, merge=True)
+      with open(path) as file:
+        merged = json.load(file)
+    finally:
+      os.remove(path)
+
+    self.assertEqual(merged["programs"], 2)
+    self.assertEqual(merged["instructions"], 30)
+    self.assertEqual(merged["opcodes"][0], ["add imm->rans", 6])
+    self.assertIn(["cmp imm,rans", "jne", "add imm->rans", 4], merged["triples"])
+
+class RunCountersTests(unittest.TestCase):
+
+  def test_counters(self):
+    counters = RunCounters()
+    vm = VirtualMachine()
+    vm.attach(counters)
+    vm.execute([
+      Label("g"),
+      Mov(Imm(1), StackOff(3)),
+      Ret(),
+      Label("f"),
+      Add(Imm(2), Rsp()),
+      Call("g"),
+      Sub(Imm(2), Rsp()),
+      Call("g"),
+      Ret(),
+      Label(ENTRY_LABEL),
+      Call("f"),
+      Mov(StackOff(1), Rans()),
+    ], suppress_output=True)
+
+    self.assertEqual(counters.instructions, 11)
+    self.assertEqual(counters.calls, 3)
+    self.assertEqual(counters.max_depth, 2)
+    # g runs with rsp at 4 and writes to [rsp + 3]
+    self.assertEqual(counters.stack_high_water, 7)
+
+  def test_stack_reach(self):
+    self.assertEqual(stack_reach(Mov(StackOff(2), StackOff(5))), 5)
+    self.assertEqual(stack_reach(Cmp(Rans(), StackOff(1))), 1)
+    self.assertEqual(stack_reach(Call("f")), 1)
+    self.assertEqual(stack_reach(Ret()), 0)
+    self.assertIsNone(stack_reach(Add(Imm(1), Rsp())))
+    self.assertIsNone(stack_reach(Label("x")))
+
+
+if __name__ == '__main__':
+  unittest.main()
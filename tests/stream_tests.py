@@ -0,0 +1,143 @@
+import io
+import os
+import tempfile
+import unittest
+from scripts.util import map_file, unmap_file
+import parsing.parse_program as program
+import parsing.parse_rasm as rasm
+from parsing.parse_program import *
+from parsing.parse_rasm import parse_rasm, parse_rasm_iter
+from bench.generate import *
+from demo.compile import compile
+
+EXAMPLES = ["examples/fact.lisp", "examples/fib.lisp", "examples/parity.lisp"]
+
+def split_forms(forms: list) -> tuple:
+  return ([f for f in forms if isinstance(f, Defn)], [f for f in forms if not isinstance(f, Defn)])
+
+def names(tokens: list) -> list:
+  return [(tok.name, tok.lexeme) for tok in tokens]
+
+class StreamTests(unittest.TestCase):
+
+  def test_lex_iter(self):
+    # chunks cut tokens, comments and numbers at every position
+    text = "(def (f x) ; a comment\n (+ x -12.75)) (f 3.5) ; end"
+    expected = names(program.lexer.lex(text))
+    for chunk_size in [1, 2, 3, 7, 100]:
+      tokens = program.lexer.lex_iter(io.StringIO(text), chunk_size)
+      self.assertEqual(names(tokens), expected)
+
+    with self.assertRaises(LexError):
+      list(program.lexer.lex_iter(io.StringIO("(f 1) @"), 2))
+
+  def test_parse_program_iter(self):
+    for filename in EXAMPLES:
+      with open(filename, "r") as file:
+        expected = parse_program(file.read())
+      for chunk_size in [1, 5, 65536]:
+        with open(filename, "r") as file:
+          forms = list(parse_program_iter(file, chunk_size))
+        self.assertEqual(split_forms(forms), expected)
+
+    self.assertEqual(list(parse_program_iter(io.StringIO(""))), [])
+
+  def test_lazy(self):
+    # forms are yielded before the rest of the input is even lexed
+    forms = parse_program_iter(io.StringIO("(def (f x) x) (f 1) (f 2) @@@"), 4)
+    self.assertEqual(next(forms), Defn("f", ["x"], Name("x")))
+    self.assertEqual(next(forms), App("f", [Num(1)]))
+    self.assertEqual(next(forms), App("f", [Num(2)]))
+    with self.assertRaises(LexError):
+      next(forms)
+
+  def test_interleaved(self):
+    # parses in progress at the same time don't share state
+    (a, b) = (generate(Shape(defns=5), 1), generate(Shape(defns=5), 2))
+    (forms_a, forms_b) = ([], [])
+    iters = [(parse_program_iter(io.StringIO(a), 16), forms_a),
+      (parse_program_iter(io.StringIO(b), 16), forms_b)]
+    while len(iters) > 0:
+      for (forms, out) in list(iters):
+        form = next(forms, None)
+        if form is None:
+          iters.remove((forms, out))
+        else:
+          out.append(form)
+    self.assertEqual(split_forms(forms_a), parse_program(a))
+    self.assertEqual(split_forms(forms_b), parse_program(b))
+
+  def test_errors(self):
+    with self.assertRaises(ParseError):
+      list(parse_program_iter(io.StringIO("(def (f a) a) (def (f x) x) 10")))
+    with self.assertRaises(ParseError):
+      list(parse_program_iter(io.StringIO("1 (def (f a) a)")))
+    with self.assertRaises(ParseError):
+      list(parse_program_iter(io.StringIO("(+ 1")))
+
+  def test_bounded_buffer(self):
+    # only the form being parsed is buffered, however long the program
+    pgrm = generate(Shape(defns=50, exprs=200, literals=200))
+    most = 0
+    parser = program.make_parser()
+    for form in parser.parse_iter(program.lexer.lex_iter(io.StringIO(pgrm), 256)):
+      most = max(most, len(parser.tokens))
+    self.assertLess(most, len(program.lexer.lex(pgrm)) // 20)
+
+  def test_parse_rasm_iter(self):
+    for filename in EXAMPLES:
+      with open(filename, "r") as file:
+        (defns, exprs) = parse_program(file.read())
+      text = "\n".join(str(ins) for ins in compile(defns, exprs))
+      expected = parse_rasm(text)
+      for chunk_size in [1, 16, 65536]:
+        self.assertEqual(list(parse_rasm_iter(io.StringIO(text), chunk_size)), expected)
+
+    instrs = parse_rasm_iter(io.StringIO("entry:\nmov 1, rans\nmov , rans"), 3)
+    self.assertEqual(next(instrs), rasm.Label("entry"))
+    self.assertEqual(next(instrs), rasm.Mov(rasm.Imm(1), rasm.Rans()))
+    with self.assertRaises(ParseError):
+      next(instrs)
+
+class BytesTests(unittest.TestCase):
+
+  def test_lex_bytes(self):
+    text = "(def (odd? n) ; comment\n (- n -1.5)) (odd? 3)"
+    self.assertEqual(names(program.lexer.lex(text.encode())), names(program.lexer.lex(text)))
+    self.assertEqual(names(program.lexer.lex_iter(io.BytesIO(text.encode()), 3)),
+      names(program.lexer.lex(text)))
+
+    # only symbols and numbers have lexemes, decoded to str and float
+    tokens = program.lexer.lex(b"(print x -2)")
+    self.assertEqual([tok.lexeme for tok in tokens], [None, None, "x", -2.0, None])
+
+    with self.assertRaises(LexError) as cm:
+      program.lexer.lex(b"(f \xff\xfe 1)")
+    self.assertIn("invalid token", str(cm.exception))
+
+  def test_map_file(self):
+    for filename in EXAMPLES:
+      with open(filename, "r") as file:
+        expected = parse_program(file.read())
+      pgrm = map_file(filename)
+      self.assertEqual(parse_program(pgrm), expected)
+      unmap_file(pgrm)
+
+    with open(EXAMPLES[0], "r") as file:
+      text = "\n".join(str(ins) for ins in compile(*parse_program(file.read())))
+    (fd, path) = tempfile.mkstemp()
+    try:
+      with os.fdopen(fd, "w") as file:
+        file.write(text)
+      self.assertEqual(parse_rasm(map_file(path)), parse_rasm(text))
+
+      # empty files can't be mapped
+      open(path, "w").close()
+      self.assertEqual(map_file(path), b"")
+      self.assertEqual(parse_rasm(map_file(path)), [])
+    finally:
+      os.remove(path)
+
+
+if __name__ == '__main__':
+  unittest.main()
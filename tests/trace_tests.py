@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from rasm.VirtualMachine import *
+
+ENTRY_LABEL = "entry"
+
+class TraceTests(unittest.TestCase):
+
+  def test_records_last_n(self):
+    vm = VirtualMachine()
+    trace = vm.enable_trace(3)
+    vm.execute([
+      Label(ENTRY_LABEL),
+      Mov(Imm(1), Rans()),
+      Add(Imm(2), Rans()),
+      Cmp(Imm(3), Rans()),
+      Mov(Imm(7), Rsp()),
+      Sub(Imm(1), Rsp()),
+    ], suppress_output=True)
+
+    self.assertEqual(trace.count, 5)
+    entries = trace.entries()
+    self.assertEqual([e.seq for e in entries], [2, 3, 4])
+    self.assertEqual([e.rip for e in entries], [3, 4, 5])
+    self.assertEqual([e.rans for e in entries], [3, 3, 3])
+    self.assertEqual([e.rsp for e in entries], [0, 0, 7])
+    self.assertEqual([e.fequal for e in entries], [False, True, True])
+    self.assertEqual([e.fless for e in entries], [False, False, False])
+
+  def test_short_run(self):
+    vm = VirtualMachine()
+    trace = vm.enable_trace(100)
+    vm.execute([
+      Label(ENTRY_LABEL),
+      Mov(Imm(1.5), Rans()),
+    ], suppress_output=True)
+    self.assertEqual([(e.rip, e.rans) for e in trace.entries()], [(1, 0)])
+
+    # a new run starts a fresh trace
+    vm.execute([
+      Label(ENTRY_LABEL),
+    ], suppress_output=True)
+    self.assertEqual(trace.entries(), [])
+
+  def test_dumped_in_errors(self):
+    vm = VirtualMachine()
+    vm.enable_trace(2)
+    with self.assertRaises(BadStackAccess) as ctx:
+      vm.execute([
+        Label(ENTRY_LABEL),
+        Mov(Imm(4), Rans()),
+        Sub(Imm(1), Rsp()),
+        Mov(StackOff(0), Rans()),
+      ], suppress_output=True)
+    msg = str(ctx.exception)
+    self.assertIn("Trace: (last 2 of 3 instructions)", msg)
+    self.assertIn("#1 rip=2 rans=4 rsp=0 fequal=False fless=False  sub 1, rsp", msg)
+    self.assertIn("#2 rip=3 rans=4 rsp=-1 fequal=False fless=False  mov [rsp + 0], rans", msg)
+
+    # untraced machines report only their state
+    with self.assertRaises(BadStackAccess) as ctx:
+      VirtualMachine().execute([
+        Label(ENTRY_LABEL),
+        Mov(StackOff(-1), Rans()),
+      ], suppress_output=True)
+    self.assertNotIn("Trace:", str(ctx.exception))
+
+  def test_export(self):
+    vm = VirtualMachine()
+    trace = vm.enable_trace(2)
+    vm.execute([
+      Label(ENTRY_LABEL),
+      Mov(Imm(2), Rans()),
+      Cmp(Imm(2), Rans()),
+    ], suppress_output=True)
+
+    (fd, path) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+      trace.export(path, vm.pgrm)
+      with open(path) as file:
+        lines = file.read().splitlines()
+    finally:
+      os.remove(path)
+
+    self.assertEqual(lines, [
+      "seq\trip\trans\trsp\tfequal\tfless\tinstr",
+      "0\t1\t0\t0\t0\t0\tmov 2, rans",
+      "1\t2\t2\t0\t0\t0\tcmp 2, rans",
+    ])
+
+  def test_big_values(self):
+    vm = VirtualMachine()
+    trace = vm.enable_trace(2)
+    big = 10 ** 400
+    vm.execute([
+      Label(ENTRY_LABEL),
+      Mov(Imm(big), Rans()),
+      Add(Imm(1), Rans()),
+      Mov(Imm(2 ** 53 + 1), Rans()),
+    ], suppress_output=True)
+    self.assertEqual([e.rans for e in trace.entries()], [big, big + 1])
+    self.assertIn(f"rans={big + 1} ", trace.dump(vm.pgrm))
+    self.assertEqual(vm.rans, 2 ** 53 + 1)
+
+  def test_invalid_size(self):
+    with self.assertRaises(ValueError):
+      VirtualMachine().enable_trace(0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,72 @@
+import io
+import unittest
+from parsing.parse_program import *
+from parsing.unparse import *
+from compiler.Arena import ExprArena
+from compiler.HashCons import HashCons
+from demo.compile import compile
+from bench.generate import *
+
+def lines(forms) -> str:
+  return "".join(str(form) + "\n" for form in forms)
+
+class UnparseTests(unittest.TestCase):
+
+  def test_forms(self):
+    forms = [
+      Num(1.0), Num(-2.5), Name("x"), Add1(Num(1.0)), Sub1(Name("x")),
+      PrintExpr(Plus(Num(1.0), Minus(Name("y"), Times(Num(2.0), Num(3.0))))),
+      Equals(Name("a"), Name("b")), If(Name("c"), Num(0.0), Num(1.0)),
+      Let("x", Num(4.0), Name("x")), App("f", []), App("g", [Num(1.0), Name("z")]),
+      Defn("f", [], Num(1.0)), Defn("g", ["a", "b"], App("g", [Name("b"), Name("a")])),
+    ]
+    for form in forms:
+      self.assertEqual(form_str(form), str(form))
+    f = io.StringIO()
+    write_forms(f, forms)
+    self.assertEqual(f.getvalue(), lines(forms))
+
+  def test_generated(self):
+    for seed in range(5):
+      (defns, exprs) = parse_program(generate(Shape(defns=20, depth=6), seed))
+      f = io.StringIO()
+      write_forms(f, defns + exprs)
+      self.assertEqual(f.getvalue(), lines(defns + exprs))
+
+  def test_builders(self):
+    pgrm = generate(Shape(defns=10, depth=5), 1)
+    (defns, exprs) = parse_program(pgrm)
+    for builder in [ExprArena(), HashCons()]:
+      (d, e) = make_parser(builder).parse(lexer.lex(pgrm))
+      self.assertEqual([form_str(form) for form in d + e], [str(form) for form in defns + exprs])
+
+  def test_deep(self):
+    depth = 10000
+    expr = parse_program("(add1 " * depth + "(f 1 x)" + ")" * depth)[1][0]
+    self.assertEqual(form_str(expr), "(add1 " * depth + "(f 1 x)" + ")" * depth)
+
+  def test_chunks(self):
+    exprs = [Num(float(i)) for i in range(CHUNK_PIECES * 3)]
+    f = io.StringIO()
+    write_forms(f, exprs)
+    self.assertEqual(f.getvalue(), lines(exprs))
+
+  def test_instrs(self):
+    instrs = [
+      Label("entry"), Mov(Imm(1), Rans()), Mov(Imm(1.0), StackOff(2)), Add(Imm(-2.5), Rsp()),
+      Sub(StackOff(2), Rans()), Mul(Imm(1), Rans()), Cmp(Rans(), Imm(0)), Je("entry"),
+      Jne("entry"), Jmp("entry"), Call("entry"), Print(Rans()), Ret(),
+    ]
+    f = io.StringIO()
+    write_instrs(f, instrs)
+    self.assertEqual(f.getvalue(), lines(instrs))
+
+  def test_compiled(self):
+    for seed in range(3):
+      instrs = compile(*parse_program(generate(Shape(defns=20), seed)))
+      f = io.StringIO()
+      write_instrs(f, instrs)
+      self.assertEqual(f.getvalue(), lines(instrs))
+
+if __name__ == '__main__':
+  unittest.main()